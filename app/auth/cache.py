@@ -0,0 +1,217 @@
+"""
+Two-tier cache of the user a token resolves to.
+
+``get_current_user`` used to load the user from the database on every
+authenticated request. :data:`user_cache` keeps a snapshot of the user's
+columns keyed by the token subject (the email):
+
+- an in-process LRU tier, so repeat requests on a worker skip the network;
+- a Redis tier shared by all workers (attached in the app lifespan with
+  :meth:`UserCache.attach`).
+
+An entry never outlives the ``exp`` of the token that populated it. The
+in-process tier is also capped at ``LOCAL_TTL`` seconds, which bounds how long
+another worker may serve a stale entry after an invalidation. User and profile
+updates call :meth:`UserCache.invalidate`. Redis errors are treated as a miss,
+so the database remains the fallback.
+
+A request that misses reads the subject's generation before loading the user
+and passes it to :meth:`UserCache.put`. ``invalidate`` bumps the generation,
+so a snapshot loaded before an invalidation is not cached after it.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.auth.models import User
+from app.core.enums.user_type import UserType
+
+LOCAL_MAX_ENTRIES = 1024
+LOCAL_TTL = 30
+REDIS_MAX_TTL = 3600
+KEY_PREFIX = "auth:user:"
+GENERATION_PREFIX = "auth:user-generation:"
+
+# Store the snapshot only if the subject's generation is still the one read
+# before the user was loaded. A missing key is generation 0.
+PUT_IF_CURRENT_SCRIPT = """
+local current = redis.call('GET', KEYS[2]) or '0'
+if current ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', tonumber(ARGV[3]))
+return 1
+"""
+
+
+class Generation(NamedTuple):
+    """What :meth:`UserCache.put` checks before caching a subject."""
+
+    # Invalidations seen by this process when the user was read.
+    local: int
+    # The subject's Redis generation; None if it could not be read.
+    shared: Optional[int]
+
+
+def _snapshot(user: User) -> Dict[str, Any]:
+    return {
+        "id": user.id,
+        "email": user.email,
+        "is_active": user.is_active,
+        "user_type": user.user_type.value if user.user_type is not None else None,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+    }
+
+
+def _restore(snapshot: Dict[str, Any]) -> User:
+    """A detached ``User`` carrying the cached columns."""
+    return User(
+        id=snapshot["id"],
+        email=snapshot["email"],
+        is_active=snapshot["is_active"],
+        user_type=UserType(snapshot["user_type"]) if snapshot["user_type"] else None,
+        created_at=(
+            datetime.fromisoformat(snapshot["created_at"]) if snapshot["created_at"] else None
+        ),
+    )
+
+
+class UserCache:
+    """
+    Token subject -> user snapshot, in process and in Redis.
+
+    Args:
+        max_entries: Size of the in-process LRU tier.
+        local_ttl: Longest an in-process entry is served, in seconds.
+        redis_max_ttl: Longest a Redis entry lives, in seconds.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = LOCAL_MAX_ENTRIES,
+        local_ttl: float = LOCAL_TTL,
+        redis_max_ttl: int = REDIS_MAX_TTL,
+    ):
+        self.max_entries = max_entries
+        self.local_ttl = local_ttl
+        self.redis_max_ttl = redis_max_ttl
+        self.redis: Optional[Redis] = None
+        self._put_script = None
+        self._local: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Subject -> value of the invalidation counter when it was last invalidated.
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._invalidations = 0
+
+    def attach(self, redis: Optional[Redis]) -> None:
+        """Use ``redis`` as the shared tier (None to run in-process only)."""
+        self.redis = redis
+        self._put_script = (
+            redis.register_script(PUT_IF_CURRENT_SCRIPT) if redis is not None else None
+        )
+
+    def _remember(self, subject: str, snapshot: Dict[str, Any], expires_at: float) -> None:
+        self._local[subject] = (min(expires_at, time.time() + self.local_ttl), snapshot)
+        self._local.move_to_end(subject)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def get(self, subject: str) -> Optional[User]:
+        entry = self._local.get(subject)
+        if entry is not None:
+            expires_at, snapshot = entry
+            if expires_at > time.time():
+                self._local.move_to_end(subject)
+                return _restore(snapshot)
+            del self._local[subject]
+
+        if self.redis is None:
+            return None
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(KEY_PREFIX + subject)
+                pipe.ttl(KEY_PREFIX + subject)
+                raw, ttl = await pipe.execute()
+        except RedisError:
+            return None
+        if raw is None:
+            return None
+        snapshot = json.loads(raw)
+        self._remember(subject, snapshot, time.time() + max(ttl, 0))
+        return _restore(snapshot)
+
+    async def generation(self, subject: str) -> Generation:
+        """Read before loading the user from the database; pass it to :meth:`put`."""
+        local = self._invalidations
+        if self.redis is None:
+            return Generation(local, None)
+        try:
+            raw = await self.redis.get(GENERATION_PREFIX + subject)
+        except RedisError:
+            return Generation(local, None)
+        return Generation(local, int(raw) if raw is not None else 0)
+
+    async def put(self, user: User, token_exp: Optional[float], generation: Generation) -> None:
+        """
+        Cache ``user`` until ``token_exp`` (seconds since the epoch).
+
+        Nothing is cached if the user was invalidated after ``generation`` was
+        read. Without an expiry only the in-process tier is used.
+        """
+        subject = user.email
+        if self._invalidated.get(subject, -1) > generation.local:
+            return
+        snapshot = _snapshot(user)
+        now = time.time()
+        expires_at = float(token_exp) if token_exp is not None else now + self.local_ttl
+        if expires_at <= now:
+            return
+
+        if self._put_script is None or token_exp is None or generation.shared is None:
+            self._remember(subject, snapshot, expires_at)
+            return
+        ttl = int(min(expires_at - now, self.redis_max_ttl))
+        if ttl <= 0:
+            return
+        try:
+            stored = await self._put_script(
+                keys=[KEY_PREFIX + subject, GENERATION_PREFIX + subject],
+                args=[generation.shared, json.dumps(snapshot), ttl],
+            )
+        except RedisError:
+            stored = True
+        # Another worker invalidated the user meanwhile: the snapshot is stale.
+        if stored and self._invalidated.get(subject, -1) <= generation.local:
+            self._remember(subject, snapshot, expires_at)
+
+    async def invalidate(self, *subjects: str) -> None:
+        """Drop cached users; call after changing a user or their profile."""
+        subjects = [subject for subject in subjects if subject]
+        if subjects:
+            self._invalidations += 1
+        for subject in subjects:
+            self._local.pop(subject, None)
+            self._invalidated[subject] = self._invalidations
+            self._invalidated.move_to_end(subject)
+        while len(self._invalidated) > self.max_entries:
+            self._invalidated.popitem(last=False)
+        if self.redis is None or not subjects:
+            return
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for subject in subjects:
+                    # Outlives any entry a request that read the old generation could write.
+                    pipe.incr(GENERATION_PREFIX + subject)
+                    pipe.expire(GENERATION_PREFIX + subject, self.redis_max_ttl)
+                    pipe.delete(KEY_PREFIX + subject)
+                await pipe.execute()
+        except RedisError:
+            pass
+
+
+user_cache = UserCache()
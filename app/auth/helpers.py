@@ -1,18 +1,16 @@
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 
 from app.core.database import get_session
+from app.auth.cache import user_cache
 from app.auth.models import User
+from app.auth.services import get_user_by_email
 from app.core.constants import JWT_SECRET_KEY, JWT_ALGORITHM, JWT_EXPIRATION_MINUTES
 
 
-def get_user(db_session: Session, email: str):
-    return db_session.query(User).filter(User.email == email).first()
-
-
-async def get_current_user(request: Request, db: Session = Depends(get_session)):
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_session)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -29,9 +27,16 @@ async def get_current_user(request: Request, db: Session = Depends(get_session))
     except JWTError:
         raise credentials_exception
 
-    user = get_user(db, email)
+    # Cached per token subject until the token expires; the session only
+    # touches the database on a miss. The generation is read first, so an
+    # update that lands while the user is loading is not cached over.
+    user = await user_cache.get(email)
     if user is None:
-        raise credentials_exception
+        generation = await user_cache.generation(email)
+        user = await get_user_by_email(db, email)
+        if user is None:
+            raise credentials_exception
+        await user_cache.put(user, payload.get("exp"), generation)
     return user
 
 
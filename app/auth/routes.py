@@ -1,15 +1,16 @@
+import logging
+
 from fastapi import (
     APIRouter,
     Depends,
     HTTPException,
     status,
     Response,
-    BackgroundTasks,
     Query,
 )
 from fastapi.responses import JSONResponse
 from datetime import timedelta, datetime
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 # from aioredis import Redis
@@ -18,13 +19,15 @@ from redis.asyncio import Redis
 
 from app.auth.models import User, UserType, UserProfile
 from app.auth.schemas import UserProfileCreate, UserProfileUpdate
-from app.auth.services import UserProfileService
+from app.auth.services import UserProfileService, get_or_create_user, get_user_by_email
 from app.core.constants import EXPIRATION
 from app.core.utils import generate_otp_code
 from app.core.database import get_session
 from app.core.redis import get_redis_connection
 from app.auth.helpers import get_current_active_user, create_jwt_token
-from app.core.mail import EmailService
+from app.core.mail import EmailService, MailQueue, MailQueueFull, get_mail_queue
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -33,16 +36,12 @@ router = APIRouter()
 async def register_user_send_code(
     email: str,
     db=Depends(get_session),
-    background_tasks: BackgroundTasks = None,
     redis: Redis = Depends(get_redis_connection),
+    mail_queue: MailQueue = Depends(get_mail_queue),
 ):
     try:
         # Check if email is already registered or create a new user
-        user = db.query(User).filter(User.email == email).first()
-        if not user:
-            user = User(email=email)
-            db.add(user)
-            db.commit()
+        await get_or_create_user(db, email)
 
         # Generate OTP
         code = generate_otp_code()
@@ -50,13 +49,19 @@ async def register_user_send_code(
         # Save OTP to Redis
         await redis.setex(f"otp:{email}", EXPIRATION, code)
 
-        # Send OTP via email
-        email_service = EmailService(otp_expiration=EXPIRATION)
-        background_tasks.add_task(email_service.send_otp_email, email, code)
+        # Queue the OTP email; the mail queue delivers it off the API workers
+        email_service = EmailService(otp_expiration=EXPIRATION, mail_queue=mail_queue)
+        email_service.send_otp_email(email, code)
 
         return {"message": "OTP sent successfully"}
+    except MailQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many emails are waiting to be sent. Please try again shortly.",
+            headers={"Retry-After": "30"},
+        )
     except Exception as e:
-        print("Error:", e)
+        logger.exception("Failed to register user or send OTP")
         raise HTTPException(
             status_code=500,
             detail="Failed to register user or send OTP. Please try again.",
@@ -86,7 +91,7 @@ async def verify_code(
         response.set_cookie(key="access_token", value=jwt_token, httponly=True)
         return response
     except Exception as e:
-        print("Error:", e)
+        logger.exception("Failed to verify OTP")
         raise HTTPException(
             status_code=500, detail="Failed to verify OTP. Please try again."
         )
@@ -97,11 +102,11 @@ async def resend_code(
     email: str,
     db=Depends(get_session),
     redis: Redis = Depends(get_redis_connection),
-    background_tasks: BackgroundTasks = None,
+    mail_queue: MailQueue = Depends(get_mail_queue),
 ):
     try:
         # Check if email is registered
-        user = db.query(User).filter(User.email == email).first()
+        user = await get_user_by_email(db, email)
         if not user:
             raise HTTPException(status_code=404, detail="Email not found")
 
@@ -111,12 +116,18 @@ async def resend_code(
         # Save new OTP to Redis
         await redis.setex(f"otp:{email}", EXPIRATION, code)
 
-        # Send OTP via email
-        email_service = EmailService(otp_expiration=EXPIRATION)
-        background_tasks.add_task(email_service.send_otp_email, email, code)
+        # Queue the OTP email; the mail queue delivers it off the API workers
+        email_service = EmailService(otp_expiration=EXPIRATION, mail_queue=mail_queue)
+        email_service.send_otp_email(email, code)
         return {"message": "New OTP sent successfully"}
+    except MailQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many emails are waiting to be sent. Please try again shortly.",
+            headers={"Retry-After": "30"},
+        )
     except Exception as e:
-        print("Error:", e)
+        logger.exception("Failed to resend OTP")
         raise HTTPException(
             status_code=500, detail="Failed to resend OTP. Please try again."
         )
@@ -131,27 +142,27 @@ async def read_users_me(current_user: User = Depends(get_current_active_user)):
 
 
 @router.post("/users/{user_id}/profile")
-def create_user_profile(
-    user_id: str, profile_data: UserProfileCreate, db: Session = Depends(get_session)
+async def create_user_profile(
+    user_id: str, profile_data: UserProfileCreate, db: AsyncSession = Depends(get_session)
 ):
-    return UserProfileService.create_user_profile(user_id, profile_data, db)
+    return await UserProfileService.create_user_profile(user_id, profile_data, db)
 
 
 @router.get("/users/{user_id}/profile")
-def get_user_profile(user_id: str, db: Session = Depends(get_session)):
-    return UserProfileService.get_user_profile(user_id, db)
+async def get_user_profile(user_id: str, db: AsyncSession = Depends(get_session)):
+    return await UserProfileService.get_user_profile(user_id, db)
 
 
 @router.put("/users/{user_id}/profile")
-def update_user_profile(
-    user_id: str, profile_data: UserProfileUpdate, db: Session = Depends(get_session)
+async def update_user_profile(
+    user_id: str, profile_data: UserProfileUpdate, db: AsyncSession = Depends(get_session)
 ):
-    return UserProfileService.update_user_profile(user_id, profile_data, db)
+    return await UserProfileService.update_user_profile(user_id, profile_data, db)
 
 
 @router.delete("/users/{user_id}/profile")
-def delete_user_profile(user_id: str, db: Session = Depends(get_session)):
-    return UserProfileService.delete_user_profile(user_id, db)
+async def delete_user_profile(user_id: str, db: AsyncSession = Depends(get_session)):
+    return await UserProfileService.delete_user_profile(user_id, db)
 
 
 # @router.get("/users", response_model=List[User])
@@ -1,10 +1,12 @@
 # app/services/user_service.py
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Union, Dict, Any
 from fastapi.encoders import jsonable_encoder
 from fastapi import HTTPException
 
 
+from app.auth.cache import user_cache
 from app.auth.models import User, UserProfile
 from app.auth.schemas import (
     UserCreate,
@@ -15,101 +17,131 @@ from app.auth.schemas import (
 from app.core.enums.user_type import UserType
 
 
-def get_user(db: Session, user_id: str) -> Optional[User]:
-    return db.query(User).filter(User.id == user_id).first()
+async def get_user(db: AsyncSession, user_id: str) -> Optional[User]:
+    return await db.get(User, user_id)
 
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.query(User).filter(User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.email == email).limit(1))
+    return result.scalar_one_or_none()
 
 
-def get_users(
-    db: Session, skip: int = 0, limit: int = 100, user_type: Optional[str] = None
+async def get_users(
+    db: AsyncSession, skip: int = 0, limit: int = 100, user_type: Optional[str] = None
 ) -> List[User]:
-    query = db.query(User)
+    query = select(User)
     if user_type:
-        query = query.filter(User.user_type == UserType[user_type])
-    return query.offset(skip).limit(limit).all()
+        query = query.where(User.user_type == UserType[user_type])
+    result = await db.execute(query.offset(skip).limit(limit))
+    return list(result.scalars())
 
 
-def create_user(db: Session, obj_in: UserCreate) -> User:
+async def create_user(db: AsyncSession, obj_in: UserCreate) -> User:
     obj_in_data = jsonable_encoder(obj_in)
     db_obj = User(**obj_in_data)
     db.add(db_obj)
-    db.commit()
-    db.refresh(db_obj)
+    await db.commit()
+    await db.refresh(db_obj)
     return db_obj
 
 
-def update_user(
-    db: Session, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
+async def get_or_create_user(db: AsyncSession, email: str) -> User:
+    user = await get_user_by_email(db, email)
+    if user is None:
+        user = User(email=email)
+        db.add(user)
+        await db.commit()
+    return user
+
+
+async def update_user(
+    db: AsyncSession, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
 ) -> User:
+    previous_email = db_obj.email
     obj_data = jsonable_encoder(db_obj)
     if isinstance(obj_in, dict):
         update_data = obj_in
     else:
-        update_data = obj_in.dict(exclude_unset=True)
+        update_data = obj_in.model_dump(exclude_unset=True)
     for field in obj_data:
         if field in update_data:
             setattr(db_obj, field, update_data[field])
     db.add(db_obj)
-    db.commit()
-    db.refresh(db_obj)
+    await db.commit()
+    await user_cache.invalidate(previous_email, db_obj.email)
+    await db.refresh(db_obj)
     return db_obj
 
 
-def delete_user(db: Session, user_id: str) -> Optional[User]:
-    user = db.query(User).filter(User.id == user_id).first()
+async def delete_user(db: AsyncSession, user_id: str) -> Optional[User]:
+    user = await db.get(User, user_id)
     if user:
-        db.delete(user)
-        db.commit()
+        await db.delete(user)
+        await db.commit()
+        await user_cache.invalidate(user.email)
     return user
 
 
+async def _get_profile(db: AsyncSession, user_id: str) -> Optional[UserProfile]:
+    result = await db.execute(
+        select(UserProfile).where(UserProfile.user_id == user_id).limit(1)
+    )
+    return result.scalar_one_or_none()
+
+
+async def _invalidate_cached_user(db: AsyncSession, user_id: str) -> None:
+    user = await db.get(User, user_id)
+    if user is not None:
+        await user_cache.invalidate(user.email)
+
+
 class UserProfileService:
     # TODO: add try and exceptions to catch possible errors in time.
     @staticmethod
-    def create_user_profile(
-        user_id: str, profile_data: UserProfileCreate, db: Session
+    async def create_user_profile(
+        user_id: str, profile_data: UserProfileCreate, db: AsyncSession
     ) -> UserProfile:
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.get(User, user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
-        profile = UserProfile(user_id=user_id, **profile_data.dict())
+        profile = UserProfile(user_id=user_id, **profile_data.model_dump())
         db.add(profile)
-        db.commit()
-        db.refresh(profile)
+        await db.commit()
+        await user_cache.invalidate(user.email)
+        await db.refresh(profile)
         return profile
 
     @staticmethod
-    def get_user_profile(user_id: str, db: Session) -> UserProfile:
-        profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+    async def get_user_profile(user_id: str, db: AsyncSession) -> UserProfile:
+        profile = await _get_profile(db, user_id)
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
         return profile
 
     @staticmethod
-    def update_user_profile(
-        user_id: str, profile_data: UserProfileUpdate, db: Session
+    async def update_user_profile(
+        user_id: str, profile_data: UserProfileUpdate, db: AsyncSession
     ) -> UserProfile:
-        profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+        profile = await _get_profile(db, user_id)
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
 
-        for key, value in profile_data.dict(exclude_unset=True).items():
+        for key, value in profile_data.model_dump(exclude_unset=True).items():
             setattr(profile, key, value)
 
-        db.commit()
-        db.refresh(profile)
+        await db.commit()
+        await _invalidate_cached_user(db, user_id)
+        await db.refresh(profile)
         return profile
 
     @staticmethod
-    def delete_user_profile(user_id: str, db: Session) -> dict:
-        profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+    async def delete_user_profile(user_id: str, db: AsyncSession) -> dict:
+        profile = await _get_profile(db, user_id)
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
 
-        db.delete(profile)
-        db.commit()
+        await db.delete(profile)
+        await db.commit()
+        await _invalidate_cached_user(db, user_id)
         return {"message": "Profile deleted successfully"}
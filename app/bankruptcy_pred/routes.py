@@ -1,10 +1,16 @@
 import os
-import pickle
 import numpy as np
-from fastapi import FastAPI, HTTPException, APIRouter
-from pydantic import BaseModel
-
-from sklearn.preprocessing import PowerTransformer
+from fastapi import Depends, FastAPI, HTTPException, APIRouter, Request
+from pydantic import BaseModel, ConfigDict, Field
+from starlette.concurrency import run_in_threadpool
+
+from app.core.batch import BATCH_OPENAPI, read_feature_batch
+from app.core.features import build_feature_matrix
+from app.core.load_shedding import mark_service_start
+from app.core.logging_config import get_sampled_logger
+from app.core.responses import encode_response, response_media_type
+from app.streaming.batcher import register_stream_model
+from app.training.artifacts import load_artifact
 
 router = APIRouter(
     prefix="/bankruptcy",
@@ -16,19 +22,24 @@ router = APIRouter(
 MODEL_DIR = "models"
 MODEL_PATH = os.path.join(MODEL_DIR, "bankruptcy_model.pkl")
 
+# Sampled per-prediction records (see LOG_SAMPLE_RATES)
+prediction_logger = get_sampled_logger("app.predictions")
+
 
 # Load the trained classifier and feature scaler at startup
 try:
-    with open(MODEL_PATH, "rb") as f:
-        model = pickle.load(f)
+    artifact = load_artifact(MODEL_PATH, task="bankruptcy")
 except Exception as e:
     raise RuntimeError(f"Failed to load model from {MODEL_PATH}: {e}")
 
 
 # Define the expected input payload using Pydantic
 class BankruptcyInput(BaseModel):
-    current_ratio: float
-    quick_ratio: float
+    # Same checks as the batch and streaming endpoints (see FIELD_RANGES)
+    model_config = ConfigDict(allow_inf_nan=False)
+
+    current_ratio: float = Field(ge=0)
+    quick_ratio: float = Field(ge=0)
     debt_to_equity: float
     return_on_assets: float
     operating_margin: float
@@ -42,46 +53,82 @@ def read_root():
     return {"message": "Welcome to the Bankruptcy Prediction API. Use the /predict endpoint."}
 
 
-@router.post("/predict")
-def predict_bankruptcy(data: BankruptcyInput):
-    try:
-        # Compute the interaction features:
-        interaction_current_quick = data.current_ratio * data.quick_ratio
-        interaction_return_debt = data.return_on_assets * data.debt_to_equity
-
-        scaler_x = PowerTransformer()
-
-        # Assemble the feature vector in the same order as used during training:
+@router.get("/model")
+def model_info():
+    # Which model family and version is being served (e.g. HistGradientBoosting).
+    return artifact.describe()
 
-        features = np.array([[
-            data.current_ratio,
-            data.quick_ratio,
-            data.debt_to_equity,
-            data.return_on_assets,
-            data.operating_margin,
-            data.lagged_revenue,
-            data.lagged_net_income,
-            data.lagged_operating_cash_flow,
-            interaction_current_quick,
-            interaction_return_debt
-        ]])
 
-        # Apply the same feature preprocessing (PowerTransformer) used during training
-        features_scaled = scaler_x.transform(features)
+@router.post("/predict")
+def predict_bankruptcy(
+    data: BankruptcyInput, request: Request, media_type: str = Depends(response_media_type)
+):
+    # Runs on the threadpool: the time until now was spent queueing (load shedding)
+    mark_service_start(request)
+    try:
+        # Assemble the feature vector with the shared feature definitions, which add
+        # the interaction terms and keep the columns the model was trained on.
+        features = build_feature_matrix(data.model_dump(), artifact.features)
 
-        # Predict the bankruptcy class using the loaded classifier
-        prediction = model.predict(features_scaled)
+        # Apply the fitted PowerTransformer and predict the bankruptcy class
+        prediction = artifact.predict(features)
 
         # Here we assume that the positive class (1) means bankruptcy.
         bankruptcy_probability = None
-        if hasattr(model, "predict_proba"):
-            proba = model.predict_proba(features_scaled)
-            bankruptcy_probability = proba[0][1]  # probability for class 1
+        proba = artifact.predict_proba(features)
+        if proba is not None:
+            bankruptcy_probability = float(proba[0][1])  # probability for class 1
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {e}")
 
-        return {
+    prediction_logger.info(
+        "Predicted bankruptcy",
+        extra={
+            "fields": {
+                "model": "bankruptcy",
+                "predicted_class": int(prediction[0]),
+                "bankruptcy_probability": bankruptcy_probability,
+                "features": data.model_dump,
+            }
+        },
+    )
+
+    # JSON by default; MessagePack, Arrow or .npz if the Accept header asks for it
+    return encode_response(
+        media_type,
+        {
             "predicted_class": int(prediction[0]),
-            "bankruptcy_probability": bankruptcy_probability
-        }
-    
+            "bankruptcy_probability": bankruptcy_probability,
+        },
+    )
+
+
+def _score_batch(features: np.ndarray) -> dict:
+    prediction = artifact.predict(features)
+    proba = artifact.predict_proba(features)
+    return {
+        "predicted_class": prediction.astype(np.int64),
+        "bankruptcy_probability": None if proba is None else proba[:, 1],
+    }
+
+
+@router.post("/predict/batch", openapi_extra=BATCH_OPENAPI)
+async def predict_bankruptcy_batch(
+    request: Request, media_type: str = Depends(response_media_type)
+):
+    # One array per BankruptcyInput field (JSON, .npz, .npy or Arrow), validated
+    # column-wise instead of building a Pydantic model per row.
+    features = await read_feature_batch(request, artifact.features)
+    try:
+        result = await run_in_threadpool(_score_batch, features)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {e}")
+    prediction_logger.info(
+        "Predicted bankruptcy batch",
+        extra={"fields": {"model": "bankruptcy", "rows": len(result["predicted_class"])}},
+    )
+    return encode_response(media_type, result)
+
+
+# Also serve the model on the WebSocket streaming endpoint
+register_stream_model("bankruptcy", artifact.features, _score_batch)
@@ -1,9 +1,15 @@
 import os
-import pickle
-import numpy as np
-from fastapi import HTTPException, APIRouter
-from pydantic import BaseModel
-from sklearn.preprocessing import PowerTransformer
+from fastapi import Depends, HTTPException, APIRouter, Request
+from pydantic import BaseModel, ConfigDict, Field
+from starlette.concurrency import run_in_threadpool
+
+from app.core.batch import BATCH_OPENAPI, read_feature_batch
+from app.core.features import build_feature_matrix
+from app.core.load_shedding import mark_service_start
+from app.core.logging_config import get_sampled_logger
+from app.core.responses import encode_response, response_media_type
+from app.streaming.batcher import register_stream_model
+from app.training.artifacts import load_artifact
 
 router = APIRouter(
     prefix="/cashflow",
@@ -15,20 +21,31 @@ router = APIRouter(
 MODEL_DIR = "models"
 MODEL_PATH = os.path.join(MODEL_DIR, "cash_flow_model.pkl")
 
+# Sampled per-prediction records (see LOG_SAMPLE_RATES)
+prediction_logger = get_sampled_logger("app.predictions")
+
 
 # Load the trained model and preprocessing scalers on startup
 try:
-    with open(MODEL_PATH, "rb") as f:
-        model = pickle.load(f)
+    artifact = load_artifact(MODEL_PATH, task="cash_flow")
 except Exception as e:
     raise RuntimeError(f"Failed to load model from {MODEL_PATH}: {e}")
 
+# Also serve the model on the WebSocket streaming endpoint
+register_stream_model(
+    "cash_flow",
+    artifact.features,
+    lambda features: {"predicted_cash_flow": artifact.predict_target(features)},
+)
 
 
 # Define the expected input payload using Pydantic
 class FinancialInput(BaseModel):
-    current_ratio: float
-    quick_ratio: float
+    # Same checks as the batch and streaming endpoints (see FIELD_RANGES)
+    model_config = ConfigDict(allow_inf_nan=False)
+
+    current_ratio: float = Field(ge=0)
+    quick_ratio: float = Field(ge=0)
     debt_to_equity: float
     return_on_assets: float
     operating_margin: float
@@ -42,40 +59,56 @@ def read_root():
     return {"message": "Welcome to the Cash Flow Prediction API. Use the /predict endpoint."}
 
 
+@router.get("/model")
+def model_info():
+    # Which model family and version is being served (e.g. HistGradientBoosting).
+    return artifact.describe()
+
+
 @router.post("/predict")
-def predict_cash_flow(data: FinancialInput):
+def predict_cash_flow(
+    data: FinancialInput, request: Request, media_type: str = Depends(response_media_type)
+):
+    # Runs on the threadpool: the time until now was spent queueing (load shedding)
+    mark_service_start(request)
+    try:
+        # Assemble the feature vector with the shared feature definitions, which add
+        # the interaction terms and keep the columns the model was trained on.
+        features = build_feature_matrix(data.model_dump(), artifact.features)
+
+        # Apply the fitted PowerTransformer, predict, and undo the target scaling
+        prediction = artifact.predict_target(features)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction error: {e}")
+
+    prediction_logger.info(
+        "Predicted cash flow",
+        extra={
+            "fields": {
+                "model": "cash_flow",
+                "predicted_cash_flow": float(prediction[0]),
+                "features": data.model_dump,
+            }
+        },
+    )
+
+    # JSON by default; MessagePack, Arrow or .npz if the Accept header asks for it
+    return encode_response(media_type, {"predicted_cash_flow": float(prediction[0])})
+
+
+@router.post("/predict/batch", openapi_extra=BATCH_OPENAPI)
+async def predict_cash_flow_batch(
+    request: Request, media_type: str = Depends(response_media_type)
+):
+    # One array per FinancialInput field (JSON, .npz, .npy or Arrow), validated
+    # column-wise instead of building a Pydantic model per row.
+    features = await read_feature_batch(request, artifact.features)
     try:
-        # Compute the interaction features (the order here must match what was used in training)
-        interaction_current_quick = data.current_ratio * data.quick_ratio
-        interaction_return_debt = data.return_on_assets * data.debt_to_equity
-        scaler_x  = PowerTransformer()
-
-        # Assemble the feature vector in the same order as during training:
-        # [Current_Ratio, Quick_Ratio, Debt_to_Equity, Return_on_Assets,
-        #  Operating_Margin, Lagged_Revenue, Lagged_Net_Income, Lagged_Operating_Cash_Flow,
-        #  Interaction_Current_Quick, Interaction_Return_Debt]
-        features = np.array([[
-            data.current_ratio,
-            data.quick_ratio,
-            data.debt_to_equity,
-            data.return_on_assets,
-            data.operating_margin,
-            data.lagged_revenue,
-            data.lagged_net_income,
-            data.lagged_operating_cash_flow,
-            interaction_current_quick,
-            interaction_return_debt
-        ]])
-        
-        # Apply the same feature preprocessing (PowerTransformer) used during training
-        features_scaled = scaler_x.transform(features)
-
-        # Predict the (normalized) target value using the loaded model
-        prediction_norm = model.predict(features_scaled)
-
-
-        # Return the prediction as a JSON response
-        return {"predicted_cash_flow": prediction_norm}
-    
+        prediction = await run_in_threadpool(artifact.predict_target, features)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {e}")
+    prediction_logger.info(
+        "Predicted cash flow batch",
+        extra={"fields": {"model": "cash_flow", "rows": len(prediction)}},
+    )
+    return encode_response(media_type, {"predicted_cash_flow": prediction})
@@ -0,0 +1,278 @@
+"""
+Columnar (struct-of-arrays) batch requests for the prediction endpoints.
+
+A batch of N rows as a list of ``FinancialInput`` objects makes Pydantic
+build and validate N models before the model runs. The ``/predict/batch``
+endpoints instead take one array per field and validate each column with
+vectorised checks, then hand the columns straight to
+:func:`~app.core.features.build_feature_matrix`.
+
+Accepted bodies (by ``Content-Type``):
+
+- ``application/json``: ``{"current_ratio": [1.2, 0.8, ...], ...}``;
+- ``application/x-npz``: a ``numpy.savez`` archive with one array per field;
+- ``application/x-npy``: one ``(n_rows, 8)`` float array, columns in
+  :data:`~app.core.features.BASE_FEATURES` order;
+- ``application/vnd.apache.arrow.stream``: an Arrow IPC stream with one column
+  per field (needs ``pyarrow``).
+
+Example:
+    >>> import io, numpy as np, httpx
+    >>> buffer = io.BytesIO()
+    >>> np.savez(buffer, **{name: values for name, values in columns.items()})
+    >>> httpx.post(url, content=buffer.getvalue(),
+    ...            headers={"Content-Type": "application/x-npz"})
+"""
+
+import io
+import json
+import time
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from app.core.features import BASE_FEATURES, build_feature_matrix, input_field
+from app.core.load_shedding import mark_service_start
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+JSON = "application/json"
+NPZ = "application/x-npz"
+NPY = "application/x-npy"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+MAX_BATCH_ROWS = 100_000
+# Largest body read for a batch: MAX_BATCH_ROWS rows as JSON with room to spare.
+MAX_BATCH_BYTES = 32 * 1024 * 1024
+
+# Request field -> (minimum, maximum); None leaves that side open. The
+# single-row models in the prediction routers declare the same bounds.
+FIELD_RANGES: Dict[str, Tuple[Optional[float], Optional[float]]] = {
+    "current_ratio": (0.0, None),
+    "quick_ratio": (0.0, None),
+}
+
+BATCH_FIELDS: List[str] = [input_field(name) for name in BASE_FEATURES]
+
+# Request body documentation for the batch endpoints.
+BATCH_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            JSON: {
+                "schema": {
+                    "type": "object",
+                    "required": BATCH_FIELDS,
+                    "properties": {
+                        name: {"type": "array", "items": {"type": "number"}}
+                        for name in BATCH_FIELDS
+                    },
+                }
+            },
+            NPZ: {"schema": {"type": "string", "format": "binary"}},
+            NPY: {"schema": {"type": "string", "format": "binary"}},
+            ARROW_STREAM: {"schema": {"type": "string", "format": "binary"}},
+        },
+    }
+}
+
+
+class BatchFormatError(ValueError):
+    """The body cannot be decoded as a columnar batch."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BatchValidationError(ValueError):
+    """One or more columns failed validation; ``errors`` lists them."""
+
+    def __init__(self, errors: List[dict]):
+        super().__init__(f"{len(errors)} invalid column(s)")
+        self.errors = errors
+
+
+def _media_type(content_type: Optional[str]) -> str:
+    return (content_type or JSON).split(";")[0].strip().lower()
+
+
+def decode_columns(body: bytes, content_type: Optional[str]) -> Dict[str, np.ndarray]:
+    """Decode a request body into ``{field: 1-D array}`` without validating it."""
+    media_type = _media_type(content_type)
+    try:
+        if media_type == JSON:
+            payload = orjson.loads(body) if orjson is not None else json.loads(body)
+            if not isinstance(payload, dict):
+                raise BatchFormatError("Expected a JSON object of field arrays")
+            return {name: values for name, values in payload.items()}
+        if media_type == NPZ:
+            with np.load(io.BytesIO(body), allow_pickle=False) as archive:
+                return {name: archive[name] for name in archive.files}
+        if media_type == NPY:
+            matrix = np.load(io.BytesIO(body), allow_pickle=False)
+            if matrix.ndim != 2 or matrix.shape[1] != len(BATCH_FIELDS):
+                raise BatchFormatError(
+                    f"Expected a (n_rows, {len(BATCH_FIELDS)}) array, got {matrix.shape}"
+                )
+            return {name: matrix[:, i] for i, name in enumerate(BATCH_FIELDS)}
+        if media_type == ARROW_STREAM:
+            if pa is None:
+                raise BatchFormatError("Arrow payloads need pyarrow installed", 415)
+            table = pa.ipc.open_stream(body).read_all()
+            return {
+                name: table.column(name).to_numpy(zero_copy_only=False)
+                for name in table.column_names
+            }
+    except BatchFormatError:
+        raise
+    except Exception as e:
+        raise BatchFormatError(f"Could not decode {media_type} body: {e}")
+    raise BatchFormatError(f"Unsupported content type: {media_type}", 415)
+
+
+def validate_columns(
+    columns: Mapping[str, object],
+    fields: Sequence[str] = BATCH_FIELDS,
+    ranges: Mapping[str, Tuple[Optional[float], Optional[float]]] = FIELD_RANGES,
+    max_rows: int = MAX_BATCH_ROWS,
+) -> Dict[str, np.ndarray]:
+    """
+    Check every field column at once and return them as float64 arrays.
+
+    Each column must be one-dimensional, numeric, finite and inside its range,
+    and all columns must have the same length.
+
+    Raises:
+        BatchValidationError: Listing every failing column, in the shape of
+            FastAPI's 422 ``detail`` entries.
+    """
+    errors = []
+    arrays: Dict[str, np.ndarray] = {}
+    for name in fields:
+        location = ["body", name]
+        if name not in columns:
+            errors.append({"loc": location, "msg": "Field required", "type": "missing"})
+            continue
+        try:
+            values = np.asarray(columns[name], dtype=np.float64)
+        except (TypeError, ValueError):
+            errors.append({"loc": location, "msg": "Values must be numbers", "type": "float_type"})
+            continue
+        if values.ndim != 1:
+            errors.append(
+                {"loc": location, "msg": "Expected a one-dimensional array", "type": "list_type"}
+            )
+            continue
+
+        bad = ~np.isfinite(values)
+        minimum, maximum = ranges.get(name, (None, None))
+        with np.errstate(invalid="ignore"):
+            if minimum is not None:
+                bad |= values < minimum
+            if maximum is not None:
+                bad |= values > maximum
+        if bad.any():
+            rows = np.flatnonzero(bad)
+            errors.append(
+                {
+                    "loc": location,
+                    "msg": f"{len(rows)} value(s) not finite or out of range {minimum, maximum}",
+                    "type": "value_error",
+                    "rows": rows[:10].tolist(),
+                }
+            )
+        arrays[name] = values
+
+    lengths = {len(values) for values in arrays.values()}
+    if len(lengths) > 1:
+        errors.append(
+            {
+                "loc": ["body"],
+                "msg": f"Columns have different lengths: {sorted(lengths)}",
+                "type": "value_error",
+            }
+        )
+    elif lengths == {0}:
+        errors.append({"loc": ["body"], "msg": "The batch is empty", "type": "too_short"})
+    elif lengths and max(lengths) > max_rows:
+        errors.append(
+            {"loc": ["body"], "msg": f"At most {max_rows} rows per batch", "type": "too_long"}
+        )
+    if errors:
+        raise BatchValidationError(errors)
+    return arrays
+
+
+async def read_body(request: Request, max_bytes: int = MAX_BATCH_BYTES) -> bytes:
+    """
+    Read the request body, refusing it once it grows past ``max_bytes``.
+
+    A declared ``Content-Length`` over the limit is rejected before anything is
+    read; bodies without one are counted as they stream in.
+
+    Raises:
+        HTTPException: 400 for a malformed ``Content-Length``, 413 for a body
+            over the limit.
+    """
+    too_large = HTTPException(
+        status_code=413, detail=f"Batch bodies are limited to {max_bytes} bytes"
+    )
+    declared = request.headers.get("content-length")
+    if declared is not None:
+        try:
+            length = int(declared)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+        if length > max_bytes:
+            raise too_large
+
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            raise too_large
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def read_feature_batch(request: Request, features: Sequence[str]) -> np.ndarray:
+    """
+    Decode and validate a columnar batch request into a model matrix.
+
+    Args:
+        request: The incoming request.
+        features: Model feature columns, e.g. ``artifact.features``.
+
+    Returns:
+        A ``(n_rows, len(features))`` float64 matrix.
+
+    Raises:
+        HTTPException: 400/415 for undecodable bodies, 413 for bodies over
+            :data:`MAX_BATCH_BYTES`, 422 for invalid columns.
+    """
+    body = await read_body(request)
+
+    def decode() -> np.ndarray:
+        mark_service_start(request, queued_at)
+        columns = validate_columns(decode_columns(body, request.headers.get("content-type")))
+        return build_feature_matrix(columns, features)
+
+    queued_at = time.monotonic()
+    try:
+        return await run_in_threadpool(decode)
+    except BatchFormatError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except BatchValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors)
@@ -4,14 +4,48 @@ import os
 load_dotenv()
 
 REDIS_URL = os.getenv("REDIS_URL")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "40"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+# Idle connections are PINGed before reuse after this many seconds.
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
 SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "5"))
+DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+DATABASE_POOL_RECYCLE = int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+# Per-client token buckets on the prediction routes (requests per second, burst size).
+RATE_LIMIT_PREDICT_RATE = float(os.getenv("RATE_LIMIT_PREDICT_RATE", "20"))
+RATE_LIMIT_PREDICT_BURST = int(os.getenv("RATE_LIMIT_PREDICT_BURST", "40"))
+RATE_LIMIT_BATCH_RATE = float(os.getenv("RATE_LIMIT_BATCH_RATE", "1"))
+RATE_LIMIT_BATCH_BURST = int(os.getenv("RATE_LIMIT_BATCH_BURST", "5"))
+# Comma-separated proxy addresses or networks whose X-Forwarded-For is believed
+# when identifying rate-limited clients, e.g. "10.0.0.0/8,127.0.0.1".
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
+# Prediction requests processed at once by a worker before new ones get a 503.
+MAX_CONCURRENT_PREDICTIONS = int(os.getenv("MAX_CONCURRENT_PREDICTIONS", "32"))
+# Latency targets for load shedding, and how long a target must be missed before
+# batch requests are refused.
+LOAD_SHED_PREDICT_TARGET_MS = float(os.getenv("LOAD_SHED_PREDICT_TARGET_MS", "50"))
+LOAD_SHED_BATCH_TARGET_MS = float(os.getenv("LOAD_SHED_BATCH_TARGET_MS", "2000"))
+LOAD_SHED_INTERVAL_MS = float(os.getenv("LOAD_SHED_INTERVAL_MS", "500"))
+# "json" for one JSON object per log record, anything else for text
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Compress rotated logs and upload them (to LOG_ARCHIVE_DIR if set, else S3)
+LOG_SHIPPING = os.getenv("LOG_SHIPPING", "false").lower() == "true"
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR")
+# Fraction of per-prediction log records kept
+LOG_SAMPLE_RATES = {"app.predictions": float(os.getenv("LOG_PREDICTION_SAMPLE_RATE", "0.01"))}
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 STABILITYAI_APIKEY = os.getenv("STABILITYAI_APIKEY")
 AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
 AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
 REGION = os.getenv("REGION")
 BUCKET_NAME = os.getenv("BUCKET_NAME")
-# EMAIL = os.getenv("EMAIL")
+# "s3" or "filesystem" (objects under STORAGE_ROOT, for local runs and tests)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "s3" if BUCKET_NAME else "filesystem")
+STORAGE_ROOT = os.getenv("STORAGE_ROOT", "object_store")
+STORAGE_MAX_CONCURRENCY = int(os.getenv("STORAGE_MAX_CONCURRENCY", "8"))
+EMAIL = os.getenv("EMAIL")
 # DOMAIN = os.getenv("DOMAIN")
 # PAYSTACK_SECRET_KEY = os.getenv("PAYSTACK_SECRET_KEY")
 # PAYSTACK_BASE_URL = "https://api.paystack.co"
@@ -25,7 +59,14 @@ JWT_EXPIRATION_MINUTES = 60
 EXPIRATION = 300
 # MONGO_DB_URL = os.getenv("MONGO_DB_URL")
 # UNSTRUCTURED_API_KEY = os.getenv("UNSTRUCTURED_API_KEY")
-# BREVO_KEY = os.getenv("BREVO_API_KEY")
+BREVO_KEY = os.getenv("BREVO_API_KEY")
+# "brevo", "ses" or "local" (writes emails to MAIL_OUTBOX_DIR instead of sending them).
+# "local" must be set explicitly; with no transport, OTP emails are not sent.
+MAIL_TRANSPORT = os.getenv("MAIL_TRANSPORT", "brevo" if BREVO_KEY else "")
+MAIL_OUTBOX_DIR = os.getenv("MAIL_OUTBOX_DIR", "mail_outbox")
+MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", "4"))
+MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", "10000"))
+MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", "50"))
 # IPINFO_ACCESS_KEY = os.getenv("IPINFO_KEY")
 # os.environ["GOOGLE_API_KEY"] = os.getenv("GOOGLE_GEMINI_KEY")
 PAYSTACK_IPS = ["52.31.139.75", "52.49.173.169", "52.214.14.220"]
@@ -1,52 +1,140 @@
-# from sqlalchemy import AsyncAdaptedQueuePool
-# from sqlalchemy.orm import sessionmaker
-# from sqlalchemy.orm import Session
+"""
+Async SQLAlchemy engine and sessions.
 
-# from sqlalchemy import create_engine
-# from contextlib import contextmanager
-# from sqlalchemy.orm import relationship, declarative_base
+The engine is created once in the FastAPI lifespan (:func:`database_lifespan`)
+with a bounded connection pool and disposed on shutdown. Handlers get an
+``AsyncSession`` from the :func:`get_session` dependency, so queries in
+``async def`` routes no longer block the event loop for every other request
+on the worker.
 
-# from app.core.constants import SQLALCHEMY_DATABASE_URL
-# # from app.monitoring.services import monitoring
+``SQLALCHEMY_DATABASE_URL`` may name a sync driver; it is mapped to the async
+one (``postgresql://`` -> ``postgresql+asyncpg://``, ``sqlite://`` ->
+``sqlite+aiosqlite://``). For local tests use e.g.
+``sqlite+aiosqlite:///:memory:``, which shares one connection so every session
+sees the same in-memory database.
+"""
 
-# Base = declarative_base()
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
 
+from fastapi import FastAPI, HTTPException, Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import StaticPool
 
-# engine = create_engine(
-#     SQLALCHEMY_DATABASE_URL,
-#     pool_size=10,  # Adjust based on your app's concurrency requirements
-#     max_overflow=5,  # Allows for extra connections in times of high demand
-#     pool_timeout=120,  # Reduces wait time for a connection
-#     pool_recycle=18000,  # Recycles connections every 30 minutes
-#     # echo_pool='debug',  # Logs pool checkouts/checkins (remove in production)
-#     pool_pre_ping=True,
-#     # Any idle transaction request past 20seconds will be terminated
-#     # connect_args={"options": "-c idle_in_transaction_session_timeout=20000"},
-# )
+from app.core.constants import (
+    DATABASE_MAX_OVERFLOW,
+    DATABASE_POOL_RECYCLE,
+    DATABASE_POOL_SIZE,
+    DATABASE_POOL_TIMEOUT,
+    SQLALCHEMY_DATABASE_URL,
+)
 
-# # monitoring.instrument_sqlalchemy(engine=engine)
+logger = logging.getLogger(__name__)
 
+Base = declarative_base()
 
-# def get_session():
-#     with Session(engine) as session:
-#         yield session
+# Sync driver -> async driver for the same database.
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
 
 
-# SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
 
 
-# def get_db():
-#     db = SessionLocal()
-#     try:
-#         yield db
-#     finally:
-#         db.close()
+def create_engine(
+    url: str = SQLALCHEMY_DATABASE_URL,
+    pool_size: int = DATABASE_POOL_SIZE,
+    max_overflow: int = DATABASE_MAX_OVERFLOW,
+    pool_timeout: float = DATABASE_POOL_TIMEOUT,
+    pool_recycle: int = DATABASE_POOL_RECYCLE,
+) -> AsyncEngine:
+    """
+    Create the async engine.
 
+    Args:
+        url: Database URL; sync drivers are mapped to their async counterpart.
+        pool_size: Connections kept open.
+        max_overflow: Extra connections allowed under load.
+        pool_timeout: Seconds to wait for a free connection.
+        pool_recycle: Seconds after which a connection is replaced.
+    """
+    url = async_database_url(url)
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        # One shared connection, otherwise each connection gets its own empty database.
+        return create_async_engine(
+            url, poolclass=StaticPool, connect_args={"check_same_thread": False}
+        )
+    return create_async_engine(
+        url,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=True,
+    )
 
-# @contextmanager
-# def get_session_with_ctx_manager():
-#     session = SessionLocal()
-#     try:
-#         yield session
-#     finally:
-#         session.close()
+
+def create_sessionmaker(engine: AsyncEngine) -> async_sessionmaker:
+    # Objects stay usable after commit without another round trip.
+    return async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
+
+
+@asynccontextmanager
+async def database_lifespan(
+    app: FastAPI, url: Optional[str] = None, create_tables: bool = False
+):
+    """
+    Create the engine on startup and dispose of its pool on shutdown.
+
+    Args:
+        app: The application; the engine and session factory are stored on
+            ``app.state``.
+        url: Overrides ``SQLALCHEMY_DATABASE_URL``.
+        create_tables: Create missing tables (for SQLite test databases).
+    """
+    url = url or SQLALCHEMY_DATABASE_URL
+    if not url:
+        logger.warning("SQLALCHEMY_DATABASE_URL is not set; database-backed routes are disabled")
+        app.state.db_sessionmaker = None
+        yield
+        return
+
+    engine = create_engine(url)
+    if create_tables:
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+    app.state.db_engine = engine
+    app.state.db_sessionmaker = create_sessionmaker(engine)
+    try:
+        yield
+    finally:
+        app.state.db_sessionmaker = None
+        await engine.dispose()
+
+
+async def get_session(request: Request) -> AsyncIterator[AsyncSession]:
+    """Dependency: an ``AsyncSession`` closed when the request finishes."""
+    sessionmaker = getattr(request.app.state, "db_sessionmaker", None)
+    if sessionmaker is None:
+        raise HTTPException(status_code=503, detail="Database is not configured")
+    async with sessionmaker() as session:
+        yield session
@@ -0,0 +1,229 @@
+"""
+Feature engineering shared by model training and the prediction API.
+
+Both models are trained on the same ten features. They used to be defined in a
+notebook cell and re-implemented by hand in each ``/predict`` handler; this
+module is now the single definition for both paths.
+
+- :func:`add_features` / :func:`compute_features` take a frame (or a mapping of
+  column arrays, or a 2-D NumPy block with column names) of flattened statement
+  columns such as ``balance_sheet_Total Assets`` and compute every feature in
+  one vectorised pass. Lags are taken per ticker, so a company's first quarter
+  never inherits the previous company's values.
+- :func:`build_feature_matrix` takes the eight base features (ratios and lags)
+  for one row or many and returns the model matrix with interactions added, in
+  training order. The API calls it with a single request payload.
+
+Example:
+    >>> from app.core.features import build_feature_matrix
+    >>> build_feature_matrix({"current_ratio": 1.5, "quick_ratio": 1.1, ...})
+    array([[1.5, 1.1, ..., 1.65, ...]])
+"""
+
+from typing import Dict, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+ArrayLike = Union[float, Sequence[float], np.ndarray, pd.Series]
+
+# Flattened statement columns used as inputs.
+TOTAL_ASSETS = "balance_sheet_Total Assets"
+TOTAL_CURRENT_ASSETS = "balance_sheet_Total Current Assets"
+TOTAL_CURRENT_LIABILITIES = "balance_sheet_Total Current Liabilities"
+INVENTORY = "balance_sheet_Inventory"
+ACCOUNTS_PAYABLE = "balance_sheet_Accounts Payable"
+TOTAL_REVENUE = "income_stmt_Total Revenue"
+GROSS_PROFIT = "income_stmt_Gross Profit"
+NET_INCOME = "income_stmt_Net Income"
+OPERATING_CASH_FLOW = "cashflow_Operating Cash Flow"
+
+DEFAULT_GROUP_KEY = "Company"
+
+RATIO_FEATURES: List[str] = [
+    "Current_Ratio",
+    "Quick_Ratio",
+    "Debt_to_Equity",
+    "Return_on_Assets",
+    "Operating_Margin",
+]
+
+# Lag feature name -> source column.
+LAG_FEATURES: Dict[str, str] = {
+    "Lagged_Revenue": TOTAL_REVENUE,
+    "Lagged_Net_Income": NET_INCOME,
+    "Lagged_Operating_Cash_Flow": OPERATING_CASH_FLOW,
+}
+
+# Interaction feature name -> (left, right) factors.
+INTERACTION_FEATURES: Dict[str, tuple] = {
+    "Interaction_Current_Quick": ("Current_Ratio", "Quick_Ratio"),
+    "Interaction_Return_Debt": ("Return_on_Assets", "Debt_to_Equity"),
+}
+
+BASE_FEATURES: List[str] = RATIO_FEATURES + list(LAG_FEATURES)
+
+# Column order of the model matrix, as used during training.
+FEATURE_NAMES: List[str] = BASE_FEATURES + list(INTERACTION_FEATURES)
+
+
+def input_field(feature: str) -> str:
+    """Name of the request field carrying ``feature`` (e.g. ``current_ratio``)."""
+    return feature.lower()
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """``numerator / denominator`` where the denominator is positive, else 0."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / denominator, 0.0)
+
+
+def _column(columns: Mapping[str, ArrayLike], name: str, default=None) -> np.ndarray:
+    if name in columns:
+        return np.asarray(columns[name], dtype=np.float64)
+    if default is None:
+        raise KeyError(f"Missing input column: {name}")
+    return np.asarray(default, dtype=np.float64)
+
+
+def compute_ratio_features(columns: Mapping[str, ArrayLike]) -> Dict[str, np.ndarray]:
+    """Compute the five ratio features from flattened statement columns."""
+    current_assets = _column(columns, TOTAL_CURRENT_ASSETS)
+    current_liabilities = _column(columns, TOTAL_CURRENT_LIABILITIES)
+    total_assets = _column(columns, TOTAL_ASSETS)
+    revenue = _column(columns, TOTAL_REVENUE)
+    inventory = _column(columns, INVENTORY, default=0.0)
+
+    return {
+        "Current_Ratio": _safe_ratio(current_assets, current_liabilities),
+        "Quick_Ratio": _safe_ratio(current_assets - inventory, current_liabilities),
+        "Debt_to_Equity": _safe_ratio(_column(columns, ACCOUNTS_PAYABLE), total_assets),
+        "Return_on_Assets": _safe_ratio(_column(columns, NET_INCOME), total_assets),
+        "Operating_Margin": _safe_ratio(_column(columns, GROSS_PROFIT), revenue),
+    }
+
+
+def grouped_lag(values: np.ndarray, groups: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Shift ``values`` down by one row within each group, filling gaps with 0.
+
+    Equivalent to ``series.groupby(groups).shift(1).fillna(0)`` but done with a
+    single stable sort, so it works on plain NumPy blocks. Rows are assumed to
+    be in chronological order within each group; groups need not be contiguous.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lagged = np.zeros_like(values)
+    if len(values) < 2:
+        return lagged
+
+    if groups is None:
+        lagged[1:] = values[:-1]
+    else:
+        codes, _ = pd.factorize(np.asarray(groups), use_na_sentinel=False)
+        order = np.argsort(codes, kind="stable")
+        ordered = values[order]
+        shifted = np.empty_like(ordered)
+        shifted[0] = 0.0
+        shifted[1:] = ordered[:-1]
+        sorted_codes = codes[order]
+        shifted[1:][sorted_codes[1:] != sorted_codes[:-1]] = 0.0
+        lagged[order] = shifted
+
+    return np.nan_to_num(lagged, nan=0.0)
+
+
+def compute_lag_features(
+    columns: Mapping[str, ArrayLike], groups: Optional[np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    """Compute the three previous-quarter features, per group if ``groups`` is given."""
+    return {
+        name: grouped_lag(_column(columns, source), groups)
+        for name, source in LAG_FEATURES.items()
+    }
+
+
+def add_interaction_features(features: Mapping[str, ArrayLike]) -> Dict[str, np.ndarray]:
+    """Return ``features`` with the interaction terms added."""
+    out = {name: np.asarray(value, dtype=np.float64) for name, value in features.items()}
+    for name, (left, right) in INTERACTION_FEATURES.items():
+        out[name] = out[left] * out[right]
+    return out
+
+
+def _as_columns(
+    data: Union[pd.DataFrame, Mapping[str, ArrayLike], np.ndarray],
+    columns: Optional[Sequence[str]] = None,
+) -> Mapping[str, ArrayLike]:
+    if isinstance(data, np.ndarray):
+        if columns is None:
+            raise ValueError("Column names are required when passing a NumPy block")
+        return {name: data[:, position] for position, name in enumerate(columns)}
+    return data
+
+
+def compute_features(
+    data: Union[pd.DataFrame, Mapping[str, ArrayLike], np.ndarray],
+    group_key: Optional[str] = DEFAULT_GROUP_KEY,
+    columns: Optional[Sequence[str]] = None,
+) -> pd.DataFrame:
+    """
+    Compute all model features from flattened statement columns.
+
+    Args:
+        data: A DataFrame, a mapping of column arrays, or a 2-D NumPy block.
+        group_key: Ticker column used to keep lags within a company. Ignored if
+            the column is absent, in which case the whole input is one series
+            (the notebooks' original behaviour).
+        columns: Column names for ``data`` when it is a NumPy block.
+
+    Returns:
+        A DataFrame with :data:`FEATURE_NAMES` columns, aligned with ``data``.
+    """
+    source = _as_columns(data, columns)
+    groups = None
+    if group_key is not None and group_key in source:
+        groups = np.asarray(source[group_key])
+
+    features = compute_ratio_features(source)
+    features.update(compute_lag_features(source, groups))
+    features = add_interaction_features(features)
+
+    index = data.index if isinstance(data, pd.DataFrame) else None
+    return pd.DataFrame({name: features[name] for name in FEATURE_NAMES}, index=index)
+
+
+def add_features(
+    df: pd.DataFrame, group_key: Optional[str] = DEFAULT_GROUP_KEY
+) -> pd.DataFrame:
+    """Return ``df`` with the :data:`FEATURE_NAMES` columns added (or replaced)."""
+    features = compute_features(df, group_key=group_key)
+    return pd.concat([df.drop(columns=FEATURE_NAMES, errors="ignore"), features], axis=1)
+
+
+def build_feature_matrix(
+    base: Mapping[str, ArrayLike], features: Sequence[str] = FEATURE_NAMES
+) -> np.ndarray:
+    """
+    Assemble the model matrix from the eight base features.
+
+    Args:
+        base: Ratio and lag values keyed either by feature name
+            (``Current_Ratio``) or by request field (``current_ratio``). Values
+            may be scalars (a single request) or equal-length arrays.
+        features: Columns to return, in order. Defaults to all ten features;
+            pass an artifact's feature list to match a model trained on a subset.
+
+    Returns:
+        A ``(n_rows, len(features))`` float64 array.
+    """
+    values = {}
+    for name in BASE_FEATURES:
+        if name in base:
+            values[name] = base[name]
+        elif input_field(name) in base:
+            values[name] = base[input_field(name)]
+        else:
+            raise KeyError(f"Missing base feature: {name}")
+
+    full = add_interaction_features(values)
+    return np.column_stack([np.atleast_1d(full[name]) for name in features])
@@ -0,0 +1,197 @@
+"""
+Latency-SLO-aware load shedding for the prediction routes.
+
+Rate limits bound what each client may send. A burst spread over many clients
+can still build a queue in the worker's threadpool, and every request behind
+that queue misses its latency target. :class:`LoadSheddingMiddleware` watches
+for such a standing queue and refuses low-priority work while it lasts.
+
+Each route group has a latency target and a CoDel-style controller (Nichols &
+Jacobson, "Controlling Queue Delay"). The controller is fed the sojourn time
+of every request the route handled: how long it waited for a worker thread,
+as recorded by :func:`mark_service_start` once the prediction handler's work
+starts on the threadpool. This is queueing delay only; the time spent serving
+the request does not count. Responses the handler did not produce (rate-limit
+429s, 503s, validation 422s) and errors are not fed to the controller.
+
+- If the sojourn stays above target for a whole ``interval``, the route is
+  overloaded. A single slow request is not enough.
+- The route is back to normal as soon as one request meets the target, or
+  once it has had nothing in flight and nothing completed for an interval.
+
+While any route is overloaded, new ``BULK`` requests (``/predict/batch``) get
+``503`` with ``Retry-After`` before they are queued. ``CRITICAL`` requests
+(single-row ``/predict``) are never shed here, so they keep their latency
+budget.
+"""
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence
+
+from fastapi import Request
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.constants import (
+    LOAD_SHED_BATCH_TARGET_MS,
+    LOAD_SHED_INTERVAL_MS,
+    LOAD_SHED_PREDICT_TARGET_MS,
+)
+
+CRITICAL = 0
+BULK = 1
+
+# Scope keys: time.monotonic() at arrival, and the measured wait for a thread.
+ARRIVED = "load_shedding.arrived"
+QUEUE_DELAY = "load_shedding.queue_delay"
+
+
+@dataclass(frozen=True)
+class RoutePolicy:
+    """
+    Latency target and priority of one route group.
+
+    Attributes:
+        name: Group name.
+        path_suffix: Requests whose path ends with this belong to the group.
+        priority: ``CRITICAL`` (never shed) or ``BULK``.
+        target: Acceptable sojourn time, in seconds.
+    """
+
+    name: str
+    path_suffix: str
+    priority: int
+    target: float
+
+
+# Checked in order; the first matching suffix wins.
+PREDICTION_POLICIES = (
+    RoutePolicy("batch", "/predict/batch", BULK, LOAD_SHED_BATCH_TARGET_MS / 1000),
+    RoutePolicy("predict", "/predict", CRITICAL, LOAD_SHED_PREDICT_TARGET_MS / 1000),
+)
+
+
+def mark_service_start(request: Request, queued_at: Optional[float] = None) -> None:
+    """
+    Record how long ``request`` waited for a worker thread.
+
+    Call it first thing in the handler code that runs on the threadpool. Only
+    the first call for a request counts.
+
+    Args:
+        request: The request being handled.
+        queued_at: ``time.monotonic()`` when the work was handed to the
+            threadpool. Defaults to the request's arrival, which suits sync
+            endpoints: FastAPI submits them as soon as the body is parsed.
+    """
+    scope = request.scope
+    if QUEUE_DELAY in scope:
+        return
+    start = queued_at if queued_at is not None else scope.get(ARRIVED)
+    if start is not None:
+        scope[QUEUE_DELAY] = time.monotonic() - start
+
+
+class CoDelController:
+    """
+    Detects a standing queue from request sojourn times.
+
+    Args:
+        target: Acceptable sojourn time, in seconds.
+        interval: How long the sojourn must stay above ``target`` (and how
+            long the route must be idle) before the state changes, in seconds.
+    """
+
+    def __init__(self, target: float, interval: float):
+        self.target = target
+        self.interval = interval
+        self.first_above_time = 0.0
+        self.dropping = False
+        self.last_observed = 0.0
+        self.in_flight = 0
+
+    def observe(self, sojourn: float, now: float) -> None:
+        self.last_observed = now
+        if sojourn < self.target:
+            self.first_above_time = 0.0
+            self.dropping = False
+        elif self.first_above_time == 0.0:
+            self.first_above_time = now + self.interval
+        elif now >= self.first_above_time:
+            self.dropping = True
+
+    def overloaded(self, now: float) -> bool:
+        if self.dropping and self.in_flight == 0 and now - self.last_observed > self.interval:
+            # The route has drained, so there is no queue left.
+            self.dropping = False
+            self.first_above_time = 0.0
+        return self.dropping
+
+
+class LoadSheddingMiddleware:
+    """
+    Sheds low-priority requests while a route misses its latency target.
+
+    Args:
+        app: The wrapped ASGI app.
+        policies: Route groups to watch; other paths pass through untouched.
+        interval: CoDel interval, in seconds.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        policies: Sequence[RoutePolicy] = PREDICTION_POLICIES,
+        interval: float = LOAD_SHED_INTERVAL_MS / 1000,
+    ):
+        self.app = app
+        self.policies = tuple(policies)
+        self.interval = interval
+        self.controllers: Dict[str, CoDelController] = {
+            policy.name: CoDelController(policy.target, interval) for policy in self.policies
+        }
+
+    def _policy_for(self, path: str) -> Optional[RoutePolicy]:
+        path = path.rstrip("/")
+        for policy in self.policies:
+            if path.endswith(policy.path_suffix):
+                return policy
+        return None
+
+    def overloaded(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        return any(controller.overloaded(now) for controller in self.controllers.values())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        policy = self._policy_for(scope["path"]) if scope["type"] == "http" else None
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        arrived = time.monotonic()
+        if policy.priority != CRITICAL and self.overloaded(arrived):
+            response = JSONResponse(
+                {"detail": "Server is overloaded; retry later"},
+                status_code=503,
+                headers={"Retry-After": str(max(1, math.ceil(self.interval)))},
+            )
+            await response(scope, receive, send)
+            return
+
+        controller = self.controllers[policy.name]
+        scope[ARRIVED] = arrived
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                queue_delay = scope.get(QUEUE_DELAY)
+                if queue_delay is not None and message["status"] < 400:
+                    controller.observe(queue_delay, time.monotonic())
+            await send(message)
+
+        controller.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            controller.in_flight -= 1
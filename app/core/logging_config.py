@@ -1,39 +1,79 @@
 """
-Logging configuration module for the podcast generation system.
+Logging configuration for the application.
 
-This module provides standardized logging setup across the application.
-It configures a consistent log format and allows for dynamic log level setting.
+:func:`setup_logging` installs a queue-based pipeline so that logging never
+blocks the thread that emits a record:
+
+- The root logger has a single :class:`BoundedQueueHandler`, which puts records
+  on an in-memory queue. When the queue is full, records are dropped and
+  counted instead of blocking.
+- A ``QueueListener`` thread drains the queue into the real handlers (console,
+  rotating file, error file). File writes and rotation therefore happen on
+  that thread.
+- With shipping enabled, the file handler is a :class:`ShippingFileHandler`. On
+  rollover it only renames the full file into ``logs/outbox``. A
+  :class:`LogShipper` thread then gzips it and uploads it with retries. The
+  upload goes to the configured object storage (``app.core.storage``), or,
+  with ``archive_dir``, to a local directory. The outbox holds at most ``MAX_PENDING_UPLOADS`` files; the
+  oldest are dropped if uploads keep failing.
 
 Example:
-    >>> from app.podcast_gen.config.logging_config import setup_logging
-    >>> setup_logging(logging.DEBUG)  # Set debug level logging
+    >>> from app.core.logging_config import setup_logging
+    >>> setup_logging(logging.DEBUG, archive_dir="/tmp/log-archive")
     >>> logger = logging.getLogger(__name__)
     >>> logger.debug('Debug message')
-    2024-01-01 12:00:00 - DEBUG - Debug message
+    2024-01-01 12:00:00 - app.main - DEBUG - Debug message [in app/main.py:12]
 
 The logging format includes:
 - Timestamp in YYYY-MM-DD HH:MM:SS format
-- Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-- Message content
+- Logger name and level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
+- Message content and source location
+
+With ``json_logs=True`` every handler writes one JSON object per line instead.
+The object holds ``time``, ``level``, ``logger``, ``message``, ``request_id`` and
+``location``, plus the entries of ``extra={"fields": {...}}``. Field values
+that are callables are only called when the record is written, on the
+listener thread, so expensive fields cost nothing for records that are
+filtered or sampled away. The callables must therefore be safe to run later
+from another thread.
+
+``sample_rates`` keeps only a fraction of the records below WARNING from
+high-frequency loggers. For example, ``{"app.predictions": 0.01}`` writes
+about one per-prediction record in a hundred. Sampling happens before a
+record is queued; loggers from :func:`get_sampled_logger` sample before the
+record is even created.
 """
 
+import asyncio
+import atexit
+import copy
+import gzip
+import json
 import logging
-import sys
 import os
+import queue
+import random
+import shutil
+import socket
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
 from logging.config import dictConfig
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, List, Mapping, Optional
 
-# import boto3
-import zipfile
-import shutil
-from datetime import datetime, timedelta
-from typing import Optional
+from app.core.constants import LOG_SAMPLE_RATES
+from app.core.request_context import request_id_var
+from app.core.storage import FileSystemStorage, ObjectStorage, get_object_storage
 
-from app.core.constants import BUCKET_NAME
-from app.core.storage import s3_client
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
 
 # Constants and log directory setup
 LOG_DIR = "logs"
+OUTBOX_DIR = os.path.join(LOG_DIR, "outbox")
 if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR)
 
@@ -43,44 +83,326 @@ MAX_LOG_SIZE = 10 * 1024 * 1024  # 10 MB
 BACKUP_COUNT = 5  # Number of backup files to keep
 RETENTION_PERIOD_DAYS = 7  # Retention period for logs
 
+# Queue-based pipeline settings
+QUEUE_SIZE = 10_000  # Records buffered before new ones are dropped
+MAX_PENDING_UPLOADS = 20  # Rotated files kept in the outbox while uploads fail
+UPLOAD_RETRIES = 5
+UPLOAD_BACKOFF = 1.0  # Seconds before the first retry, doubled after each
+UPLOAD_BACKOFF_CAP = 60.0
+SHIP_INTERVAL = 30.0  # Seconds between outbox scans when nothing is rotated
+
+
+class _RelativePaths:
+    """Source paths relative to the working directory at startup, cached per path."""
+
+    def __init__(self):
+        self.cwd = os.getcwd()
+        self._cache: Dict[str, str] = {}
+
+    def __call__(self, pathname: str) -> str:
+        relative = self._cache.get(pathname)
+        if relative is None:
+            relative = pathname
+            if pathname.startswith(self.cwd):
+                relative = os.path.relpath(pathname, self.cwd)
+            self._cache[pathname] = relative
+        return relative
+
+
+def _resolve_fields(record: logging.LogRecord) -> Dict[str, Any]:
+    """Call the lazy values in ``record.fields`` once, for every handler of the record."""
+    fields = getattr(record, "fields", None) or {}
+    if any(callable(value) for value in fields.values()):
+        fields = {key: value() if callable(value) else value for key, value in fields.items()}
+        record.fields = fields
+    return fields
+
 
 class CustomFormatter(logging.Formatter):
     """
     A custom formatter that makes the recorded pathname relative to the current working directory.
+
+    Formats that include ``%(fields)s`` show the evaluated fields, not the callables.
     """
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.relative_path = _RelativePaths()
+        self.uses_fields = "fields" in self._fmt
+
     def format(self, record):
-        if record.pathname.startswith(os.getcwd()):
-            record.pathname = os.path.relpath(record.pathname, os.getcwd())
+        record.pathname = self.relative_path(record.pathname)
+        if self.uses_fields:
+            _resolve_fields(record)
         return super().format(record)
 
 
-class S3Handler(RotatingFileHandler):
+def _json_default(value: Any) -> Any:
+    # Lazy fields nested in containers, NumPy scalars and anything else
+    if callable(value):
+        return value()
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record; callables in ``record.fields`` are evaluated here."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.relative_path = _RelativePaths()
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "location": f"{self.relative_path(record.pathname)}:{record.lineno}",
+        }
+        entry.update(_resolve_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if orjson is not None:
+            return orjson.dumps(
+                entry, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY
+            ).decode()
+        return json.dumps(entry, default=_json_default)
+
+
+class RequestIdFilter(logging.Filter):
+    """Copies the current request id onto the record, on the emitting thread."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
     """
-    A file handler that compresses rotated logs and uploads them to an S3 bucket.
+    Keeps about ``rate`` of the records below WARNING from the configured loggers
+    (and their children); other records always pass.
+
+    Args:
+        rates: Logger name -> fraction of records kept, between 0 and 1.
     """
 
-    def __init__(self, *args, **kwargs):
-        self.s3_client = s3_client
+    def __init__(self, rates: Mapping[str, float]):
+        super().__init__()
+        self.rates = dict(rates)
+        self._resolved: Dict[str, Optional[float]] = {}
+
+    def rate_for(self, name: str) -> Optional[float]:
+        if name not in self._resolved:
+            rate, prefix = None, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._resolved[name] = rate
+        return self._resolved[name]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or getattr(record, "sampled", False):
+            return True
+        rate = self.rate_for(record.name)
+        return rate is None or random.random() < rate
+
+
+_sampling: Optional[SamplingFilter] = None
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """
+    Applies the sampling rate of its logger before a record is even created,
+    which is most of the cost of a log call. Use it for per-request events.
+    """
+
+    def isEnabledFor(self, level):
+        if not self.logger.isEnabledFor(level):
+            return False
+        if level >= logging.WARNING or _sampling is None:
+            return True
+        rate = _sampling.rate_for(self.logger.name)
+        return rate is None or random.random() < rate
+
+    def process(self, msg, kwargs):
+        kwargs["extra"] = {**(kwargs.get("extra") or {}), "sampled": True}
+        return msg, kwargs
+
+
+def get_sampled_logger(name: str) -> SampledLogger:
+    return SampledLogger(logging.getLogger(name), {})
+
+
+class StorageLogBackend:
+    """Uploads archived logs to object storage under ``prefix``."""
+
+    def __init__(self, storage: ObjectStorage, prefix: str = "logs"):
+        self.storage = storage
+        self.prefix = prefix
+
+    def upload(self, file_path: str, name: str) -> None:
+        # The shipper thread has no event loop of its own
+        key = f"{self.prefix}/{name}" if self.prefix else name
+        asyncio.run(self.storage.upload_file(file_path, key, content_type="application/gzip"))
+
+
+class LogShipper:
+    """
+    Background thread that compresses rotated logs and uploads them.
+
+    Rotated files are picked up from ``outbox``, so files left behind by a
+    previous run (or by failed uploads) are shipped too.
+
+    Args:
+        backend: Object with an ``upload(file_path, name)`` method, e.g. a
+            :class:`StorageLogBackend`.
+        outbox: Directory the file handler moves rotated logs into.
+        max_pending: Files kept in the outbox; the oldest beyond this are dropped.
+    """
+
+    def __init__(self, backend, outbox: str = OUTBOX_DIR, max_pending: int = MAX_PENDING_UPLOADS):
+        self.backend = backend
+        self.outbox = outbox
+        self.max_pending = max_pending
+        self.host = socket.gethostname()
+        self.dropped = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(outbox, exist_ok=True)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+        self._thread.start()
+
+    def notify(self) -> None:
+        """Called after a file is moved into the outbox."""
+        self._wake.set()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Ship what is pending (one attempt each) and stop the thread."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _pending(self) -> List[str]:
+        files = [
+            os.path.join(self.outbox, name)
+            for name in os.listdir(self.outbox)
+            if not name.endswith(".part")
+        ]
+        return sorted(files, key=os.path.getmtime)
+
+    def _enforce_limit(self, files: List[str]) -> List[str]:
+        excess = len(files) - self.max_pending
+        for path in files[: max(excess, 0)]:
+            os.remove(path)
+            self.dropped += 1
+            # Not logged: this thread must not feed records back into the pipeline
+            print(f"Log outbox full; dropped {os.path.basename(path)}", file=sys.stderr)
+        return files[max(excess, 0) :]
+
+    def _compress(self, path: str) -> str:
+        if path.endswith(".gz"):
+            return path
+        with open(path, "rb") as source, gzip.open(path + ".gz.part", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.replace(path + ".gz.part", path + ".gz")
+        os.remove(path)
+        return path + ".gz"
+
+    def _upload(self, path: str, retries: int) -> bool:
+        delay = UPLOAD_BACKOFF
+        for attempt in range(retries):
+            try:
+                self.backend.upload(path, f"{self.host}/{os.path.basename(path)}")
+                return True
+            except Exception as e:
+                print(f"Log upload failed ({attempt + 1}/{retries}): {e}", file=sys.stderr)
+                if attempt + 1 == retries or self._stop.wait(delay):
+                    return False
+                delay = min(delay * 2, UPLOAD_BACKOFF_CAP)
+        return False
+
+    def ship_pending(self, retries: int = UPLOAD_RETRIES) -> None:
+        for path in self._enforce_limit(self._pending()):
+            try:
+                path = self._compress(path)
+            except OSError as e:
+                print(f"Could not compress {path}: {e}", file=sys.stderr)
+                continue
+            if self._upload(path, retries):
+                os.remove(path)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.ship_pending()
+            self._wake.wait(SHIP_INTERVAL)
+            self._wake.clear()
+        self.ship_pending(retries=1)
+
+
+class ShippingFileHandler(RotatingFileHandler):
+    """
+    A rotating file handler whose rollover only renames the full file into the
+    shipper's outbox; compression and upload happen on the shipper thread.
+    """
+
+    def __init__(self, *args, shipper: Optional[LogShipper] = None, **kwargs):
+        self.shipper = shipper
         super().__init__(*args, **kwargs)
 
     def doRollover(self):
-        super().doRollover()
-        self.compress_and_upload_to_s3()
+        if self.shipper is None:
+            super().doRollover()
+            return
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        stem = os.path.splitext(os.path.basename(self.baseFilename))[0]
+        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+        if os.path.exists(self.baseFilename):
+            os.replace(self.baseFilename, os.path.join(self.shipper.outbox, f"{stem}_{timestamp}.log"))
+        if not self.delay:
+            self.stream = self._open()
+        self.shipper.notify()
+
 
-    def compress_and_upload_to_s3(self):
-        now = datetime.utcnow()
-        zip_filename = os.path.join(LOG_DIR, f"logs_{now.strftime('%Y%m%d%H%M%S')}.zip")
-        with zipfile.ZipFile(zip_filename, "w") as zipf:
-            for root, _, files in os.walk(LOG_DIR):
-                for file in files:
-                    if file.endswith(".log") and not file.endswith(".zip"):
-                        zipf.write(os.path.join(root, file), arcname=file)
-        self.upload_to_s3(zip_filename, f"logs/{os.path.basename(zip_filename)}")
-        os.remove(zip_filename)
+_traceback_formatter = logging.Formatter()
 
-    def upload_to_s3(self, file_path, s3_key):
-        self.s3_client.upload_file(file_path, BUCKET_NAME, s3_key)
+
+class BoundedQueueHandler(QueueHandler):
+    """``QueueHandler`` that drops records when the queue is full instead of blocking."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Merge the arguments now (they may change after the call returns) and
+        # keep the traceback as text; everything else is formatted by the listener.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+        record.msg, record.args, record.exc_info = record.message, None, None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
 
 def remove_old_logs():
@@ -93,7 +415,7 @@ def remove_old_logs():
         for file in files:
             file_path = os.path.join(root, file)
             if (
-                file.endswith(".log")
+                file.endswith((".log", ".log.gz"))
                 and datetime.fromtimestamp(os.path.getmtime(file_path)) < cutoff
             ):
                 os.remove(file_path)
@@ -106,32 +428,31 @@ LOGGING_CONFIG = {
     "formatters": {
         "default": {
             "()": CustomFormatter,
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            "datefmt": "%Y-%m-%d %H:%M:%S",
-        },
-        "detailed": {
             "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s [in %(pathname)s:%(lineno)d]",
             "datefmt": "%Y-%m-%d %H:%M:%S",
         },
+        "json": {
+            "()": JSONFormatter,
+        },
     },
     "handlers": {
         "console": {
             "class": "logging.StreamHandler",
-            "formatter": "detailed",
+            "formatter": "default",
             "stream": "ext://sys.stdout",
         },
         "file": {
-            # You can switch to S3Handler by changing the "class" value below:
+            # setup_logging switches this to ShippingFileHandler when shipping logs
             "class": "logging.handlers.RotatingFileHandler",
             "filename": DEFAULT_LOG_FILE,
-            "formatter": "detailed",
+            "formatter": "default",
             "maxBytes": MAX_LOG_SIZE,
             "backupCount": BACKUP_COUNT,
         },
         "error_file": {
             "class": "logging.FileHandler",
             "filename": os.path.join(LOG_DIR, "error.log"),
-            "formatter": "detailed",
+            "formatter": "default",
             "level": "ERROR",
         },
     },
@@ -143,24 +464,50 @@ LOGGING_CONFIG = {
     },
 }
 
+_listener: Optional[QueueListener] = None
+_shipper: Optional[LogShipper] = None
+
+
+def shutdown_logging() -> None:
+    """Flush queued records, ship pending logs and stop the background threads."""
+    global _listener, _shipper
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _shipper is not None:
+        _shipper.stop()
+        _shipper = None
+
 
 def setup_logging(
     log_level: Optional[int] = None,
     use_s3_handler: bool = True,
     output_file: Optional[str] = DEFAULT_LOG_FILE,
+    archive_dir: Optional[str] = None,
+    json_logs: bool = False,
+    sample_rates: Optional[Mapping[str, float]] = None,
 ) -> None:
     """
-    Set up standardized logging configuration for the podcast generation system.
+    Set up the queue-based logging pipeline.
 
     Args:
         log_level: Optional logging level to set. If None, defaults to INFO.
                    (e.g., logging.DEBUG for debug output)
         output_file: Optional file path to write logs to. If provided, overrides the default file handler path.
-        use_s3_handler: If True, use the S3Handler for the file handler to compress and upload logs to S3.
+        use_s3_handler: If True, compress rotated logs and upload them in the background.
+        archive_dir: Upload to this local directory instead of S3.
+        json_logs: Write one JSON object per record instead of text.
+        sample_rates: Logger name -> fraction of records below WARNING kept.
+            Defaults to ``LOG_SAMPLE_RATES``.
 
     The final log message format is:
-        YYYY-MM-DD HH:MM:SS - LEVEL - MESSAGE [in pathname:lineno]
+        YYYY-MM-DD HH:MM:SS - NAME - LEVEL - MESSAGE [in pathname:lineno]
     """
+    global _listener, _shipper, _sampling
+    shutdown_logging()
+
     # Remove any existing handlers to avoid duplicate logs
     root_logger = logging.getLogger()
     for handler in root_logger.handlers[:]:
@@ -170,16 +517,43 @@ def setup_logging(
     if output_file:
         LOGGING_CONFIG["handlers"]["file"]["filename"] = output_file
 
-    # Optionally switch the file handler to use the S3Handler for S3 uploads
+    # Rotated files go to a background shipper instead of being uploaded inline
+    file_handler = LOGGING_CONFIG["handlers"]["file"]
+    file_handler.pop("shipper", None)
+    file_handler["class"] = "logging.handlers.RotatingFileHandler"
     if use_s3_handler:
-        LOGGING_CONFIG["handlers"]["file"][
-            "class"
-        ] = "app.core.logging_config.S3Handler"
+        if archive_dir:
+            backend = StorageLogBackend(FileSystemStorage(archive_dir), prefix="")
+        else:
+            backend = StorageLogBackend(get_object_storage())
+        _shipper = LogShipper(backend)
+        file_handler["class"] = "app.core.logging_config.ShippingFileHandler"
+        file_handler["shipper"] = _shipper
+
+    for name in ("console", "file", "error_file"):
+        LOGGING_CONFIG["handlers"][name]["formatter"] = "json" if json_logs else "default"
 
     # Set the log level for the root logger
     LOGGING_CONFIG["loggers"][""]["level"] = (
         log_level if log_level is not None else logging.INFO
     )
 
-    # Apply the logging configuration
+    # Apply the logging configuration, then move the handlers behind a queue
     dictConfig(LOGGING_CONFIG)
+    handlers = root_logger.handlers[:]
+    for handler in handlers:
+        root_logger.removeHandler(handler)
+    log_queue: queue.Queue = queue.Queue(QUEUE_SIZE)
+    queue_handler = BoundedQueueHandler(log_queue)
+    # Filters on the queue handler run on the emitting thread, before queueing
+    _sampling = SamplingFilter(LOG_SAMPLE_RATES if sample_rates is None else sample_rates)
+    queue_handler.addFilter(_sampling)
+    queue_handler.addFilter(RequestIdFilter())
+    root_logger.addHandler(queue_handler)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    if _shipper is not None:
+        _shipper.start()
+
+
+atexit.register(shutdown_logging)
@@ -1,120 +1,387 @@
-import boto3
-import requests
-import brevo_python
-from brevo_python import SendSmtpEmail
-from brevo_python.rest import ApiException
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
+"""
+Background mail queue.
 
+OTP emails used to go out through FastAPI ``BackgroundTasks``: a blocking
+``requests.post`` per email on the API worker's threadpool, which is the pool
+the sync prediction endpoints run in. Now the routes only enqueue a
+:class:`MailMessage` and return.
+
+:class:`MailQueue` runs its own event loop on a dedicated thread, so delivery
+never competes with request handling for the API event loop or threadpool:
+
+- ``workers`` coroutines take messages off the queue, up to ``batch_size`` at
+  a time, and hand each batch to the transport in one call;
+- transports keep one client (HTTP connection pool or SES client) for the
+  queue's lifetime;
+- failed messages are retried with exponential backoff, up to
+  ``max_attempts`` attempts. Permanent errors (rejected addresses) are not
+  retried;
+- at most ``max_pending`` messages wait at once. :meth:`MailQueue.enqueue`
+  raises :class:`MailQueueFull` beyond that, instead of letting the backlog
+  grow without bound.
+
+Transports (``MAIL_TRANSPORT``):
+
+- ``brevo``: Brevo's transactional API over a shared ``httpx.AsyncClient``. A
+  batch is a single request with one ``messageVersions`` entry per message.
+  If Brevo rejects a batch, its messages are resent one per request, so one
+  bad address does not fail the others.
+- ``ses``: AWS SES, one ``send_email`` call per message in worker threads
+  (SES has no batch call for individual HTML bodies).
+- ``local``: writes each message as an ``.html`` file to ``MAIL_OUTBOX_DIR``;
+  the stand-in for local runs and tests. It has to be chosen explicitly.
+
+``MAIL_TRANSPORT`` defaults to ``brevo`` when ``BREVO_API_KEY`` is set. With
+no transport configured, startup logs an error and the OTP routes answer 503.
+An unknown name, or ``brevo`` without a key, fails startup.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+from fastapi import FastAPI, HTTPException, Request
+
+from app.core.constants import (
+    AWS_ACCESS_KEY,
+    AWS_SECRET_KEY,
+    BREVO_KEY,
+    EMAIL,
+    MAIL_BATCH_SIZE,
+    MAIL_OUTBOX_DIR,
+    MAIL_QUEUE_SIZE,
+    MAIL_TRANSPORT,
+    MAIL_WORKERS,
+    REGION,
+)
 from app.core.template import email_otp_template
-from app.core.constants import AWS_ACCESS_KEY, AWS_SECRET_KEY, REGION, EMAIL, BREVO_KEY
 
+logger = logging.getLogger(__name__)
 
-# --- AWS SES Configuration ---
-# SES_CLIENT = boto3.client(
-#     "ses",
-#     region_name=REGION,
-#     aws_access_key_id=AWS_ACCESS_KEY,
-#     aws_secret_access_key=AWS_SECRET_KEY,
-# )
+BREVO_URL = "https://api.brevo.com/v3/smtp/email"
+SENDER_NAME = "PoeAI | Notifications"
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF = 1.0  # Seconds before the first retry, doubled after each
+RETRY_BACKOFF_CAP = 60.0
+DRAIN_TIMEOUT = 10.0
 
-# --- Brevo (Sendinblue) Configuration ---
-# configuration = brevo_python.Configuration()
-# configuration.api_key["api-key"] = BREVO_KEY
-# BREVO_API_INSTANCE = brevo_python.TransactionalEmailsApi(
-#     brevo_python.ApiClient(configuration)
-# )
 
+@dataclass
+class MailMessage:
+    to: str
+    subject: str
+    html: str
+    attempts: int = 0
 
-class EmailService:
-    def __init__(self, otp_expiration: int, ses_client=None, sender_email=EMAIL):
-        """
-        Initializes the EmailService.
 
-        Args:
-            ses_client: AWS SES client.
-            brevo_api_instance: Brevo API instance.
-            sender_email: Sender's email address.
-            otp_expiration: OTP expiration time in seconds.
-        """
+class MailQueueFull(Exception):
+    pass
+
+
+class PermanentMailError(Exception):
+    """The provider rejected the message; retrying will not help."""
+
+
+class LocalTransport:
+    """Writes messages to ``directory`` instead of sending them."""
+
+    def __init__(self, directory: str = MAIL_OUTBOX_DIR):
+        self.directory = directory
+
+    def _write(self, message: MailMessage) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}.html"
+        header = f"<!-- To: {message.to} | Subject: {message.subject} -->\n"
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(header + message.html)
+
+    async def send_batch(self, messages: Sequence[MailMessage]) -> List[Optional[Exception]]:
+        for message in messages:
+            await asyncio.to_thread(self._write, message)
+        return [None] * len(messages)
+
+    async def close(self) -> None:
+        pass
+
+
+class BrevoTransport:
+    """Brevo transactional API; one HTTP request per batch over a reused connection pool."""
+
+    def __init__(self, api_key: Optional[str] = BREVO_KEY, sender_email: Optional[str] = EMAIL):
+        import httpx
+
+        self.client = httpx.AsyncClient(
+            headers={"accept": "application/json", "api-key": api_key or ""},
+            timeout=10.0,
+        )
+        self.sender = {"name": SENDER_NAME, "email": sender_email}
+
+    async def send_batch(self, messages: Sequence[MailMessage]) -> List[Optional[Exception]]:
+        versions = [
+            {"to": [{"email": m.to}], "subject": m.subject, "htmlContent": m.html}
+            for m in messages
+        ]
+        payload = {
+            "sender": self.sender,
+            # Brevo requires top-level content; each version overrides it.
+            "subject": messages[0].subject,
+            "htmlContent": messages[0].html,
+            "messageVersions": versions,
+        }
+        try:
+            response = await self.client.post(BREVO_URL, content=json.dumps(payload))
+        except Exception as e:
+            return [e] * len(messages)
+        if response.status_code < 300:
+            return [None] * len(messages)
+        error: Exception = RuntimeError(f"Brevo returned {response.status_code}: {response.text}")
+        if 400 <= response.status_code < 500 and response.status_code != 429:
+            if len(messages) > 1:
+                # The rejection may come from a single message; find out which.
+                results = await asyncio.gather(*(self.send_batch([m]) for m in messages))
+                return [result[0] for result in results]
+            error = PermanentMailError(str(error))
+        return [error] * len(messages)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class SESTransport:
+    """AWS SES through one boto3 client; messages are sent concurrently in worker threads."""
+
+    def __init__(self, ses_client=None, sender_email: Optional[str] = EMAIL):
+        if ses_client is None:
+            import boto3
+
+            ses_client = boto3.client(
+                "ses",
+                region_name=REGION,
+                aws_access_key_id=AWS_ACCESS_KEY,
+                aws_secret_access_key=AWS_SECRET_KEY,
+            )
         self.ses_client = ses_client
         self.sender_email = sender_email
-        self.otp_expiration = otp_expiration
 
-    def send_email(self, to: str, subject: str, message: str, use_brevo: bool = True):
+    def _send(self, message: MailMessage) -> None:
+        self.ses_client.send_email(
+            Source=self.sender_email,
+            Destination={"ToAddresses": [message.to]},
+            Message={
+                "Subject": {"Data": message.subject, "Charset": "UTF-8"},
+                "Body": {"Html": {"Data": message.html, "Charset": "UTF-8"}},
+            },
+        )
+
+    async def send_batch(self, messages: Sequence[MailMessage]) -> List[Optional[Exception]]:
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._send, m) for m in messages), return_exceptions=True
+        )
+        return [result if isinstance(result, Exception) else None for result in results]
+
+    async def close(self) -> None:
+        pass
+
+
+def create_transport(name: Optional[str] = MAIL_TRANSPORT):
+    """
+    Build the transport called ``name``.
+
+    Returns:
+        The transport, or None if ``name`` is empty (no transport configured).
+
+    Raises:
+        ValueError: ``name`` is unknown, or ``brevo`` has no API key.
+    """
+    if not name:
+        return None
+    if name == "brevo":
+        if not BREVO_KEY:
+            raise ValueError("MAIL_TRANSPORT=brevo requires BREVO_API_KEY")
+        return BrevoTransport()
+    if name == "ses":
+        return SESTransport()
+    if name == "local":
+        logger.warning("MAIL_TRANSPORT=local: emails are written to %s, not sent", MAIL_OUTBOX_DIR)
+        return LocalTransport()
+    raise ValueError(f"Unknown MAIL_TRANSPORT {name!r}; expected brevo, ses or local")
+
+
+class MailQueue:
+    """
+    Delivers messages from a bounded queue on a dedicated thread.
+
+    Args:
+        transport: Object with async ``send_batch(messages)`` (returning one
+            error or None per message) and ``close()``.
+        workers: Batches in flight at once.
+        max_pending: Messages queued or being retried before
+            :meth:`enqueue` raises :class:`MailQueueFull`.
+        batch_size: Messages per transport call.
+        max_attempts: Attempts per message before it is dropped.
+    """
+
+    def __init__(
+        self,
+        transport,
+        workers: int = MAIL_WORKERS,
+        max_pending: int = MAIL_QUEUE_SIZE,
+        batch_size: int = MAIL_BATCH_SIZE,
+        max_attempts: int = MAX_ATTEMPTS,
+    ):
+        self.transport = transport
+        self.workers = workers
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.sent = 0
+        self.failed = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._drain_timeout = DRAIN_TIMEOUT
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=asyncio.run, args=(self._main(),), name="mail-queue", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self, timeout: float = DRAIN_TIMEOUT) -> None:
+        """Deliver what is queued (waiting up to ``timeout`` seconds) and stop."""
+        if self._loop is None or self._thread is None:
+            return
+        self._drain_timeout = timeout
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join(timeout + 5)
+
+    def enqueue(self, message: MailMessage) -> None:
+        """Queue ``message`` for delivery; safe to call from any thread."""
+        if self._loop is None:
+            raise RuntimeError("MailQueue is not running")
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise MailQueueFull(f"{self._pending} emails are already waiting")
+            self._pending += 1
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, message)
+
+    def _finished(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def _main(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._stop = asyncio.Event()
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._ready.set()
+        await self._stop.wait()
+
+        deadline = time.monotonic() + self._drain_timeout
+        while self._pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._pending:
+            logger.warning("Mail queue stopped with %d undelivered emails", self._pending)
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await self.transport.close()
+
+    async def _worker(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                errors = await self.transport.send_batch(batch)
+            except Exception as e:
+                errors = [e] * len(batch)
+            for message, error in zip(batch, errors):
+                if error is None:
+                    self.sent += 1
+                    self._finished()
+                else:
+                    self._retry(message, error)
+
+    def _retry(self, message: MailMessage, error: Exception) -> None:
+        message.attempts += 1
+        if isinstance(error, PermanentMailError) or message.attempts >= self.max_attempts:
+            self.failed += 1
+            self._finished()
+            logger.error(
+                "Giving up on email to %s after %d attempts: %s", message.to, message.attempts, error
+            )
+            return
+        delay = min(RETRY_BACKOFF * 2 ** (message.attempts - 1), RETRY_BACKOFF_CAP)
+        logger.warning("Email to %s failed (%s); retrying in %.0fs", message.to, error, delay)
+        self._loop.call_later(delay, self._queue.put_nowait, message)
+
+
+class EmailService:
+    def __init__(self, otp_expiration: int, mail_queue: MailQueue):
         """
-        Sends an email using either AWS SES or Brevo.
+        Initializes the EmailService.
 
         Args:
-            to: Recipient email address.
-            subject: Email subject.
-            message: Email body (text or HTML).
-            use_brevo: If True, use Brevo; otherwise, use AWS SES.
+            otp_expiration: OTP expiration time in seconds.
+            mail_queue: Queue the emails are handed to.
         """
-        if use_brevo:
-            self._send_email_brevo(to, subject, message)
-        else:
-            self._send_email_ses(to, subject, message)
-
-    def _send_email_ses(self, to: str, subject: str, message: str):
-        """Sends an email using AWS SES."""
-        try:
-            self.ses_client.send_email(
-                Source=self.sender_email,
-                Destination={"ToAddresses": [to]},
-                Message={
-                    "Subject": {"Data": subject, "Charset": "UTF-8"},
-                    "Body": {"Html": {"Data": message, "Charset": "UTF-8"}},
-                },
-            )
-        except (NoCredentialsError, PartialCredentialsError) as e:
-            print(f"Error sending email via SES: {str(e)}")
-
-    def _send_email_brevo(self, to: str, subject: str, message: str):
-        """Sends an email using Brevo with a direct HTTP POST request."""
-        url = "https://api.brevo.com/v3/smtp/email"
-        headers = {
-            "accept": "application/json",
-            "api-key": BREVO_KEY,  # Use your BREVO_KEY constant here
-            "content-type": "application/json",
-        }
-        payload = {
-            "sender": {
-                "name": "PoeAI | Notifications",
-                "email": self.sender_email,  # Use the sender email from the class
-            },
-            "to": [
-                {"email": to, "name": "Recipient Name"}
-            ],  # Customize recipient name as needed
-            "subject": subject,
-            "htmlContent": message,
-        }
-        try:
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
-            print(f"Email sent successfully: {response.json()}")
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending email via Brevo: {e}")
+        self.otp_expiration = otp_expiration
+        self.mail_queue = mail_queue
 
     def send_otp_email(self, to: str, otp_code: str):
         """
-        Sends an OTP email with a custom HTML template.
+        Queues an OTP email with a custom HTML template.
 
         Args:
             to: Recipient email address.
             otp_code: OTP code to include in the email.
+
+        Raises:
+            MailQueueFull: Too many emails are waiting to be delivered.
         """
-        subject = "Your OTP Code"
         expiration_minutes = self.otp_expiration // 60
-        # html_content = f"""
-        # <html>
-        #     <body>
-        #         <h1>Your OTP Code</h1>
-        #         <p>Your OTP code is: <strong>{otp_code}</strong></p>
-        #         <p>This code will expire in <strong>{expiration_minutes} minutes</strong>.</p>
-        #     </body>
-        # </html>
-        # """
         html_content = email_otp_template(
             otp_code=otp_code, expiration_minutes=expiration_minutes
         )
-        self.send_email(to, subject, html_content)
+        self.mail_queue.enqueue(MailMessage(to=to, subject="Your OTP Code", html=html_content))
+
+
+@asynccontextmanager
+async def mail_lifespan(app: FastAPI, transport=None):
+    """Start the mail queue on startup; deliver what is queued and stop it on shutdown."""
+    if transport is None:
+        transport = create_transport(MAIL_TRANSPORT)
+    if transport is None:
+        logger.error("MAIL_TRANSPORT is not set; OTP emails cannot be sent")
+        app.state.mail_queue = None
+        yield
+        return
+    queue = MailQueue(transport)
+    queue.start()
+    app.state.mail_queue = queue
+    try:
+        yield
+    finally:
+        app.state.mail_queue = None
+        await asyncio.to_thread(queue.stop)
+
+
+def get_mail_queue(request: Request) -> MailQueue:
+    queue: Optional[MailQueue] = getattr(request.app.state, "mail_queue", None)
+    if queue is None:
+        raise HTTPException(status_code=503, detail="Mail delivery is not configured")
+    return queue
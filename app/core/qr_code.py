@@ -1,15 +1,56 @@
-import qrcode
+"""
+Badge rendering: a user's badge image with a QR code and their name on it.
+
+``overlay_qr_code`` used to do everything synchronously in the request
+thread: download the badge with ``requests``, build and resize the QR code,
+compose with PIL and upload. :class:`BadgeRenderer` splits the work so that
+a burst of badge requests does not block the API event loop:
+
+- Badge downloads are async (``httpx``) and cached by URL, least recently
+  used first out. After ``BADGE_REVALIDATE_AFTER`` seconds an entry is
+  revalidated with its ``ETag`` (``If-None-Match``), so an unchanged badge
+  costs a 304 instead of a download. Concurrent misses for one URL share a
+  single download.
+- Composition runs in a process pool. Each worker process keeps LRU caches of
+  decoded badges (by URL and ETag), QR images (by payload and size) and fonts,
+  so repeated badges and payloads skip the decode and the QR encoding. A
+  badge with an ETag is first requested by URL and ETag alone; its bytes are
+  only sent to a worker that reports a miss.
+- The result is uploaded through the async object storage (``app.core.storage``).
+
+The app that serves badges owns :data:`badge_renderer`: it enters
+:func:`badge_lifespan` from its lifespan, which starts the pool at startup
+and stops it at shutdown. ``app.main`` serves no badge routes and does not
+start it.
+
+Example:
+    >>> async with badge_lifespan(app):
+    ...     result = await badge_renderer.render(badge_url, qr_data, user_name="ada")
+    ...     result["s3_url"]
+"""
+
+import asyncio
+import base64
+import io
+import multiprocessing
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import qrcode
+from fastapi import FastAPI, HTTPException
 from PIL import Image, ImageDraw, ImageFont
-import requests
-from io import BytesIO
-import base64
-from botocore.exceptions import NoCredentialsError, PartialCredentialsError
-from fastapi import HTTPException
 
+from app.core.storage import ObjectStorage, get_object_storage
 
-from app.core.constants import BUCKET_NAME
-from app.core.storage import s3_client
+BADGE_CACHE_SIZE = 128  # Badge downloads kept in the API process
+BADGE_REVALIDATE_AFTER = 300.0  # Seconds before a cached badge is revalidated
+WORKER_CACHE_SIZE = 64  # Decoded badges / QR images kept per worker process
+RENDER_PROCESSES = 2
 
 
 def generate_qr_code(data: str) -> Image:
@@ -25,15 +66,66 @@ def generate_qr_code(data: str) -> Image:
     return img
 
 
-def overlay_qr_code(
-    badge_image_url: str, qr_code: Image, user_name: str, user_ens_domain: str = None
-) -> dict:
-    badge_image = Image.open(requests.get(badge_image_url, stream=True).raw)
+# Worker-process side. The caches live in each process of the pool.
+
+
+# (url, etag) -> decoded badge, least recently used first out.
+_badges: "OrderedDict[Tuple[str, str], Image.Image]" = OrderedDict()
+
+
+def _decoded_badge(url: str, etag: Optional[str], data: Optional[bytes]) -> Optional[Image.Image]:
+    """
+    The badge from this worker's cache, or decoded from ``data`` on a miss.
+
+    Returns None on a miss without ``data``. Badges without an ETag are never
+    cached: their URL alone does not say whether the content changed.
+    """
+    key = (url, etag)
+    if etag is not None and key in _badges:
+        _badges.move_to_end(key)
+        return _badges[key]
+    if data is None:
+        return None
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if etag is not None:
+        _badges[key] = image
+        while len(_badges) > WORKER_CACHE_SIZE:
+            _badges.popitem(last=False)
+    return image
+
+
+@lru_cache(maxsize=WORKER_CACHE_SIZE)
+def _qr_image(data: str, size: Tuple[int, int]) -> Image.Image:
+    return generate_qr_code(data).get_image().resize(size)
+
+
+@lru_cache(maxsize=16)
+def _font(size: int) -> ImageFont.ImageFont:
+    try:
+        return ImageFont.truetype("arial.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def compose_badge(
+    url: str, etag: Optional[str], badge_data: Optional[bytes], qr_data: str, display_name: str
+) -> Optional[bytes]:
+    """
+    Badge with the QR code in the bottom right corner and the name on top, as PNG.
+
+    Returns None if ``badge_data`` is None and this worker has not decoded the
+    badge yet; call again with the bytes.
+    """
+    badge = _decoded_badge(url, etag, badge_data)
+    if badge is None:
+        return None
+    badge_image = badge.copy()
     qr_code_size = (
         badge_image.width // 4,
         badge_image.height // 4,
     )  # QR code is 1/16 the size of the image
-    qr_code = qr_code.resize(qr_code_size)
+    qr_code = _qr_image(qr_data, qr_code_size)
 
     badge_image.paste(
         qr_code,
@@ -44,33 +136,188 @@ def overlay_qr_code(
     )  # Adjust position
 
     draw = ImageDraw.Draw(badge_image)
-    font_size = (
-        badge_image.height // 16
-    )  # Username or ENS domain is 3/16 the size of the image
-    font = ImageFont.truetype("arial.ttf", font_size)
-
-    display_name = user_ens_domain if user_ens_domain else user_name
-    draw.text((10, 10), display_name, fill="black", font=font)
+    font_size = badge_image.height // 16
+    draw.text((10, 10), display_name, fill="black", font=_font(font_size))
 
-    buffer = BytesIO()
+    buffer = io.BytesIO()
     badge_image.save(buffer, format="PNG")
-    image_bytes = buffer.getvalue()
+    return buffer.getvalue()
 
-    s3_key = f"badges/{user_name}/{uuid.uuid4()}.png"
-    try:
-        s3_client.put_object(
-            Bucket=BUCKET_NAME, Key=s3_key, Body=image_bytes, ContentType="image/png"
-        )
-        s3_url = f"https://{BUCKET_NAME}.s3.amazonaws.com/{s3_key}"
+
+def _ready() -> bool:
+    return True
+
+
+class BadgeRenderer:
+    """
+    Renders and uploads badges without blocking the event loop.
+
+    Args:
+        storage: Where rendered badges are uploaded (default: the shared storage).
+        processes: Size of the composition process pool.
+        cache_size: Badge downloads kept in this process.
+        revalidate_after: Seconds before a cached badge is revalidated.
+    """
+
+    def __init__(
+        self,
+        storage: Optional[ObjectStorage] = None,
+        processes: int = RENDER_PROCESSES,
+        cache_size: int = BADGE_CACHE_SIZE,
+        revalidate_after: float = BADGE_REVALIDATE_AFTER,
+    ):
+        self._storage = storage
+        self.processes = processes
+        self.cache_size = cache_size
+        self.revalidate_after = revalidate_after
+        # url -> (etag, data, checked_at)
+        self._badges: "OrderedDict[str, Tuple[Optional[str], bytes, float]]" = OrderedDict()
+        self._fetching: Dict[str, asyncio.Task] = {}
+        self._client = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def storage(self) -> ObjectStorage:
+        return self._storage if self._storage is not None else get_object_storage()
+
+    def _http(self):
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(timeout=10.0, follow_redirects=True)
+        return self._client
+
+    async def _download(self, url: str) -> Tuple[Optional[str], bytes]:
+        cached = self._badges.get(url)
+        headers = {"If-None-Match": cached[0]} if cached and cached[0] else {}
+        response = await self._http().get(url, headers=headers)
+        if response.status_code == 304 and cached:
+            etag, data = cached[0], cached[1]
+        else:
+            response.raise_for_status()
+            etag, data = response.headers.get("etag"), response.content
+        self._badges[url] = (etag, data, time.monotonic())
+        self._badges.move_to_end(url)
+        while len(self._badges) > self.cache_size:
+            self._badges.popitem(last=False)
+        return etag, data
+
+    async def badge(self, url: str) -> Tuple[Optional[str], bytes]:
+        """``(etag, bytes)`` of the badge at ``url``, from the cache while it is fresh."""
+        cached = self._badges.get(url)
+        if cached and time.monotonic() - cached[2] < self.revalidate_after:
+            self._badges.move_to_end(url)
+            return cached[0], cached[1]
+        task = self._fetching.get(url)
+        if task is None:
+            task = asyncio.create_task(self._download(url))
+            self._fetching[url] = task
+            task.add_done_callback(lambda _: self._fetching.pop(url, None))
+        return await asyncio.shield(task)
+
+    async def start(self) -> None:
+        """
+        Create the HTTP client and the pool's processes up front, from the
+        lifespan of the app serving badges (see :func:`badge_lifespan`).
+        Otherwise the first render pays for it on the event loop.
+        """
+        self._http()
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        await asyncio.gather(*(loop.run_in_executor(pool, _ready) for _ in range(self.processes)))
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Spawned, not forked: the API process runs threads (log listener,
+            # mail queue) whose locks a forked child could inherit held.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def render(
+        self,
+        badge_image_url: str,
+        qr_data: str,
+        user_name: str,
+        user_ens_domain: Optional[str] = None,
+    ) -> dict:
+        """
+        Render the badge for ``user_name`` and upload it.
+
+        Returns:
+            ``{"s3_url": ..., "image_bytes": "data:image/png;base64,..."}``.
+        """
+        try:
+            etag, badge_data = await self.badge(badge_image_url)
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"Could not fetch badge image: {e}")
+
+        display_name = user_ens_domain if user_ens_domain else user_name
+        loop = asyncio.get_running_loop()
+        try:
+            image_bytes = None
+            if etag is not None:
+                # Workers cache decoded badges by URL and ETag; try without the bytes.
+                image_bytes = await loop.run_in_executor(
+                    self._executor(),
+                    compose_badge,
+                    badge_image_url,
+                    etag,
+                    None,
+                    qr_data,
+                    display_name,
+                )
+            if image_bytes is None:
+                image_bytes = await loop.run_in_executor(
+                    self._executor(),
+                    compose_badge,
+                    badge_image_url,
+                    etag,
+                    badge_data,
+                    qr_data,
+                    display_name,
+                )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Could not render badge: {e}")
+
+        key = f"badges/{user_name}/{uuid.uuid4()}.png"
+        try:
+            await self.storage.put_bytes(key, image_bytes, content_type="image/png")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
         return {
-            "s3_url": s3_url,
+            "s3_url": self.storage.url(key),
             "image_bytes": f"data:image/png;base64,{base64.b64encode(image_bytes).decode()}",
         }
-    except NoCredentialsError:
-        raise HTTPException(status_code=500, detail="AWS credentials not available")
-    except PartialCredentialsError:
-        raise HTTPException(status_code=500, detail="Incomplete AWS credentials")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-    return f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+badge_renderer = BadgeRenderer()
+
+
+@asynccontextmanager
+async def badge_lifespan(app: FastAPI, renderer: Optional[BadgeRenderer] = None):
+    """Start the badge renderer on startup and close it on shutdown."""
+    renderer = renderer if renderer is not None else badge_renderer
+    await renderer.start()
+    app.state.badge_renderer = renderer
+    try:
+        yield
+    finally:
+        app.state.badge_renderer = None
+        await renderer.close()
+
+
+async def overlay_qr_code(
+    badge_image_url: str, qr_data: str, user_name: str, user_ens_domain: str = None
+) -> dict:
+    """Render a badge with ``qr_data`` encoded as a QR code; see :meth:`BadgeRenderer.render`."""
+    return await badge_renderer.render(badge_image_url, qr_data, user_name, user_ens_domain)
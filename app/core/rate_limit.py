@@ -0,0 +1,323 @@
+"""
+Rate limiting and admission control for the prediction routes.
+
+:class:`AdmissionControlMiddleware` runs before the request body is read or
+any work is queued. It applies two checks:
+
+1. A per-client token bucket for each route group (single-row ``/predict``
+   and ``/predict/batch`` have separate limits). The authoritative bucket lives
+   in Redis and is updated by one Lua script, so the limit holds across all
+   workers and nodes. Each worker also keeps a local bucket per client with the
+   same limits. A client that already exceeds the limit on one worker is
+   refused without a Redis round trip. If Redis is unreachable, the local
+   bucket decides. Over-limit requests get ``429`` with ``Retry-After``.
+2. A cap on prediction requests in flight on the worker. Once it is reached,
+   new requests get ``503`` with ``Retry-After`` right away instead of waiting
+   in the threadpool queue behind work that already exceeds its latency budget.
+
+Clients are identified by their address. ``X-Forwarded-For`` is only followed
+through proxies listed in ``TRUSTED_PROXIES``. A signed-in user (an
+``access_token`` cookie or bearer token that verifies) also gets the token
+subject, hashed, in their key. Credentials that do not verify are ignored, so
+made-up headers cannot mint new buckets.
+"""
+
+import hashlib
+import ipaddress
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple, Union
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from starlette.datastructures import Headers
+from starlette.requests import cookie_parser
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.constants import (
+    JWT_ALGORITHM,
+    JWT_SECRET_KEY,
+    MAX_CONCURRENT_PREDICTIONS,
+    RATE_LIMIT_BATCH_BURST,
+    RATE_LIMIT_BATCH_RATE,
+    RATE_LIMIT_PREDICT_BURST,
+    RATE_LIMIT_PREDICT_RATE,
+    TRUSTED_PROXIES,
+)
+
+try:
+    from jose import JWTError, jwt
+except ImportError:  # pragma: no cover - only the auth routes need it
+    jwt = None
+
+KEY_PREFIX = "ratelimit:"
+LOCAL_MAX_BUCKETS = 10_000
+# After a Redis error, decide locally for this many seconds before trying again.
+REDIS_RETRY_INTERVAL = 5.0
+
+# Refill and take ``cost`` tokens atomically. Uses the Redis clock, so nodes
+# with skewed clocks still agree. Returns {allowed, tokens left, retry after}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    Token bucket settings for one route group.
+
+    Attributes:
+        name: Group name, part of the bucket key.
+        path_suffix: Requests whose path ends with this belong to the group.
+        rate: Tokens added per second.
+        burst: Bucket size.
+    """
+
+    name: str
+    path_suffix: str
+    rate: float
+    burst: int
+
+
+# Checked in order; the first matching suffix wins.
+PREDICTION_LIMITS = (
+    RateLimit("batch", "/predict/batch", RATE_LIMIT_BATCH_RATE, RATE_LIMIT_BATCH_BURST),
+    RateLimit("predict", "/predict", RATE_LIMIT_PREDICT_RATE, RATE_LIMIT_PREDICT_BURST),
+)
+
+
+class TokenBucket:
+    """In-process token bucket."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1) -> Tuple[bool, float]:
+        """Take ``cost`` tokens; returns (allowed, seconds until they would be available)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
+        return False, (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Per-client token buckets in Redis, with a local bucket in front.
+
+    Args:
+        redis: Shared client; None limits per worker only.
+        max_local_buckets: Local buckets kept, least recently used evicted.
+    """
+
+    def __init__(self, redis: Optional[Redis] = None, max_local_buckets: int = LOCAL_MAX_BUCKETS):
+        self.max_local_buckets = max_local_buckets
+        self._local: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._script = None
+        self._redis_down_until = 0.0
+        self.attach(redis)
+
+    def attach(self, redis: Optional[Redis]) -> None:
+        self.redis = redis
+        self._script = redis.register_script(TOKEN_BUCKET_SCRIPT) if redis is not None else None
+
+    def _local_bucket(self, key: str, limit: RateLimit) -> TokenBucket:
+        bucket = self._local.get(key)
+        if bucket is None:
+            bucket = self._local[key] = TokenBucket(limit.rate, limit.burst)
+            while len(self._local) > self.max_local_buckets:
+                self._local.popitem(last=False)
+        else:
+            self._local.move_to_end(key)
+        return bucket
+
+    async def hit(self, client: str, limit: RateLimit, cost: float = 1) -> Tuple[bool, float]:
+        """
+        Count one request by ``client`` against ``limit``.
+
+        Returns:
+            (allowed, retry_after): ``retry_after`` is in seconds, 0 when allowed.
+        """
+        key = f"{KEY_PREFIX}{limit.name}:{client}"
+        allowed, retry_after = self._local_bucket(key, limit).take(cost)
+        if not allowed or self._script is None or time.monotonic() < self._redis_down_until:
+            return allowed, retry_after
+        try:
+            allowed, _, retry_after = await self._script(
+                keys=[key], args=[limit.rate, limit.burst, cost]
+            )
+        except RedisError:
+            # Redis is down: the per-worker limit is better than none.
+            self._redis_down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+            return True, 0.0
+        return bool(int(allowed)), float(retry_after)
+
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_networks(spec: str) -> Tuple[Network, ...]:
+    """Networks from a comma-separated list of addresses and CIDR blocks."""
+    return tuple(
+        ipaddress.ip_network(part.strip(), strict=False) for part in spec.split(",") if part.strip()
+    )
+
+
+TRUSTED_PROXY_NETWORKS = parse_networks(TRUSTED_PROXIES)
+
+
+def _is_trusted(address: str, trusted: Sequence[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+
+def client_address(scope: Scope, trusted: Sequence[Network] = TRUSTED_PROXY_NETWORKS) -> str:
+    """
+    The client's address, following ``X-Forwarded-For`` through trusted proxies.
+
+    Hops are read from the right (the ones our proxies appended) and the first
+    address that is not a trusted proxy is the client. Anything further left
+    is client-supplied and ignored.
+    """
+    client = scope.get("client")
+    address = client[0] if client else "unknown"
+    if not trusted or not _is_trusted(address, trusted):
+        return address
+    hops: List[str] = []
+    for value in Headers(scope=scope).getlist("x-forwarded-for"):
+        hops.extend(hop.strip() for hop in value.split(",") if hop.strip())
+    for hop in reversed(hops):
+        address = hop
+        if not _is_trusted(hop, trusted):
+            break
+    return address
+
+
+def verified_subject(scope: Scope) -> Optional[str]:
+    """Subject of the request's access token, or None unless its signature verifies."""
+    if jwt is None or not JWT_SECRET_KEY:
+        return None
+    headers = Headers(scope=scope)
+    token = cookie_parser(headers.get("cookie", "")).get("access_token")
+    if not token:
+        authorization = headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            token = authorization[7:].strip()
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get("sub")
+    return subject if isinstance(subject, str) and subject else None
+
+
+def client_identity(scope: Scope) -> str:
+    identity = "ip:" + client_address(scope)
+    subject = verified_subject(scope)
+    if subject is not None:
+        identity += ":user:" + hashlib.sha256(subject.encode()).hexdigest()[:32]
+    return identity
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionControlMiddleware:
+    """
+    Rate limits and caps concurrency on the prediction routes.
+
+    Redis is looked up on ``app.state.redis`` (see ``app.core.redis``) when the
+    first request arrives, so the middleware can be added before the lifespan
+    has run.
+
+    Args:
+        app: The wrapped ASGI app.
+        limits: Route groups to limit; other paths pass through untouched.
+        max_concurrent: Requests to these routes handled at once by this worker.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limits: Sequence[RateLimit] = PREDICTION_LIMITS,
+        max_concurrent: int = MAX_CONCURRENT_PREDICTIONS,
+    ):
+        self.app = app
+        self.limits = tuple(limits)
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.limiter: Optional[RateLimiter] = None
+
+    def _limit_for(self, path: str) -> Optional[RateLimit]:
+        path = path.rstrip("/")
+        for limit in self.limits:
+            if path.endswith(limit.path_suffix):
+                return limit
+        return None
+
+    def _get_limiter(self, scope: Scope) -> RateLimiter:
+        redis_pool = getattr(scope["app"].state, "redis", None) if "app" in scope else None
+        redis = redis_pool.client if redis_pool is not None else None
+        if self.limiter is None:
+            self.limiter = RateLimiter(redis)
+        elif self.limiter.redis is not redis:
+            self.limiter.attach(redis)
+        return self.limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = self._limit_for(scope["path"]) if scope["type"] == "http" else None
+        if limit is None or scope.get("method") == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        allowed, retry_after = await self._get_limiter(scope).hit(client_identity(scope), limit)
+        if not allowed:
+            await _reject(429, "Rate limit exceeded", retry_after)(scope, receive, send)
+            return
+
+        if self.in_flight >= self.max_concurrent:
+            await _reject(503, "Server is at capacity", 1)(scope, receive, send)
+            return
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
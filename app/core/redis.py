@@ -1,34 +1,179 @@
+"""
+Application-wide Redis connection pool.
+
+One :class:`RedisPool` is created in the FastAPI lifespan and stored on
+``app.state.redis``; request handlers get its client with the
+:func:`get_redis_connection` dependency instead of opening a pool per request.
+
+- Idle connections are PINGed before reuse (``health_check_interval``) and
+  commands are retried with exponential backoff on connection errors and
+  timeouts, so a Redis restart costs a few retries instead of failing requests.
+- :meth:`RedisPool.ensure_connected` drops every pooled connection and
+  reconnects if a PING fails; ``/health/redis`` uses it.
+- :meth:`RedisPool.get_many` / :meth:`RedisPool.set_many` /
+  :meth:`RedisPool.delete_many` batch keys into pipelined round trips.
+
+For tests, pass any ``redis.asyncio``-compatible client as ``client``, e.g.
+``RedisPool(client=fakeredis.aioredis.FakeRedis())``.
+"""
+
+import logging
 from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
 
-# import aioredis
-import redis
-from redis.asyncio import Redis
-from fastapi import Depends
-import os
+from fastapi import FastAPI, HTTPException, Request
+from redis.asyncio import ConnectionPool, Redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, RedisError, TimeoutError
 
-from app.core.constants import REDIS_URL
+from app.core.constants import (
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_SOCKET_TIMEOUT,
+    REDIS_URL,
+)
 
+logger = logging.getLogger(__name__)
 
-async def get_redis_pool() -> Redis:
-    pool = Redis.from_url(REDIS_URL, max_connections=40)
-    print("connection redis: ", pool)
-    return pool
+RETRIES = 3
+PIPELINE_BATCH_SIZE = 500
+
+
+def _batches(items: Sequence, size: int) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class RedisPool:
+    """
+    A shared Redis client over one bounded connection pool.
+
+    Args:
+        url: Redis URL; defaults to ``REDIS_URL``.
+        max_connections: Upper bound on open connections.
+        socket_timeout: Seconds before a connect or command times out.
+        health_check_interval: Idle seconds after which a connection is
+            PINGed before it is reused.
+        client: Use this client instead of connecting to ``url``.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = REDIS_URL,
+        max_connections: int = REDIS_MAX_CONNECTIONS,
+        socket_timeout: float = REDIS_SOCKET_TIMEOUT,
+        health_check_interval: int = REDIS_HEALTH_CHECK_INTERVAL,
+        client: Optional[Redis] = None,
+    ):
+        self._pool: Optional[ConnectionPool] = None
+        if client is None:
+            if not url:
+                raise ValueError("REDIS_URL is not set")
+            self._pool = ConnectionPool.from_url(
+                url,
+                max_connections=max_connections,
+                socket_timeout=socket_timeout,
+                socket_connect_timeout=socket_timeout,
+                health_check_interval=health_check_interval,
+                retry=Retry(ExponentialBackoff(cap=1.0, base=0.05), RETRIES),
+                retry_on_error=[ConnectionError, TimeoutError],
+            )
+            client = Redis(connection_pool=self._pool)
+        self.client = client
+
+    async def ping(self) -> bool:
+        try:
+            return bool(await self.client.ping())
+        except RedisError:
+            return False
 
+    async def ensure_connected(self) -> bool:
+        """PING; on failure drop all pooled connections and try once more."""
+        if await self.ping():
+            return True
+        if self._pool is not None:
+            await self._pool.disconnect(inuse_connections=True)
+        return await self.ping()
 
-async def get_redis_connection():
-    pool = await get_redis_pool()  # Acquire the connection pool
-    async with pool as conn:  # Acquire a connection from the pool
-        yield conn
+    async def get_many(
+        self, keys: Sequence[str], batch_size: int = PIPELINE_BATCH_SIZE
+    ) -> List[Optional[bytes]]:
+        """Values of ``keys`` (None where missing), ``batch_size`` keys per MGET."""
+        if not keys:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for batch in _batches(list(keys), batch_size):
+                pipe.mget(batch)
+            results = await pipe.execute()
+        return [value for batch in results for value in batch]
+
+    async def set_many(
+        self,
+        mapping: Mapping[str, Any],
+        ttl: Optional[int] = None,
+        batch_size: int = PIPELINE_BATCH_SIZE,
+    ) -> None:
+        """SET every item, expiring after ``ttl`` seconds if given, in pipelined batches."""
+        items = list(mapping.items())
+        for batch in _batches(items, batch_size):
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in batch:
+                    pipe.set(key, value, ex=ttl)
+                await pipe.execute()
+
+    async def delete_many(self, keys: Sequence[str], batch_size: int = PIPELINE_BATCH_SIZE) -> int:
+        """Delete ``keys``; returns how many existed."""
+        deleted = 0
+        for batch in _batches(list(keys), batch_size):
+            deleted += await self.client.delete(*batch)
+        return deleted
+
+    async def close(self) -> None:
+        await self.client.aclose()
+        if self._pool is not None:
+            await self._pool.disconnect()
 
 
 @asynccontextmanager
-async def get_redis_session(redis_pool: Redis):
-    # Get a connection from the pool
-    redis = await redis_pool.acquire()
+async def redis_lifespan(app: FastAPI, client: Optional[Redis] = None):
+    """
+    Create the shared pool on startup and close it on shutdown.
 
+    Without ``REDIS_URL`` the app still starts (the prediction endpoints do not
+    need Redis); routes depending on Redis then answer 503.
+    """
+    if client is None and not REDIS_URL:
+        logger.warning("REDIS_URL is not set; Redis-backed routes are disabled")
+        app.state.redis = None
+        yield
+        return
+
+    pool = RedisPool(client=client)
+    if not await pool.ping():
+        logger.warning("Redis is not reachable yet; connections will be retried on use")
+    app.state.redis = pool
     try:
-        # Yield the connection for use in the with block
-        yield redis
+        yield
     finally:
-        # Release the connection back to the pool
-        redis_pool.release(redis)
+        app.state.redis = None
+        await pool.close()
+
+
+def get_redis_pool(request: Request) -> RedisPool:
+    pool: Optional[RedisPool] = getattr(request.app.state, "redis", None)
+    if pool is None:
+        raise HTTPException(status_code=503, detail="Redis is not configured")
+    return pool
+
+
+def get_redis_connection(request: Request) -> Redis:
+    """Dependency: the shared Redis client (connections are borrowed per command)."""
+    return get_redis_pool(request).client
+
+
+async def redis_health(request: Request) -> Dict[str, Any]:
+    pool = get_redis_pool(request)
+    if not await pool.ensure_connected():
+        raise HTTPException(status_code=503, detail="Redis is unavailable")
+    return {"redis": "ok"}
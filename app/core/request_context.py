@@ -0,0 +1,80 @@
+"""
+Per-request context shared with the logging pipeline.
+
+:class:`RequestContextMiddleware` gives every HTTP and WebSocket request an id.
+It uses the incoming ``X-Request-ID`` header if it looks sane, otherwise it
+generates one. The id is stored in :data:`request_id_var` and echoed back in
+the response header. Log records emitted while the request is handled carry
+it as ``request_id``, because ``RequestIdFilter`` in
+``app.core.logging_config`` reads the context variable. Sync endpoints run in
+the threadpool with a copy of the context, so their records carry it too.
+
+The middleware also writes one access record per request to the
+``app.requests`` logger with the method, path, status and duration.
+"""
+
+import logging
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUEST_ID_HEADER = "x-request-id"
+MAX_REQUEST_ID_LENGTH = 128
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+access_logger = logging.getLogger("app.requests")
+
+
+def _valid_request_id(value: Optional[str]) -> bool:
+    return bool(value) and len(value) <= MAX_REQUEST_ID_LENGTH and value.isprintable()
+
+
+class RequestContextMiddleware:
+    """Assigns request ids and logs one access record per request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get(REQUEST_ID_HEADER)
+        if not _valid_request_id(request_id):
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        started = time.perf_counter()
+        status_code = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if access_logger.isEnabledFor(logging.INFO):
+                access_logger.info(
+                    "%s %s %s",
+                    scope.get("method", "WS"),
+                    scope["path"],
+                    status_code,
+                    extra={
+                        "fields": {
+                            "method": scope.get("method", "WS"),
+                            "path": scope["path"],
+                            "status": status_code,
+                            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+                        }
+                    },
+                )
+            request_id_var.reset(token)
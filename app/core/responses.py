@@ -0,0 +1,195 @@
+"""
+Response encodings for prediction results, chosen by the ``Accept`` header.
+
+Batch results are columns of floats. Formatting them as JSON text and then
+gzipping the text is where most of the response time goes for large batches,
+so the prediction endpoints can also answer with a compact binary encoding:
+
+- ``application/json`` (default): rendered with ``orjson``, which serialises
+  NumPy arrays and scalars natively, or the standard library with a NumPy
+  fallback;
+- ``application/x-npz``: a ``numpy.savez`` archive with one array per field;
+- ``application/msgpack``: MessagePack (needs ``msgpack``);
+- ``application/vnd.apache.arrow.stream``: an Arrow IPC stream (needs ``pyarrow``).
+
+Binary encodings are already compact, so :class:`NegotiatedGZipMiddleware`
+does not gzip responses to requests that negotiate one.
+
+Example:
+    >>> @router.post("/predict/batch")
+    ... async def predict(request: Request, media_type: str = Depends(response_media_type)):
+    ...     return encode_response(media_type, {"predicted_cash_flow": prediction})
+"""
+
+import io
+import json
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+JSON = "application/json"
+NPZ = "application/x-npz"
+MSGPACK = "application/msgpack"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# Aliases clients commonly send for the same encodings.
+MEDIA_TYPE_ALIASES = {"application/x-msgpack": MSGPACK}
+
+
+def _plain(value: Any) -> Any:
+    """
+    ``json`` fallback for NumPy values, and ``orjson``'s for the arrays it does
+    not serialise natively (such as non-contiguous column views).
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def render_json(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_plain, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, default=_plain, separators=(",", ":")).encode()
+
+
+def _columns(content: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """Array-valued fields of ``content``; fields that are None are left out."""
+    return {name: np.asarray(value) for name, value in content.items() if value is not None}
+
+
+def render_npz(content: Mapping[str, Any]) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(buffer, **_columns(content))
+    return buffer.getvalue()
+
+
+def render_msgpack(content: Mapping[str, Any]) -> bytes:
+    return msgpack.packb(content, default=_plain)
+
+
+def render_arrow(content: Mapping[str, Any]) -> bytes:
+    columns = {name: np.atleast_1d(values) for name, values in _columns(content).items()}
+    table = pa.table(columns)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class NumpyJSONResponse(JSONResponse):
+    """JSON response that accepts NumPy arrays and scalars in its content."""
+
+    def render(self, content: Any) -> bytes:
+        return render_json(content)
+
+
+def _renderers() -> Dict[str, Callable[[Any], bytes]]:
+    renderers = {JSON: render_json, NPZ: render_npz}
+    if msgpack is not None:
+        renderers[MSGPACK] = render_msgpack
+    if pa is not None:
+        renderers[ARROW_STREAM] = render_arrow
+    return renderers
+
+
+RENDERERS = _renderers()
+COMPACT_MEDIA_TYPES = frozenset(RENDERERS) - {JSON}
+
+
+def _parse_accept(accept: str) -> List[Tuple[str, float]]:
+    entries = []
+    for part in accept.split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        if not media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        entries.append((MEDIA_TYPE_ALIASES.get(media_type.lower(), media_type.lower()), quality))
+    # Stable sort: equally weighted types keep the client's order.
+    return sorted(entries, key=lambda entry: -entry[1])
+
+
+def negotiate_media_type(accept: Optional[str]) -> Optional[str]:
+    """
+    Best supported media type for an ``Accept`` header.
+
+    Returns:
+        JSON for a missing header or a wildcard, or None if the client accepts
+        none of the supported encodings.
+    """
+    if not accept:
+        return JSON
+    for media_type, quality in _parse_accept(accept):
+        if quality <= 0:
+            continue
+        if media_type in RENDERERS:
+            return media_type
+        if media_type in ("*/*", "application/*"):
+            return JSON
+    return None
+
+
+def response_media_type(request: Request) -> str:
+    """
+    Dependency resolving the response encoding before any work is done.
+
+    Raises:
+        HTTPException: 406 if no supported encoding is acceptable.
+    """
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    if media_type is None:
+        raise HTTPException(
+            status_code=406, detail=f"Supported response types: {', '.join(RENDERERS)}"
+        )
+    return media_type
+
+
+def encode_response(media_type: str, content: Mapping[str, Any]) -> Response:
+    """
+    Encode ``content`` as ``media_type``.
+
+    Args:
+        media_type: One of :data:`RENDERERS`, e.g. from :func:`response_media_type`.
+        content: Result fields; values may be NumPy arrays, scalars or None.
+    """
+    return Response(content=RENDERERS[media_type](content), media_type=media_type)
+
+
+class NegotiatedGZipMiddleware(GZipMiddleware):
+    """``GZipMiddleware`` that leaves responses in compact binary encodings alone."""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            accept = Headers(scope=scope).get("accept")
+            if negotiate_media_type(accept) in COMPACT_MEDIA_TYPES:
+                await self.app(scope, receive, send)
+                return
+        await super().__call__(scope, receive, send)
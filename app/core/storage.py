@@ -1,11 +1,455 @@
-# core/storage.py
-import boto3
+"""
+Object storage with an async API.
 
-from app.core.constants import BUCKET_NAME, AWS_ACCESS_KEY, AWS_SECRET_KEY, REGION
+:class:`ObjectStorage` is the interface; two backends implement it:
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=REGION,
+- :class:`S3Storage`: boto3 (imported when the backend is created, not at
+  import time). The blocking calls run in worker threads. Files above
+  ``multipart_threshold`` are uploaded as concurrent multipart parts and
+  downloaded as concurrent ranged GETs.
+- :class:`FileSystemStorage`: objects are files under a root directory, for
+  local runs and tests. Writes go to a temporary file first, so readers never
+  see partial objects.
+
+Both backends bound concurrency: batch operations
+(:meth:`ObjectStorage.upload_many`, :meth:`ObjectStorage.download_directory`,
+...) and the parts of one multipart transfer run at most ``max_concurrency``
+at a time.
+
+:func:`get_object_storage` returns the shared instance configured by
+``STORAGE_BACKEND`` (``s3`` or ``filesystem``) and ``STORAGE_ROOT``. The log
+shipper (``app.core.logging_config``), the model registry
+(``ModelRegistry.push`` / ``pull``) and the statement store
+(``StatementStore.push`` / ``pull``) can all use it.
+
+Example:
+    >>> storage = FileSystemStorage("/tmp/objects")
+    >>> await storage.upload_directory("models/registry/cash_flow/v0003", "models/cash_flow/v0003")
+
+From the command line::
+
+    python -m app.core.storage push models/registry models/registry
+    python -m app.core.storage pull models/registry models/registry
+    python -m app.core.storage ls models/
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable, Iterable, List, Optional, Sequence, Tuple
+
+from app.core.constants import (
+    AWS_ACCESS_KEY,
+    AWS_SECRET_KEY,
+    BUCKET_NAME,
+    REGION,
+    STORAGE_BACKEND,
+    STORAGE_MAX_CONCURRENCY,
+    STORAGE_ROOT,
 )
+
+MULTIPART_THRESHOLD = 16 * 1024 * 1024  # 16 MB
+PART_SIZE = 8 * 1024 * 1024  # 8 MB; S3 needs at least 5 MB per part but the last
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+async def _bounded(calls: Sequence[Callable[[], Awaitable]], limit: int) -> list:
+    """Run ``calls`` concurrently, at most ``limit`` at a time, in order of results."""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(call):
+        async with semaphore:
+            return await call()
+
+    return await asyncio.gather(*(run(call) for call in calls))
+
+
+def _local_files(local_dir: str) -> List[str]:
+    """Files under ``local_dir`` as ``/``-separated relative paths."""
+    found = []
+    for root, _, files in os.walk(local_dir):
+        for name in files:
+            relative = os.path.relpath(os.path.join(root, name), local_dir)
+            found.append(relative.replace(os.sep, "/"))
+    return sorted(found)
+
+
+def _join_key(prefix: str, name: str) -> str:
+    return f"{prefix.rstrip('/')}/{name}" if prefix else name
+
+
+class ObjectStorage(ABC):
+    """
+    Async object storage; keys are ``/``-separated paths.
+
+    Missing objects raise ``FileNotFoundError``.
+
+    Args:
+        max_concurrency: Transfers (or parts of one transfer) run at once.
+    """
+
+    def __init__(self, max_concurrency: int = STORAGE_MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+
+    @abstractmethod
+    async def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_bytes(self, key: str) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upload_file(self, path: str, key: str, content_type: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def download_file(self, key: str, path: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_keys(self, prefix: str = "") -> List[str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        raise NotImplementedError
+
+    async def upload_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        """Upload ``(path, key)`` pairs, ``max_concurrency`` at a time."""
+        calls = [lambda path=path, key=key: self.upload_file(path, key) for path, key in items]
+        await _bounded(calls, self.max_concurrency)
+
+    async def download_many(self, items: Iterable[Tuple[str, str]]) -> None:
+        """Download ``(key, path)`` pairs, ``max_concurrency`` at a time."""
+        calls = [lambda key=key, path=path: self.download_file(key, path) for key, path in items]
+        await _bounded(calls, self.max_concurrency)
+
+    async def upload_directory(
+        self, local_dir: str, prefix: str, skip_existing: bool = False
+    ) -> List[str]:
+        """
+        Upload every file under ``local_dir`` to ``prefix``.
+
+        Args:
+            local_dir: Directory to upload.
+            prefix: Key prefix; relative paths are appended to it.
+            skip_existing: Leave keys that already exist alone (for
+                content-addressed or immutable files).
+
+        Returns:
+            The keys uploaded.
+        """
+        names = _local_files(local_dir)
+        if skip_existing:
+            existing = set(await self.list_keys(prefix))
+            names = [name for name in names if _join_key(prefix, name) not in existing]
+        items = [(os.path.join(local_dir, name), _join_key(prefix, name)) for name in names]
+        await self.upload_many(items)
+        return [key for _, key in items]
+
+    async def download_directory(
+        self, prefix: str, local_dir: str, skip_existing: bool = False
+    ) -> List[str]:
+        """Download every key under ``prefix`` into ``local_dir``; returns the paths written."""
+        base = prefix.rstrip("/") + "/" if prefix else ""
+        items = []
+        for key in await self.list_keys(base):
+            path = os.path.join(local_dir, *key[len(base) :].split("/"))
+            if not (skip_existing and os.path.exists(path)):
+                items.append((key, path))
+        await self.download_many(items)
+        return [path for _, path in items]
+
+
+class FileSystemStorage(ObjectStorage):
+    """Objects as files under ``root``."""
+
+    def __init__(self, root: str = STORAGE_ROOT, max_concurrency: int = STORAGE_MAX_CONCURRENCY):
+        super().__init__(max_concurrency)
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, *key.split("/")))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid key: {key!r}")
+        return path
+
+    @staticmethod
+    def _atomic_copy(source: str, target: str) -> None:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp = f"{target}.{uuid.uuid4().hex}.part"
+        try:
+            with open(source, "rb") as src, open(temp, "wb") as dst:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            os.replace(temp, target)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+    @staticmethod
+    def _atomic_write(target: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp = f"{target}.{uuid.uuid4().hex}.part"
+        with open(temp, "wb") as f:
+            f.write(data)
+        os.replace(temp, target)
+
+    @staticmethod
+    def _read(path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    async def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        await asyncio.to_thread(self._atomic_write, self._path(key), data)
+
+    async def get_bytes(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._read, self._path(key))
+
+    async def upload_file(self, path: str, key: str, content_type: Optional[str] = None) -> None:
+        await asyncio.to_thread(self._atomic_copy, path, self._path(key))
+
+    async def download_file(self, key: str, path: str) -> None:
+        await asyncio.to_thread(self._atomic_copy, self._path(key), path)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(os.path.isfile, self._path(key))
+
+    async def delete(self, key: str) -> None:
+        try:
+            await asyncio.to_thread(os.remove, self._path(key))
+        except FileNotFoundError:
+            pass
+
+    async def list_keys(self, prefix: str = "") -> List[str]:
+        def scan() -> List[str]:
+            keys = [key for key in _local_files(self.root) if not key.endswith(".part")]
+            return [key for key in keys if key.startswith(prefix)]
+
+        return await asyncio.to_thread(scan)
+
+    def url(self, key: str) -> str:
+        return "file://" + self._path(key)
+
+
+class S3Storage(ObjectStorage):
+    """
+    Objects in an S3 bucket.
+
+    Args:
+        bucket: Bucket name; defaults to ``BUCKET_NAME``.
+        client: boto3 S3 client (created from the AWS settings if omitted).
+        max_concurrency: Transfers, or parts of one transfer, run at once.
+        multipart_threshold: Files at least this large use multipart
+            uploads and ranged downloads.
+        part_size: Bytes per part.
+    """
+
+    def __init__(
+        self,
+        bucket: Optional[str] = BUCKET_NAME,
+        client=None,
+        max_concurrency: int = STORAGE_MAX_CONCURRENCY,
+        multipart_threshold: int = MULTIPART_THRESHOLD,
+        part_size: int = PART_SIZE,
+    ):
+        super().__init__(max_concurrency)
+        if client is None:
+            import boto3
+            from botocore.config import Config
+
+            client = boto3.client(
+                "s3",
+                aws_access_key_id=AWS_ACCESS_KEY,
+                aws_secret_access_key=AWS_SECRET_KEY,
+                region_name=REGION,
+                # Enough pooled connections for every concurrent part
+                config=Config(max_pool_connections=max(10, max_concurrency)),
+            )
+        self.client = client
+        self.bucket = bucket
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+
+    async def _call(self, method: str, **kwargs):
+        from botocore.exceptions import ClientError
+
+        try:
+            return await asyncio.to_thread(getattr(self.client, method), Bucket=self.bucket, **kwargs)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(kwargs.get("Key")) from e
+            raise
+
+    async def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        extra = {"ContentType": content_type} if content_type else {}
+        await self._call("put_object", Key=key, Body=data, **extra)
+
+    async def get_bytes(self, key: str) -> bytes:
+        response = await self._call("get_object", Key=key)
+        return await asyncio.to_thread(response["Body"].read)
+
+    @staticmethod
+    def _read_range(path: str, offset: int, length: int) -> bytes:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    async def upload_file(self, path: str, key: str, content_type: Optional[str] = None) -> None:
+        size = os.path.getsize(path)
+        if size < self.multipart_threshold:
+            data = await asyncio.to_thread(self._read_range, path, 0, size)
+            await self.put_bytes(key, data, content_type)
+            return
+
+        extra = {"ContentType": content_type} if content_type else {}
+        upload = await self._call("create_multipart_upload", Key=key, **extra)
+        upload_id = upload["UploadId"]
+
+        async def send_part(number: int) -> dict:
+            offset = (number - 1) * self.part_size
+            body = await asyncio.to_thread(self._read_range, path, offset, self.part_size)
+            response = await self._call(
+                "upload_part", Key=key, UploadId=upload_id, PartNumber=number, Body=body
+            )
+            return {"PartNumber": number, "ETag": response["ETag"]}
+
+        count = math.ceil(size / self.part_size)
+        try:
+            parts = await _bounded(
+                [lambda number=number: send_part(number) for number in range(1, count + 1)],
+                self.max_concurrency,
+            )
+            await self._call(
+                "complete_multipart_upload",
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await self._call("abort_multipart_upload", Key=key, UploadId=upload_id)
+            raise
+
+    @staticmethod
+    def _write_file(path: str, data: bytes) -> None:
+        with open(path, "wb") as f:
+            f.write(data)
+
+    @staticmethod
+    def _write_range(path: str, offset: int, data: bytes) -> None:
+        with open(path, "r+b") as f:
+            f.seek(offset)
+            f.write(data)
+
+    async def download_file(self, key: str, path: str) -> None:
+        head = await self._call("head_object", Key=key)
+        size = head["ContentLength"]
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp = f"{path}.{uuid.uuid4().hex}.part"
+        try:
+            if size < self.multipart_threshold:
+                data = await self.get_bytes(key)
+                await asyncio.to_thread(self._write_file, temp, data)
+            else:
+                with open(temp, "wb") as f:
+                    f.truncate(size)
+
+                async def fetch(offset: int) -> None:
+                    end = min(offset + self.part_size, size) - 1
+                    response = await self._call("get_object", Key=key, Range=f"bytes={offset}-{end}")
+                    data = await asyncio.to_thread(response["Body"].read)
+                    await asyncio.to_thread(self._write_range, temp, offset, data)
+
+                await _bounded(
+                    [lambda offset=offset: fetch(offset) for offset in range(0, size, self.part_size)],
+                    self.max_concurrency,
+                )
+            os.replace(temp, path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await self._call("head_object", Key=key)
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def delete(self, key: str) -> None:
+        await self._call("delete_object", Key=key)
+
+    async def list_keys(self, prefix: str = "") -> List[str]:
+        keys: List[str] = []
+        kwargs = {"Prefix": prefix}
+        while True:
+            page = await self._call("list_objects_v2", **kwargs)
+            keys.extend(item["Key"] for item in page.get("Contents", []))
+            if not page.get("IsTruncated"):
+                return keys
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+    def url(self, key: str) -> str:
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+
+_storage: Optional[ObjectStorage] = None
+
+
+def get_object_storage() -> ObjectStorage:
+    """The shared storage configured by ``STORAGE_BACKEND``, created on first use."""
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "s3":
+            _storage = S3Storage()
+        else:
+            _storage = FileSystemStorage(STORAGE_ROOT)
+    return _storage
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Copy files to and from object storage.")
+    parser.add_argument("--root", help="Use a filesystem store at this path instead of the configured one")
+    commands = parser.add_subparsers(dest="command", required=True)
+    push = commands.add_parser("push", help="Upload a directory")
+    push.add_argument("local_dir")
+    push.add_argument("prefix")
+    push.add_argument("--skip-existing", action="store_true")
+    pull = commands.add_parser("pull", help="Download a prefix")
+    pull.add_argument("prefix")
+    pull.add_argument("local_dir")
+    pull.add_argument("--skip-existing", action="store_true")
+    ls = commands.add_parser("ls", help="List keys")
+    ls.add_argument("prefix", nargs="?", default="")
+    args = parser.parse_args(argv)
+
+    storage = FileSystemStorage(args.root) if args.root else get_object_storage()
+    if args.command == "push":
+        keys = asyncio.run(storage.upload_directory(args.local_dir, args.prefix, args.skip_existing))
+        print(f"Uploaded {len(keys)} files to {args.prefix}")
+    elif args.command == "pull":
+        paths = asyncio.run(storage.download_directory(args.prefix, args.local_dir, args.skip_existing))
+        print(f"Downloaded {len(paths)} files to {args.local_dir}")
+    else:
+        for key in asyncio.run(storage.list_keys(args.prefix)):
+            print(key)
+
+
+if __name__ == "__main__":
+    main()
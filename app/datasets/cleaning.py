@@ -0,0 +1,189 @@
+"""
+Cleaning of the combined Yahoo Finance statements used by the cash flow model.
+
+``clean_financial_data`` is the in-memory implementation from the cash flow
+notebook. ``clean_financial_data_chunked`` produces the same file in fixed-size
+chunks: it reads only the ticker and key-metric columns, applies the same
+inf/NaN rules per chunk and appends to the output, so memory use is bounded by
+``chunk_size`` instead of the size of the input.
+
+Both keep the ``Company`` column, so that training can compute the lag
+features per ticker (see ``app.core.features``).
+
+Example:
+    >>> from app.datasets.cleaning import clean_financial_data_chunked
+    >>> report = clean_financial_data_chunked(
+    ...     "Cash Flow Prediction Dataset/csv_data/combined_financial_data.csv",
+    ...     "cleaned_financial_data.csv",
+    ...     output_folder="Cash Flow Prediction Dataset/csv_data",
+    ... )
+    >>> report.dropped_by_column["income_stmt_Gross Profit"]
+    182
+"""
+
+import csv
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+KEY_METRICS: List[Tuple[str, str]] = [
+    ("balance_sheet", "Accounts Payable"),
+    ("balance_sheet", "Accounts Receivable"),
+    ("income_stmt", "Total Revenue"),
+    ("income_stmt", "Gross Profit"),
+    ("income_stmt", "Net Income"),
+    ("cashflow", "Operating Cash Flow"),
+    ("cashflow", "Investing Cash Flow"),
+    ("cashflow", "Financing Cash Flow"),
+    ("cashflow", "Change In Working Capital"),
+]
+
+TICKER_COLUMN = "Company"
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+@dataclass
+class CleaningReport:
+    """Summary of a cleaning run."""
+
+    output_file: str
+    columns: List[str]
+    rows_read: int = 0
+    rows_written: int = 0
+    dropped_by_column: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def rows_dropped(self) -> int:
+        return self.rows_read - self.rows_written
+
+    def as_dict(self) -> dict:
+        return {
+            "output_file": self.output_file,
+            "rows_read": self.rows_read,
+            "rows_written": self.rows_written,
+            "rows_dropped": self.rows_dropped,
+            "dropped_by_column": dict(self.dropped_by_column),
+        }
+
+
+def clean_financial_data(input_file, output_file, output_folder="csv_data"):
+    try:
+        os.makedirs(output_folder, exist_ok=True)
+        output_file_path = os.path.join(output_folder, output_file)
+        df = pd.read_csv(input_file, index_col=0, header=[0, 1])
+        df.index = pd.to_datetime(df.index)
+        key_metrics = [col for col in KEY_METRICS if col in df.columns]
+        ticker = [col for col in df.columns if col[0] == TICKER_COLUMN][:1]
+        df = df.loc[:, ticker + key_metrics]
+        df.columns = [TICKER_COLUMN] * len(ticker) + [
+            "_".join(col).strip() for col in key_metrics
+        ]
+        df.replace([np.inf, -np.inf], np.nan, inplace=True)
+        df = df.dropna(subset=["_".join(col).strip() for col in key_metrics])
+        df.to_csv(output_file_path)
+        print(f"Cleaned financial data saved to {output_file_path}")
+    except Exception as e:
+        print(f"Error cleaning financial data: {e}")
+
+
+def _read_header(input_file: str) -> List[Tuple[str, str]]:
+    """Read the two header rows of a combined statements file as column tuples."""
+    with open(input_file, newline="") as f:
+        reader = csv.reader(f)
+        top = next(reader)
+        bottom = next(reader)
+    return list(zip(top, bottom))
+
+
+def clean_financial_data_chunked(
+    input_file: str,
+    output_file: str,
+    output_folder: str = "csv_data",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    key_metrics: Optional[Sequence[Tuple[str, str]]] = None,
+) -> CleaningReport:
+    """
+    Streaming version of :func:`clean_financial_data`.
+
+    Only the index, ticker and key-metric columns are parsed. Each chunk has
+    ``inf`` values treated as missing and rows with any missing metric dropped,
+    exactly as the in-memory function does, and is then appended to the output.
+
+    Args:
+        input_file: Combined statements CSV with a two-row header.
+        output_file: Name of the cleaned CSV to write inside ``output_folder``.
+        output_folder: Directory for the output file.
+        chunk_size: Number of input rows processed at a time.
+        key_metrics: ``(statement, line item)`` columns to keep. Defaults to
+            :data:`KEY_METRICS`.
+
+    Returns:
+        A :class:`CleaningReport` with row totals and, for each output column,
+        the number of input rows in which it was missing or infinite.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    output_file_path = os.path.join(output_folder, output_file)
+
+    header = _read_header(input_file)
+    positions = {col: position for position, col in enumerate(header)}
+    selected = [col for col in (key_metrics or KEY_METRICS) if col in positions]
+    columns = ["_".join(col).strip() for col in selected]
+    metric_positions = [positions[col] for col in selected]
+    ticker_positions = [
+        position for position, col in enumerate(header) if col[0] == TICKER_COLUMN
+    ][:1]
+    usecols = [0] + ticker_positions + metric_positions
+
+    report = CleaningReport(
+        output_file=output_file_path,
+        columns=[TICKER_COLUMN] * len(ticker_positions) + columns,
+        dropped_by_column={name: 0 for name in columns},
+    )
+
+    reader = pd.read_csv(
+        input_file,
+        header=None,
+        skiprows=2,
+        usecols=usecols,
+        index_col=0,
+        dtype={
+            **{position: str for position in ticker_positions},
+            **{position: np.float64 for position in metric_positions},
+        },
+        chunksize=chunk_size,
+    )
+
+    first_chunk = True
+    for chunk in reader:
+        # usecols keeps file order, so restore the column order explicitly.
+        chunk = chunk.loc[:, ticker_positions + metric_positions]
+        chunk.columns = report.columns
+        chunk.index = pd.to_datetime(chunk.index)
+        chunk.index.name = None
+
+        values = chunk[columns].to_numpy()
+        invalid = ~np.isfinite(values)
+        keep = ~invalid.any(axis=1)
+
+        report.rows_read += len(chunk)
+        report.rows_written += int(keep.sum())
+        for name, count in zip(columns, invalid.sum(axis=0)):
+            report.dropped_by_column[name] += int(count)
+
+        chunk[keep].to_csv(
+            output_file_path, mode="w" if first_chunk else "a", header=first_chunk
+        )
+        first_chunk = False
+
+    if first_chunk:
+        pd.DataFrame(columns=report.columns).to_csv(output_file_path)
+
+    print(
+        f"Cleaned financial data saved to {output_file_path} "
+        f"({report.rows_written}/{report.rows_read} rows kept)"
+    )
+    return report
@@ -0,0 +1,373 @@
+"""
+Columnar, memory-mapped storage for the training datasets.
+
+The training CSVs (``combined_real_and_synthetic_data.csv``,
+``preprocessed_dataset.csv``, ...) are mostly float64 columns that were being
+re-parsed from text on every run. This module converts them once into a
+directory of typed ``.npy`` files, one per column, plus a ``manifest.json``
+describing names, dtypes and the source file. Loading memory-maps only the
+requested columns, so a notebook that needs three features never touches the
+other thirty.
+
+Layout:
+    combined_real_and_synthetic_data.cols/
+        manifest.json
+        c0000.npy
+        c0001.npy
+        ...
+
+Example:
+    >>> from app.datasets.columnar import read_training_csv
+    >>> df = read_training_csv(
+    ...     "Cash Flow Prediction Dataset/csv_data/combined_real_and_synthetic_data.csv",
+    ...     columns=["income_stmt_Total Revenue", "cashflow_Operating Cash Flow"],
+    ... )
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+DATASET_SUFFIX = ".cols"
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def flatten_columns(columns: pd.Index) -> List[str]:
+    """
+    Flatten a two-row CSV header into single column names.
+
+    Mirrors the ``'_'.join(col)`` convention used by the cleaning step, but drops
+    the ``Unnamed: N_level_M`` placeholders pandas generates for blank cells.
+    """
+    if not isinstance(columns, pd.MultiIndex):
+        return [str(col) for col in columns]
+    flat = []
+    for col in columns.values:
+        parts = [str(part) for part in col if not str(part).startswith("Unnamed:")]
+        flat.append("_".join(parts).strip())
+    return flat
+
+
+def _column_to_array(series: pd.Series):
+    """Convert a column into a fixed-width NumPy array that can be memory-mapped."""
+    if pd.api.types.is_bool_dtype(series.dtype) and not series.hasnans:
+        return series.to_numpy(dtype=np.bool_), False
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        if pd.api.types.is_integer_dtype(series.dtype) and not series.hasnans:
+            return series.to_numpy(dtype=np.int64), False
+        return series.to_numpy(dtype=np.float64, na_value=np.nan), False
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.to_numpy(dtype="datetime64[ns]"), False
+
+    has_nulls = bool(series.isna().any())
+    values = series.astype(object).where(series.notna(), "")
+    return np.asarray(values.astype(str).to_numpy(), dtype=np.str_), has_nulls
+
+
+def write_dataset(
+    df: pd.DataFrame, output_dir: str, source: Optional[Dict] = None
+) -> str:
+    """
+    Write a DataFrame to ``output_dir`` in the columnar layout.
+
+    The dataset is written to a temporary sibling directory first and swapped in
+    with a rename, so readers never observe a half-written dataset.
+
+    Args:
+        df: Frame to store. The index is not stored; reset it first if needed.
+        output_dir: Target dataset directory (conventionally ending in ``.cols``).
+        source: Optional metadata about the originating file, stored verbatim.
+
+    Returns:
+        The path of the written dataset directory.
+    """
+    parent = os.path.dirname(os.path.abspath(output_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=".staging-", dir=parent)
+
+    try:
+        columns = []
+        for position, name in enumerate(df.columns):
+            array, has_nulls = _column_to_array(df.iloc[:, position])
+            file_name = f"c{position:04d}.npy"
+            np.save(os.path.join(staging_dir, file_name), array, allow_pickle=False)
+            columns.append(
+                {
+                    "name": str(name),
+                    "file": file_name,
+                    "dtype": array.dtype.str,
+                    "has_nulls": has_nulls,
+                }
+            )
+
+        manifest = {
+            "version": FORMAT_VERSION,
+            "num_rows": int(len(df)),
+            "columns": columns,
+            "source": source or {},
+        }
+        with open(os.path.join(staging_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.replace(staging_dir, output_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    return output_dir
+
+
+def default_dataset_path(csv_path: str) -> str:
+    """Return the sidecar dataset directory used for ``csv_path``."""
+    root, _ = os.path.splitext(csv_path)
+    return root + DATASET_SUFFIX
+
+
+def _source_fingerprint(csv_path: str) -> Dict:
+    stat = os.stat(csv_path)
+    return {
+        "path": os.path.abspath(csv_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def convert_csv(
+    csv_path: str,
+    output_dir: Optional[str] = None,
+    header: Union[int, Sequence[int]] = 0,
+    index_col: Optional[int] = None,
+) -> str:
+    """
+    Convert a training CSV into the columnar layout.
+
+    Args:
+        csv_path: Path to the CSV file.
+        output_dir: Dataset directory to write. Defaults to ``<csv stem>.cols``
+            next to the CSV.
+        header: Header rows passed to ``pd.read_csv``. Use ``[0, 1]`` for the
+            raw ``combined_financial_data.csv`` files; the two levels are
+            flattened with :func:`flatten_columns`.
+        index_col: Optional index column. It is stored as a regular column named
+            ``index`` so that nothing is lost.
+
+    Returns:
+        The path of the written dataset directory.
+    """
+    output_dir = output_dir or default_dataset_path(csv_path)
+    df = pd.read_csv(csv_path, header=header, index_col=index_col)
+    df.columns = flatten_columns(df.columns)
+    if index_col is not None:
+        index = df.index.to_frame(index=False, name="index")
+        df = pd.concat([index, df.reset_index(drop=True)], axis=1)
+
+    source = _source_fingerprint(csv_path)
+    source["header"] = header if isinstance(header, int) else list(header)
+    source["index_col"] = index_col
+    return write_dataset(df, output_dir, source=source)
+
+
+class ColumnarDataset:
+    """
+    Read-only handle on a dataset written by :func:`write_dataset`.
+
+    Column arrays are memory-mapped lazily on first access and cached on the
+    handle, so repeated lookups are free and untouched columns are never read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported dataset version {self.manifest.get('version')} in {path}"
+            )
+        self._specs = {spec["name"]: spec for spec in self.manifest["columns"]}
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @property
+    def columns(self) -> List[str]:
+        return [spec["name"] for spec in self.manifest["columns"]]
+
+    @property
+    def num_rows(self) -> int:
+        return self.manifest["num_rows"]
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Return the memory-mapped array for column ``name``."""
+        if name not in self._arrays:
+            try:
+                spec = self._specs[name]
+            except KeyError:
+                raise KeyError(f"Column {name!r} not found in {self.path}") from None
+            self._arrays[name] = np.load(
+                os.path.join(self.path, spec["file"]), mmap_mode="r", allow_pickle=False
+            )
+        return self._arrays[name]
+
+    def arrays(self, columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+        """Return ``{name: memmap}`` for the requested columns (all by default)."""
+        names = self.columns if columns is None else list(columns)
+        return {name: self[name] for name in names}
+
+    def matrix(self, columns: Sequence[str], dtype=np.float64) -> np.ndarray:
+        """Stack numeric columns into a contiguous ``(num_rows, len(columns))`` matrix."""
+        out = np.empty((self.num_rows, len(columns)), dtype=dtype)
+        for position, name in enumerate(columns):
+            out[:, position] = self[name]
+        return out
+
+    def to_frame(
+        self, columns: Optional[Iterable[str]] = None, copy: bool = False
+    ) -> pd.DataFrame:
+        """
+        Materialise the requested columns as a DataFrame.
+
+        Numeric columns are backed by the memory map unless ``copy`` is True.
+        String columns that had missing values are restored with ``NaN``.
+        """
+        data = {}
+        for name, array in self.arrays(columns).items():
+            spec = self._specs[name]
+            if array.dtype.kind == "U":
+                values = array.astype(object)
+                if spec.get("has_nulls"):
+                    values[values == ""] = np.nan
+                data[name] = values
+            else:
+                data[name] = np.array(array) if copy else array
+        return pd.DataFrame(data, copy=False)
+
+    def iter_frames(
+        self, batch_rows: int, columns: Optional[Iterable[str]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Yield consecutive row batches as DataFrames.
+
+        Only the pages backing the current batch are read, so memory use is
+        bounded by ``batch_rows`` regardless of the dataset size.
+        """
+        names = self.columns if columns is None else list(columns)
+        for start in range(0, self.num_rows, batch_rows):
+            stop = min(start + batch_rows, self.num_rows)
+            data = {}
+            for name in names:
+                values = np.array(self[name][start:stop])
+                if values.dtype.kind == "U":
+                    values = values.astype(object)
+                    if self._specs[name].get("has_nulls"):
+                        values[values == ""] = np.nan
+                data[name] = values
+            yield pd.DataFrame(data, index=pd.RangeIndex(start, stop), copy=False)
+
+
+def iter_batches(
+    path: str, batch_rows: int, columns: Optional[Iterable[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a training CSV or a columnar dataset directory in row batches.
+
+    Unlike :func:`read_training_csv`, a CSV is never converted or loaded whole;
+    it is parsed ``batch_rows`` at a time.
+    """
+    if os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        yield from ColumnarDataset(path).iter_frames(batch_rows, columns)
+        return
+    usecols = None if columns is None else list(columns)
+    for chunk in pd.read_csv(path, chunksize=batch_rows, usecols=usecols):
+        yield chunk
+
+
+def open_dataset(path: str) -> ColumnarDataset:
+    """Open a columnar dataset directory."""
+    return ColumnarDataset(path)
+
+
+def load_dataset(
+    path: str, columns: Optional[Iterable[str]] = None, copy: bool = False
+) -> pd.DataFrame:
+    """Load the requested columns of a columnar dataset as a DataFrame."""
+    return ColumnarDataset(path).to_frame(columns, copy=copy)
+
+
+def is_stale(csv_path: str, dataset_path: str) -> bool:
+    """Return True if ``dataset_path`` is missing or was built from a different CSV."""
+    manifest_path = os.path.join(dataset_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return True
+    with open(manifest_path) as f:
+        source = json.load(f).get("source", {})
+    current = _source_fingerprint(csv_path)
+    return any(source.get(key) != current[key] for key in ("size", "mtime_ns"))
+
+
+def read_training_csv(
+    csv_path: str,
+    columns: Optional[Iterable[str]] = None,
+    dataset_path: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Drop-in replacement for ``pd.read_csv(csv_path)`` backed by the columnar cache.
+
+    The CSV is converted on first use (or whenever it changes on disk), after
+    which only the requested columns are memory-mapped.
+    """
+    dataset_path = dataset_path or default_dataset_path(csv_path)
+    if is_stale(csv_path, dataset_path):
+        convert_csv(csv_path, dataset_path)
+    return load_dataset(dataset_path, columns)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Convert training CSVs to the columnar dataset format."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Convert one or more CSV files")
+    convert.add_argument("csv_paths", nargs="+")
+    convert.add_argument(
+        "--header-rows",
+        type=int,
+        default=1,
+        help="Number of header rows (2 for the raw combined_financial_data.csv files)",
+    )
+    convert.add_argument(
+        "--index-col", type=int, default=None, help="Optional index column position"
+    )
+
+    info = subparsers.add_parser("info", help="Show the columns of a dataset")
+    info.add_argument("dataset_path")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        header = 0 if args.header_rows == 1 else list(range(args.header_rows))
+        for csv_path in args.csv_paths:
+            output_dir = convert_csv(csv_path, header=header, index_col=args.index_col)
+            print(f"Converted {csv_path} -> {output_dir}")
+    elif args.command == "info":
+        dataset = open_dataset(args.dataset_path)
+        print(f"{dataset.path}: {dataset.num_rows} rows")
+        for spec in dataset.manifest["columns"]:
+            print(f"  {spec['dtype']:>6}  {spec['name']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Content-addressed store for the raw per-ticker statement files.
+
+The cash flow and bankruptcy datasets used to keep their own
+``financial_data/<TICKER>/<TICKER>_combined_financial_data.csv`` trees with the
+same 106 tickers, fetched, stored and parsed twice. The store keeps every
+distinct statement file once, named by the SHA-256 of its bytes, and gives each
+dataset a view mapping its tickers to objects:
+
+    financial_data_store/
+        objects/ab/ab12...ef.csv
+        views/cash_flow.json      {"AAPL": "ab12...ef", ...}
+        views/bankruptcy.json
+
+Ingesting a statement that is already stored only updates the view.
+:meth:`StatementStore.combine` builds a dataset's combined CSV from its view
+(the ``combine_all_company_data`` step of the notebooks, with rows ordered by
+date and then ticker), parsing each object at most once per store instance
+even when several views share it.
+
+Example:
+    >>> store = StatementStore()
+    >>> print(store.ingest_directory("staging/financial_data", "cash_flow").summary())
+    >>> store.combine("cash_flow", "Cash Flow Prediction Dataset/csv_data/combined_financial_data.csv")
+
+:meth:`StatementStore.push` and :meth:`StatementStore.pull` copy the store to
+and from object storage (``app.core.storage``). Objects are immutable, so
+only missing ones are transferred. Views are copied after the objects, so a
+view never references an object that has not arrived yet.
+
+Usage:
+    python -m app.datasets.statement_store ingest staging/financial_data --view cash_flow
+    python -m app.datasets.statement_store combine --view bankruptcy --output combined.csv
+    python -m app.datasets.statement_store stats
+    python -m app.datasets.statement_store push
+    python -m app.datasets.statement_store pull
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app.core.storage import ObjectStorage, get_object_storage
+
+DEFAULT_STORE_ROOT = "financial_data_store"
+DEFAULT_STORAGE_PREFIX = "datasets/financial_data_store"
+STATEMENT_SUFFIX = "_combined_financial_data.csv"
+HASH_BLOCK_SIZE = 1 << 20
+
+
+@dataclass
+class IngestReport:
+    view: str
+    files: int = 0
+    new_objects: int = 0
+    deduplicated: int = 0
+    bytes_written: int = 0
+    bytes_deduplicated: int = 0
+    skipped: List[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (
+            f"Ingested {self.files} statements into view '{self.view}': "
+            f"{self.new_objects} new objects ({self.bytes_written / 1e6:.1f} MB), "
+            f"{self.deduplicated} already stored ({self.bytes_deduplicated / 1e6:.1f} MB saved)"
+            + (f", {len(self.skipped)} skipped" if self.skipped else "")
+        )
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def read_statement(path: str) -> pd.DataFrame:
+    """Read one per-ticker statement file (two-row header, dates as index)."""
+    df = pd.read_csv(path, index_col=0, header=[0, 1])
+    df.index = pd.to_datetime(df.index)
+    return df
+
+
+class StatementStore:
+    """
+    Raw statement files stored once by content hash, with per-dataset views.
+
+    Args:
+        root: Store directory; created on first write.
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_ROOT):
+        self.root = root
+        self._frames: Dict[str, pd.DataFrame] = {}
+
+    # Objects
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], f"{digest}.csv")
+
+    def has_object(self, digest: str) -> bool:
+        return os.path.exists(self.object_path(digest))
+
+    def put(self, data: bytes) -> Tuple[str, bool]:
+        """
+        Store ``data`` unless an identical object exists.
+
+        Returns:
+            ``(digest, created)``.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if self.has_object(digest):
+            return digest, False
+        _atomic_write(self.object_path(digest), data)
+        return digest, True
+
+    def objects(self) -> List[str]:
+        directory = os.path.join(self.root, "objects")
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            name[: -len(".csv")]
+            for prefix in os.listdir(directory)
+            for name in os.listdir(os.path.join(directory, prefix))
+            if name.endswith(".csv")
+        )
+
+    # Views
+
+    def _view_path(self, view: str) -> str:
+        return os.path.join(self.root, "views", f"{view}.json")
+
+    def views(self) -> List[str]:
+        directory = os.path.join(self.root, "views")
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[: -len(".json")] for name in os.listdir(directory) if name.endswith(".json"))
+
+    def view(self, view: str) -> Dict[str, str]:
+        """``{ticker: digest}`` for ``view``; empty if it does not exist."""
+        try:
+            with open(self._view_path(view)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save_view(self, view: str, entries: Dict[str, str]) -> None:
+        missing = [t for t, digest in entries.items() if not self.has_object(digest)]
+        if missing:
+            raise KeyError(f"View '{view}' references missing objects for {missing}")
+        data = json.dumps(dict(sorted(entries.items())), indent=2).encode()
+        _atomic_write(self._view_path(view), data)
+
+    def statement_path(self, view: str, ticker: str) -> str:
+        """Path of the object ``ticker`` refers to in ``view``."""
+        entries = self.view(view)
+        if ticker not in entries:
+            raise KeyError(f"No statement for {ticker} in view '{view}'")
+        return self.object_path(entries[ticker])
+
+    # Ingest
+
+    def ingest_file(self, path: str, view: str, ticker: str) -> Tuple[str, bool]:
+        """Store one statement file and point ``ticker`` in ``view`` at it."""
+        report = IngestReport(view)
+        digest = self._ingest(path, ticker, report)
+        entries = self.view(view)
+        entries[ticker] = digest
+        self.save_view(view, entries)
+        return digest, bool(report.new_objects)
+
+    def _ingest(self, path: str, ticker: str, report: IngestReport) -> str:
+        with open(path, "rb") as f:
+            data = f.read()
+        digest, created = self.put(data)
+        report.files += 1
+        if created:
+            report.new_objects += 1
+            report.bytes_written += len(data)
+        else:
+            report.deduplicated += 1
+            report.bytes_deduplicated += len(data)
+        return digest
+
+    def ingest_directory(self, data_dir: str, view: str) -> IngestReport:
+        """
+        Ingest a ``financial_data`` tree (``<TICKER>/<TICKER>_combined_financial_data.csv``).
+
+        Tickers in the tree replace their entries in ``view``; other entries are
+        kept. Empty files are skipped, as ``combine_all_company_data`` did.
+        """
+        report = IngestReport(view)
+        entries = self.view(view)
+        for ticker in sorted(os.listdir(data_dir)):
+            path = os.path.join(data_dir, ticker, f"{ticker}{STATEMENT_SUFFIX}")
+            if not os.path.isfile(path):
+                continue
+            if not os.path.getsize(path):
+                report.skipped.append(ticker)
+                continue
+            entries[ticker] = self._ingest(path, ticker, report)
+        self.save_view(view, entries)
+        return report
+
+    def prune(self) -> List[str]:
+        """Delete objects no view references; returns their digests."""
+        referenced = {digest for view in self.views() for digest in self.view(view).values()}
+        removed = [digest for digest in self.objects() if digest not in referenced]
+        for digest in removed:
+            os.remove(self.object_path(digest))
+            self._frames.pop(digest, None)
+        return removed
+
+    # Reading
+
+    def read(self, view: str, ticker: str) -> pd.DataFrame:
+        """Parsed statement of ``ticker`` in ``view``; shared objects are parsed once."""
+        digest = self.view(view).get(ticker)
+        if digest is None:
+            raise KeyError(f"No statement for {ticker} in view '{view}'")
+        if digest not in self._frames:
+            self._frames[digest] = read_statement(self.object_path(digest))
+        return self._frames[digest].copy()
+
+    def combine(self, view: str, output_file: Optional[str] = None) -> pd.DataFrame:
+        """
+        All statements of ``view`` in one frame with a ``Company`` column.
+
+        Same rows and columns as the notebooks' ``combine_all_company_data``
+        over a ``financial_data`` folder, but in a deterministic order: by
+        date, then by ticker. The notebooks ordered rows of the same date by
+        ``os.listdir``, which varies between filesystems, so their files
+        differ from this one within each date. Nothing downstream depends on
+        that order: lags are computed per ticker in date order, and row ids
+        hash row contents. Written to ``output_file`` if given.
+        """
+        frames = []
+        for ticker in sorted(self.view(view)):
+            df = self.read(view, ticker)
+            df["Company"] = ticker
+            frames.append(df)
+        if not frames:
+            raise ValueError(f"View '{view}' is empty")
+        combined = pd.concat(frames, sort=True).sort_index(kind="stable")
+        if output_file:
+            os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
+            combined.to_csv(output_file)
+            print(f"Combined data saved to {output_file}")
+        return combined
+
+    # Object storage
+
+    async def push(self, storage: ObjectStorage, prefix: str = DEFAULT_STORAGE_PREFIX) -> int:
+        """Upload missing objects, then every view; returns the number of files uploaded."""
+        objects = await storage.upload_directory(
+            os.path.join(self.root, "objects"), f"{prefix}/objects", skip_existing=True
+        )
+        views = await storage.upload_directory(os.path.join(self.root, "views"), f"{prefix}/views")
+        return len(objects) + len(views)
+
+    async def pull(self, storage: ObjectStorage, prefix: str = DEFAULT_STORAGE_PREFIX) -> int:
+        """Download missing objects, then every view; returns the number of files downloaded."""
+        objects = await storage.download_directory(
+            f"{prefix}/objects", os.path.join(self.root, "objects"), skip_existing=True
+        )
+        views = await storage.download_directory(f"{prefix}/views", os.path.join(self.root, "views"))
+        return len(objects) + len(views)
+
+    def stats(self) -> Dict[str, int]:
+        objects = self.objects()
+        references = sum(len(self.view(view)) for view in self.views())
+        return {
+            "views": len(self.views()),
+            "references": references,
+            "objects": len(objects),
+            "bytes": sum(os.path.getsize(self.object_path(d)) for d in objects),
+        }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Shared raw statement store.")
+    parser.add_argument("--root", default=DEFAULT_STORE_ROOT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="Ingest a financial_data folder into a view")
+    ingest.add_argument("data_dir")
+    ingest.add_argument("--view", required=True)
+    combine = commands.add_parser("combine", help="Write a view's combined CSV")
+    combine.add_argument("--view", required=True)
+    combine.add_argument("--output", required=True)
+    commands.add_parser("prune", help="Delete unreferenced objects")
+    commands.add_parser("stats", help="Show object and reference counts")
+    for name, help_text in (("push", "Upload the store"), ("pull", "Download the store")):
+        sync = commands.add_parser(name, help=help_text)
+        sync.add_argument("--prefix", default=DEFAULT_STORAGE_PREFIX)
+    args = parser.parse_args(argv)
+
+    store = StatementStore(args.root)
+    if args.command == "ingest":
+        print(store.ingest_directory(args.data_dir, args.view).summary())
+    elif args.command == "combine":
+        store.combine(args.view, args.output)
+    elif args.command == "prune":
+        print(f"Removed {len(store.prune())} unreferenced objects")
+    elif args.command == "push":
+        print(f"Uploaded {asyncio.run(store.push(get_object_storage(), args.prefix))} files")
+    elif args.command == "pull":
+        print(f"Downloaded {asyncio.run(store.pull(get_object_storage(), args.prefix))} files")
+    else:
+        print(store.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+One-pass streaming moments and the multicollinearity check built on them.
+
+The training pipelines drop every feature whose absolute correlation with an
+earlier feature exceeds 0.95, using ``df[features].corr()`` over the fully
+materialised frame. :class:`StreamingMoments` accumulates the same statistics
+(count, means, variances and the covariance matrix) one batch at a time, so the
+check can run over chunked or out-of-core data, or while the data is being
+ingested.
+
+Batches are combined with the pairwise update of Chan, Golub and LeVeque: each
+batch is centred on its own mean before its co-moments are taken, and the
+difference of means is folded in separately. Unlike accumulating raw sums of
+squares, this does not lose precision on columns in the billions. Two
+accumulators built on different shards can be merged the same way.
+
+Rows with a missing value in any column are skipped, so the result matches
+``DataFrame.corr()`` on data that has already been through ``dropna()``, as in
+the training pipelines.
+
+Example:
+    >>> moments = StreamingMoments(features)
+    >>> for chunk in pd.read_csv(path, chunksize=100_000):
+    ...     moments.update(chunk)
+    >>> collinear_features(moments.correlation(), threshold=0.95)
+    ['Interaction_Current_Quick']
+"""
+
+from typing import Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+COLLINEARITY_THRESHOLD = 0.95
+
+
+class StreamingMoments:
+    """
+    Running count, mean and co-moment matrix of a fixed set of columns.
+
+    Args:
+        columns: Column names, used to select from DataFrame batches and to
+            label the results.
+    """
+
+    def __init__(self, columns: Sequence[str]):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.count = 0
+        self.mean = np.zeros(k)
+        # Sum of outer products of deviations from the running mean.
+        self.comoment = np.zeros((k, k))
+
+    def _as_matrix(self, batch: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+        if isinstance(batch, pd.DataFrame):
+            batch = batch[self.columns].to_numpy(dtype=np.float64)
+        batch = np.asarray(batch, dtype=np.float64)
+        if batch.ndim != 2 or batch.shape[1] != len(self.columns):
+            raise ValueError(
+                f"Expected a (n, {len(self.columns)}) batch, got shape {batch.shape}"
+            )
+        return batch[np.isfinite(batch).all(axis=1)]
+
+    def _combine(self, count: int, mean: np.ndarray, comoment: np.ndarray) -> None:
+        if not count:
+            return
+        if not self.count:
+            self.count, self.mean, self.comoment = count, mean, comoment
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.comoment = (
+            self.comoment + comoment + np.outer(delta, delta) * (self.count * count / total)
+        )
+        self.mean = self.mean + delta * (count / total)
+        self.count = total
+
+    def update(self, batch: Union[pd.DataFrame, np.ndarray]) -> "StreamingMoments":
+        """Fold a batch of rows into the running statistics."""
+        X = self._as_matrix(batch)
+        if len(X):
+            mean = X.mean(axis=0)
+            centred = X - mean
+            self._combine(len(X), mean, centred.T @ centred)
+        return self
+
+    def merge(self, other: "StreamingMoments") -> "StreamingMoments":
+        """Fold in an accumulator built over other rows of the same columns."""
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge moments over different columns")
+        self._combine(other.count, other.mean.copy(), other.comoment.copy())
+        return self
+
+    def variance(self, ddof: int = 1) -> np.ndarray:
+        return np.diag(self.covariance(ddof))
+
+    def covariance(self, ddof: int = 1) -> np.ndarray:
+        if self.count <= ddof:
+            return np.full_like(self.comoment, np.nan)
+        return self.comoment / (self.count - ddof)
+
+    def correlation(self) -> pd.DataFrame:
+        """Pearson correlation matrix; NaN for constant columns, like pandas."""
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = self.comoment / np.outer(std, std)
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def collinear_features(
+    correlation: pd.DataFrame, threshold: float = COLLINEARITY_THRESHOLD
+) -> List[str]:
+    """
+    Features whose absolute correlation with an earlier feature exceeds ``threshold``.
+
+    The notebooks' rule: look at the upper triangle of ``|corr|`` and drop every
+    column with any entry above the threshold. NaN correlations never count.
+    """
+    values = np.abs(correlation.to_numpy())
+    upper = np.triu(np.ones(values.shape, dtype=bool), k=1)
+    with np.errstate(invalid="ignore"):
+        exceeds = (values > threshold) & upper
+    return [name for name, drop in zip(correlation.columns, exceeds.any(axis=0)) if drop]
+
+
+def streaming_collinear_features(
+    batches: Iterable[Union[pd.DataFrame, np.ndarray]],
+    features: Sequence[str],
+    threshold: float = COLLINEARITY_THRESHOLD,
+    moments: Optional[StreamingMoments] = None,
+) -> List[str]:
+    """Run the collinearity check over ``batches`` in a single pass."""
+    moments = moments or StreamingMoments(features)
+    for batch in batches:
+        moments.update(batch)
+    return collinear_features(moments.correlation(), threshold)
@@ -0,0 +1,235 @@
+"""
+Native Gaussian-copula synthetic data generator.
+
+Replacement for the ``sdv`` ``GaussianCopulaSynthesizer`` used by
+``generate_synthetic_data_with_randomness_and_range`` in the cash flow notebook.
+The model is the same idea implemented directly in NumPy:
+
+- each column's marginal is represented by its empirical quantiles,
+- the dependence structure is the correlation matrix of the normal scores
+  ``Phi^-1(rank / (n + 1))`` of the training data,
+- sampling draws correlated standard normals, maps them to uniforms with
+  ``Phi`` and back through the empirical quantile functions.
+
+Sampling is split into fixed-size chunks, each driven by its own child of a
+``numpy.random.SeedSequence``. Chunk ``i`` therefore produces the same rows for
+a given seed regardless of how many workers are used, and chunks are generated
+in parallel and streamed to disk in order.
+
+Example:
+    >>> from app.datasets.synthetic import generate_synthetic_data_native
+    >>> generate_synthetic_data_native(
+    ...     "Cash Flow Prediction Dataset/csv_data/cleaned_financial_data.csv",
+    ...     num_rows=5_000_000,
+    ...     output_folder="Cash Flow Prediction Dataset/csv_data",
+    ...     seed=42,
+    ... )
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+from scipy.stats import rankdata
+
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_N_QUANTILES = 1_000
+
+
+class GaussianCopula:
+    """
+    Gaussian copula with empirical-quantile marginals.
+
+    Args:
+        n_quantiles: Maximum number of quantile knots stored per column. The
+            marginal is linearly interpolated between knots.
+    """
+
+    def __init__(self, n_quantiles: int = DEFAULT_N_QUANTILES):
+        self.n_quantiles = n_quantiles
+        self.columns: List[str] = []
+        self.probabilities: Optional[np.ndarray] = None
+        self.quantiles: Optional[np.ndarray] = None
+        self.correlation: Optional[np.ndarray] = None
+        self._cholesky: Optional[np.ndarray] = None
+
+    def fit(self, data: pd.DataFrame) -> "GaussianCopula":
+        """Fit marginals and correlation on the numeric, non-missing rows of ``data``."""
+        numeric = data.select_dtypes(include=[np.number])
+        values = numeric.to_numpy(dtype=np.float64)
+        values = values[np.isfinite(values).all(axis=1)]
+        if len(values) < 2:
+            raise ValueError("At least two complete numeric rows are needed to fit")
+
+        n_rows, n_cols = values.shape
+        self.columns = [str(col) for col in numeric.columns]
+
+        knots = min(self.n_quantiles, n_rows)
+        self.probabilities = np.linspace(0.0, 1.0, knots)
+        self.quantiles = np.quantile(values, self.probabilities, axis=0).T
+
+        scores = ndtri(rankdata(values, axis=0) / (n_rows + 1))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            correlation = np.corrcoef(scores, rowvar=False).reshape(n_cols, n_cols)
+        # Constant columns have no defined correlation; treat them as independent.
+        correlation = np.nan_to_num(correlation, nan=0.0)
+        np.fill_diagonal(correlation, 1.0)
+        self.correlation = correlation
+        self._cholesky = _nearest_cholesky(correlation)
+        return self
+
+    def _check_fitted(self):
+        if self._cholesky is None:
+            raise RuntimeError("GaussianCopula must be fitted before sampling")
+
+    def sample_array(self, num_rows: int, rng: np.random.Generator) -> np.ndarray:
+        """Draw ``num_rows`` samples as a ``(num_rows, n_columns)`` float array."""
+        self._check_fitted()
+        normals = rng.standard_normal((num_rows, len(self.columns)))
+        uniforms = ndtr(normals @ self._cholesky.T)
+        out = np.empty_like(uniforms)
+        for position in range(len(self.columns)):
+            out[:, position] = np.interp(
+                uniforms[:, position], self.probabilities, self.quantiles[position]
+            )
+        return out
+
+    def sample(self, num_rows: int, seed: Optional[int] = None) -> pd.DataFrame:
+        """Draw ``num_rows`` samples as a DataFrame with the fitted column names."""
+        rng = np.random.default_rng(seed)
+        return pd.DataFrame(self.sample_array(num_rows, rng), columns=self.columns)
+
+
+def _nearest_cholesky(correlation: np.ndarray) -> np.ndarray:
+    """Cholesky factor of ``correlation``, clipping eigenvalues if it is not PD."""
+    try:
+        return np.linalg.cholesky(correlation)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+        eigenvalues = np.clip(eigenvalues, 1e-10, None)
+        repaired = (eigenvectors * eigenvalues) @ eigenvectors.T
+        scale = np.sqrt(np.diag(repaired))
+        repaired = repaired / np.outer(scale, scale)
+        return np.linalg.cholesky(repaired)
+
+
+def apply_random_replacement(
+    values: np.ndarray,
+    rng: np.random.Generator,
+    replace_fraction: float,
+    min_value: float,
+    max_value: float,
+) -> np.ndarray:
+    """
+    Vectorised form of the notebook's post-processing step.
+
+    Each value is replaced by a random integer in ``[min_value, max_value)`` with
+    probability ``replace_fraction``, then everything is clipped to the range.
+    """
+    if replace_fraction > 0:
+        mask = rng.random(values.shape) < replace_fraction
+        replacements = rng.integers(min_value, max_value, size=values.shape)
+        values = np.where(mask, replacements, values)
+    return np.clip(values, min_value, max_value)
+
+
+def iter_synthetic_chunks(
+    copula: GaussianCopula,
+    num_rows: int,
+    seed: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    n_jobs: Optional[int] = None,
+    replace_fraction: float = 0.0,
+    min_value: Optional[float] = None,
+    max_value: Optional[float] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield synthetic rows in order, ``chunk_size`` rows at a time.
+
+    Chunks are generated on a thread pool (the heavy NumPy kernels release the
+    GIL). At most ``2 * n_jobs`` chunks are in flight, so memory stays bounded
+    no matter how many rows are requested.
+    """
+    copula._check_fitted()
+    clip = min_value is not None and max_value is not None
+    n_chunks = -(-num_rows // chunk_size)
+    children = np.random.SeedSequence(seed).spawn(n_chunks)
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    def make_chunk(index: int) -> pd.DataFrame:
+        rng = np.random.default_rng(children[index])
+        size = min(chunk_size, num_rows - index * chunk_size)
+        values = copula.sample_array(size, rng)
+        if clip:
+            values = apply_random_replacement(
+                values, rng, replace_fraction, min_value, max_value
+            )
+        return pd.DataFrame(values, columns=copula.columns)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        pending = deque()
+        next_index = 0
+        while next_index < n_chunks or pending:
+            while next_index < n_chunks and len(pending) < 2 * n_jobs:
+                pending.append(executor.submit(make_chunk, next_index))
+                next_index += 1
+            yield pending.popleft().result()
+
+
+def generate_synthetic_data_native(
+    cleaned_file: str,
+    num_rows: int = 5000,
+    min_value: Optional[float] = 100_000,
+    max_value: Optional[float] = 1_000_000_000,
+    replace_fraction: float = 0.8,
+    output_file: str = "synthetic_financial_data.csv",
+    output_folder: str = "csv_data",
+    seed: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    n_jobs: Optional[int] = None,
+) -> str:
+    """
+    Fit a :class:`GaussianCopula` on ``cleaned_file`` and stream samples to CSV.
+
+    The defaults reproduce ``generate_synthetic_data_with_randomness_and_range``:
+    80% of sampled values are replaced by uniform integers in
+    ``[min_value, max_value)`` and the result is clipped to that range. Pass
+    ``replace_fraction=0`` to keep the pure copula samples (still clipped), or
+    ``min_value=None``/``max_value=None`` to skip post-processing entirely, as
+    the bankruptcy notebook's ``generate_synthetic_data`` does.
+
+    Returns:
+        Path of the written CSV.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    output_path = os.path.join(output_folder, output_file)
+
+    cleaned_data = pd.read_csv(cleaned_file)
+    copula = GaussianCopula().fit(cleaned_data)
+
+    chunks = iter_synthetic_chunks(
+        copula,
+        num_rows,
+        seed=seed,
+        chunk_size=chunk_size,
+        n_jobs=n_jobs,
+        replace_fraction=replace_fraction,
+        min_value=min_value,
+        max_value=max_value,
+    )
+    first_chunk = True
+    for chunk in chunks:
+        chunk.to_csv(
+            output_path, mode="w" if first_chunk else "a", header=first_chunk, index=False
+        )
+        first_chunk = False
+
+    if first_chunk:
+        pd.DataFrame(columns=copula.columns).to_csv(output_path, index=False)
+
+    print(f"Synthetic data ({num_rows} rows) saved to {output_path}")
+    return output_path
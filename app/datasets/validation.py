@@ -0,0 +1,594 @@
+"""
+Declarative data-quality validation for combined statement files.
+
+Bad rows used to surface only as ``np.where(..., 0)`` fallbacks during
+training, or went unnoticed when the notebooks replaced a missing column with
+``np.random`` values. This module checks the combined statements (the output
+of ``combine_all_company_data``) before they are cleaned:
+
+- types: every statement column is numeric and finite, dates parse;
+- ranges: e.g. total assets and current liabilities strictly positive,
+  revenue and payables non-negative;
+- cross-field identities: the balance sheet balances, gross profit is revenue
+  minus cost of revenue, and so on, within a tolerance;
+- per-ticker quarter continuity: no duplicated quarter for a ticker, and no
+  gap longer than a quarter between consecutive filings;
+- expected columns: columns the training pipeline needs and would otherwise
+  fill with random placeholders.
+
+Rules are plain objects in :data:`DEFAULT_RULES`. Each one evaluates to a
+boolean NumPy mask over a whole chunk. Rows failing an ``error`` rule are
+written to a quarantine file with the names of the failed rules. ``warning``
+rules are only counted. Duplicate filings are tracked across chunks and gaps
+are checked over each ticker's filing dates at the end, so a file of any size
+is validated in one streaming pass.
+
+Example:
+    >>> from app.datasets.validation import validate_statements
+    >>> report = validate_statements(
+    ...     "Cash Flow Prediction Dataset/csv_data/combined_financial_data.csv",
+    ...     output_dir="Cash Flow Prediction Dataset/csv_data",
+    ... )
+    >>> print(report.summary())
+
+Usage:
+    python -m app.datasets.validation combined_financial_data.csv --output-dir csv_data
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.core.features import (
+    ACCOUNTS_PAYABLE,
+    INVENTORY,
+    NET_INCOME,
+    OPERATING_CASH_FLOW,
+    TOTAL_ASSETS,
+    TOTAL_CURRENT_ASSETS,
+    TOTAL_CURRENT_LIABILITIES,
+    TOTAL_REVENUE,
+)
+from app.datasets.columnar import flatten_columns
+
+ERROR = "error"
+WARNING = "warning"
+
+DATE_COLUMN = "Date"
+TICKER_COLUMN = "Company"
+DEFAULT_CHUNK_SIZE = 100_000
+SAMPLE_ROWS = 5
+
+ACCOUNTS_RECEIVABLE = "balance_sheet_Accounts Receivable"
+CURRENT_ASSETS = "balance_sheet_Current Assets"
+CURRENT_LIABILITIES = "balance_sheet_Current Liabilities"
+WORKING_CAPITAL = "balance_sheet_Working Capital"
+TOTAL_LIABILITIES = "balance_sheet_Total Liabilities Net Minority Interest"
+TOTAL_EQUITY = "balance_sheet_Total Equity Gross Minority Interest"
+COST_OF_REVENUE = "income_stmt_Cost Of Revenue"
+GROSS_PROFIT = "income_stmt_Gross Profit"
+FREE_CASH_FLOW = "cashflow_Free Cash Flow"
+CAPITAL_EXPENDITURE = "cashflow_Capital Expenditure"
+
+
+@dataclass
+class ChunkContext:
+    """A chunk of flattened statement columns plus per-ticker history."""
+
+    frame: pd.DataFrame
+    dates: np.ndarray
+    # True where the row repeats a (ticker, date) already seen in the file.
+    duplicates: np.ndarray
+
+    def has(self, columns: Sequence[str]) -> bool:
+        return all(column in self.frame.columns for column in columns)
+
+    def values(self, column: str) -> np.ndarray:
+        return pd.to_numeric(self.frame[column], errors="coerce").to_numpy(dtype=np.float64)
+
+
+@dataclass
+class Rule(ABC):
+    """Base class: ``failures`` returns a mask of rows breaking the rule."""
+
+    name: str
+    severity: str = ERROR
+
+    @property
+    def columns(self) -> List[str]:
+        return []
+
+    @abstractmethod
+    def failures(self, ctx: ChunkContext) -> np.ndarray:
+        """Boolean mask over the chunk's rows, True where the rule fails."""
+
+
+@dataclass
+class NumericRule(Rule):
+    """Values present in ``targets`` (all statement columns if None) are finite numbers."""
+
+    targets: Optional[List[str]] = None
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.targets or [])
+
+    def failures(self, ctx: ChunkContext) -> np.ndarray:
+        names = self.targets or [
+            c for c in ctx.frame.columns if c not in (DATE_COLUMN, TICKER_COLUMN)
+        ]
+        frame = ctx.frame[names]
+        numeric = frame.select_dtypes(include="number")
+        # Columns pandas already parsed as numbers only need an infinity check.
+        failed = np.isinf(numeric.to_numpy(dtype=np.float64)).any(axis=1)
+        for name in frame.columns.difference(numeric.columns):
+            values = ctx.values(name)
+            failed |= frame[name].notna().to_numpy() & ~np.isfinite(values)
+        return failed
+
+
+@dataclass
+class DateRule(Rule):
+    """The filing date parses."""
+
+    def failures(self, ctx: ChunkContext) -> np.ndarray:
+        return np.isnat(ctx.dates)
+
+
+@dataclass
+class RangeRule(Rule):
+    """``column`` lies in ``[minimum, maximum]`` (``minimum`` exclusive if ``strict``)."""
+
+    column: str = ""
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    strict: bool = False
+
+    @property
+    def columns(self) -> List[str]:
+        return [self.column]
+
+    def failures(self, ctx: ChunkContext) -> np.ndarray:
+        values = ctx.values(self.column)
+        failed = np.zeros(len(values), dtype=bool)
+        with np.errstate(invalid="ignore"):
+            if self.minimum is not None:
+                failed |= values <= self.minimum if self.strict else values < self.minimum
+            if self.maximum is not None:
+                failed |= values > self.maximum
+        return failed
+
+
+@dataclass
+class IdentityRule(Rule):
+    """
+    ``target`` equals the signed sum of ``terms`` within tolerance.
+
+    Rows with any of the columns missing are not checked.
+    """
+
+    target: str = ""
+    terms: Dict[str, float] = field(default_factory=dict)
+    rel_tol: float = 0.01
+    abs_tol: float = 1e6
+
+    @property
+    def columns(self) -> List[str]:
+        return [self.target, *self.terms]
+
+    def failures(self, ctx: ChunkContext) -> np.ndarray:
+        target = ctx.values(self.target)
+        total = np.zeros_like(target)
+        for column, sign in self.terms.items():
+            total += sign * ctx.values(column)
+        tolerance = np.maximum(self.abs_tol, self.rel_tol * np.abs(target))
+        with np.errstate(invalid="ignore"):
+            return np.abs(target - total) > tolerance
+
+
+@dataclass
+class RequiredRule(Rule):
+    """All of ``required`` are present (not missing) in the row."""
+
+    required: List[str] = field(default_factory=list)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.required)
+
+    def failures(self, ctx: ChunkContext) -> np.ndarray:
+        return ctx.frame[self.required].isna().any(axis=1).to_numpy()
+
+
+@dataclass
+class DuplicateQuarterRule(Rule):
+    """A ticker has at most one filing per date."""
+
+    @property
+    def columns(self) -> List[str]:
+        return [TICKER_COLUMN]
+
+    def failures(self, ctx: ChunkContext) -> np.ndarray:
+        return ctx.duplicates
+
+
+@dataclass
+class QuarterGapRule(Rule):
+    """
+    Consecutive filings of a ticker are at most ``max_days`` apart.
+
+    Rows of a ticker may arrive in any order and across chunks, so this rule is
+    evaluated once over every ticker's filing dates after the whole file has
+    been read, rather than per chunk.
+    """
+
+    max_days: float = 100
+
+    @property
+    def columns(self) -> List[str]:
+        return [TICKER_COLUMN]
+
+    def failures(self, ctx: ChunkContext) -> np.ndarray:
+        return np.zeros(len(ctx.frame), dtype=bool)
+
+    def gap_rows(self, history: "FilingHistory") -> List[int]:
+        """Rows of filings that follow the ticker's previous one by more than ``max_days``."""
+        filings = history.frame().sort_values([TICKER_COLUMN, DATE_COLUMN], kind="stable")
+        gaps = filings.groupby(TICKER_COLUMN, sort=False)[DATE_COLUMN].diff()
+        late = (gaps / np.timedelta64(1, "D") > self.max_days).to_numpy()
+        return sorted(int(row) for row in filings["row"].to_numpy()[late])
+
+
+DEFAULT_RULES: List[Rule] = [
+    NumericRule("numeric_values"),
+    DateRule("valid_date"),
+    RangeRule("positive_total_assets", column=TOTAL_ASSETS, minimum=0, strict=True),
+    RangeRule(
+        "positive_current_liabilities", column=CURRENT_LIABILITIES, minimum=0, strict=True
+    ),
+    RangeRule("non_negative_current_assets", column=CURRENT_ASSETS, minimum=0),
+    RangeRule("non_negative_revenue", column=TOTAL_REVENUE, minimum=0),
+    RangeRule("non_negative_accounts_payable", column=ACCOUNTS_PAYABLE, minimum=0),
+    RangeRule("non_negative_accounts_receivable", column=ACCOUNTS_RECEIVABLE, minimum=0),
+    RangeRule("non_negative_inventory", column=INVENTORY, minimum=0),
+    IdentityRule(
+        "balance_sheet_identity",
+        target=TOTAL_ASSETS,
+        terms={TOTAL_LIABILITIES: 1.0, TOTAL_EQUITY: 1.0},
+    ),
+    IdentityRule(
+        "gross_profit_identity",
+        target=GROSS_PROFIT,
+        terms={TOTAL_REVENUE: 1.0, COST_OF_REVENUE: -1.0},
+    ),
+    IdentityRule(
+        "working_capital_identity",
+        target=WORKING_CAPITAL,
+        terms={CURRENT_ASSETS: 1.0, CURRENT_LIABILITIES: -1.0},
+    ),
+    IdentityRule(
+        "free_cash_flow_identity",
+        severity=WARNING,
+        target=FREE_CASH_FLOW,
+        terms={OPERATING_CASH_FLOW: 1.0, CAPITAL_EXPENDITURE: 1.0},
+    ),
+    DuplicateQuarterRule("duplicate_quarter"),
+    QuarterGapRule("missing_quarter", severity=WARNING, max_days=100),
+    RequiredRule(
+        "key_metrics_present",
+        severity=WARNING,
+        required=[ACCOUNTS_PAYABLE, TOTAL_REVENUE, NET_INCOME, OPERATING_CASH_FLOW],
+    ),
+]
+
+# Columns the training pipeline reads; when absent it substitutes random values.
+EXPECTED_COLUMNS: List[str] = [
+    TOTAL_ASSETS,
+    TOTAL_CURRENT_ASSETS,
+    TOTAL_CURRENT_LIABILITIES,
+    INVENTORY,
+]
+
+
+@dataclass
+class RuleResult:
+    severity: str
+    failed: int = 0
+    # Positions (0-based data rows) of the first few failures.
+    sample_rows: List[int] = field(default_factory=list)
+    skipped: bool = False
+
+
+@dataclass
+class ValidationReport:
+    input_file: str
+    # ``rows_with_warnings`` counts rows failing a per-row warning rule;
+    # ``missing_quarter`` results are only reported under ``rules``.
+    rows_checked: int = 0
+    rows_quarantined: int = 0
+    rows_with_warnings: int = 0
+    rules: Dict[str, RuleResult] = field(default_factory=dict)
+    missing_columns: List[str] = field(default_factory=list)
+    quarantine_file: Optional[str] = None
+    valid_file: Optional[str] = None
+    elapsed: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "input_file": self.input_file,
+            "rows_checked": self.rows_checked,
+            "rows_quarantined": self.rows_quarantined,
+            "rows_with_warnings": self.rows_with_warnings,
+            "missing_columns": self.missing_columns,
+            "quarantine_file": self.quarantine_file,
+            "valid_file": self.valid_file,
+            "elapsed": self.elapsed,
+            "rules": {
+                name: {
+                    "severity": r.severity,
+                    "failed": r.failed,
+                    "sample_rows": r.sample_rows,
+                    "skipped": r.skipped,
+                }
+                for name, r in self.rules.items()
+            },
+        }
+
+    def summary(self) -> str:
+        lines = [
+            f"Validated {self.rows_checked} rows of {self.input_file} in "
+            f"{self.elapsed * 1000:.0f} ms: {self.rows_quarantined} quarantined, "
+            f"{self.rows_with_warnings} with warnings"
+        ]
+        for name, result in self.rules.items():
+            if result.skipped:
+                lines.append(f"  {name}: skipped (columns missing)")
+            elif result.failed:
+                lines.append(f"  {name} [{result.severity}]: {result.failed} rows")
+        if self.missing_columns:
+            lines.append(
+                "  missing columns (training substitutes random values): "
+                + ", ".join(self.missing_columns)
+            )
+        return "\n".join(lines)
+
+
+def _read_names(input_file: str) -> List[str]:
+    """Flattened column names of a two-row-header statements file."""
+    with open(input_file, newline="") as f:
+        reader = csv.reader(f)
+        header = [
+            tuple(part or f"Unnamed: {i}" for part in col)
+            for i, col in enumerate(zip(next(reader), next(reader)))
+        ]
+    names = flatten_columns(pd.MultiIndex.from_tuples(header))
+    names[0] = DATE_COLUMN
+    return names
+
+
+class FilingHistory:
+    """
+    First row of every ``(ticker, filing date)`` seen so far in a file.
+
+    Carried across chunks, so a filing repeated in a later chunk is still
+    flagged. It grows with the number of distinct quarters, not rows.
+    """
+
+    def __init__(self):
+        self.keys = pd.MultiIndex.from_arrays(
+            [np.array([], dtype=object), np.array([], dtype="datetime64[ns]")],
+            names=[TICKER_COLUMN, DATE_COLUMN],
+        )
+        self.rows = np.array([], dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def track(self, tickers: np.ndarray, dates: np.ndarray, offset: int) -> np.ndarray:
+        """
+        Record a chunk's filings and flag the rows that repeat one.
+
+        A row is a repeat if its ``(ticker, date)`` occurs earlier in the chunk
+        or in an earlier chunk. Rows without a date are not tracked.
+        """
+        duplicates = np.zeros(len(dates), dtype=bool)
+        positions = np.flatnonzero(~np.isnat(dates))
+        keys = pd.MultiIndex.from_arrays(
+            [tickers[positions], dates[positions]], names=self.keys.names
+        )
+        repeats = keys.duplicated()
+        if len(self.keys):
+            repeats |= keys.isin(self.keys)
+        duplicates[positions] = repeats
+        self.keys = self.keys.append(keys[~repeats])
+        self.rows = np.concatenate([self.rows, offset + positions[~repeats]])
+        return duplicates
+
+    def frame(self) -> pd.DataFrame:
+        """One row per filing: ticker, date and the file row it first appeared in."""
+        return pd.DataFrame(
+            {
+                TICKER_COLUMN: self.keys.get_level_values(0),
+                DATE_COLUMN: self.keys.get_level_values(1),
+                "row": self.rows,
+            }
+        )
+
+
+def validate_frame(
+    frame: pd.DataFrame,
+    rules: Sequence[Rule] = DEFAULT_RULES,
+    history: Optional[FilingHistory] = None,
+    offset: int = 0,
+) -> Dict[str, np.ndarray]:
+    """
+    Evaluate ``rules`` on one chunk of flattened statement columns.
+
+    Args:
+        frame: The chunk, with ``Date`` and ``Company`` columns.
+        rules: Rules to apply.
+        history: Filings seen in earlier chunks, updated in place.
+        offset: Position of the chunk's first row in the file.
+
+    Returns:
+        ``{rule name: failure mask}`` for the rules whose columns are present.
+    """
+    dates = pd.to_datetime(frame[DATE_COLUMN], errors="coerce").to_numpy(
+        dtype="datetime64[ns]"
+    )
+    if TICKER_COLUMN in frame.columns:
+        tickers = frame[TICKER_COLUMN].astype(str).to_numpy()
+        history = FilingHistory() if history is None else history
+        duplicates = history.track(tickers, dates, offset)
+    else:
+        duplicates = np.zeros(len(frame), dtype=bool)
+    ctx = ChunkContext(frame=frame, dates=dates, duplicates=duplicates)
+    return {rule.name: rule.failures(ctx) for rule in rules if ctx.has(rule.columns)}
+
+
+def validate_statements(
+    input_file: str,
+    output_dir: Optional[str] = None,
+    rules: Sequence[Rule] = DEFAULT_RULES,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    valid_file: Optional[str] = None,
+) -> ValidationReport:
+    """
+    Validate a combined statements CSV and write the report and quarantine file.
+
+    Args:
+        input_file: CSV with the two-row ``(statement, line item)`` header
+            written by ``combine_all_company_data``.
+        output_dir: Where to write ``<name>.validation.json`` and
+            ``<name>.quarantine.csv``; defaults to the input's directory.
+        rules: Rules to apply.
+        chunk_size: Rows parsed at a time.
+        valid_file: Optionally also write the rows that passed every ``error``
+            rule here, in the input's format, for the cleaning step.
+
+    Returns:
+        The :class:`ValidationReport`, also saved as JSON.
+    """
+    start = time.perf_counter()
+    output_dir = output_dir or os.path.dirname(os.path.abspath(input_file))
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(input_file))[0]
+    quarantine_path = os.path.join(output_dir, f"{stem}.quarantine.csv")
+    report_path = os.path.join(output_dir, f"{stem}.validation.json")
+
+    names = _read_names(input_file)
+    with open(input_file, newline="") as f:
+        reader = csv.reader(f)
+        header_rows = [next(reader), next(reader)]
+
+    report = ValidationReport(
+        input_file=input_file,
+        quarantine_file=quarantine_path,
+        valid_file=valid_file,
+        missing_columns=[c for c in EXPECTED_COLUMNS if c not in names],
+    )
+    for rule in rules:
+        report.rules[rule.name] = RuleResult(
+            severity=rule.severity, skipped=not all(c in names for c in rule.columns)
+        )
+    severities = {rule.name: rule.severity for rule in rules}
+
+    history = FilingHistory()
+    valid_out = open(valid_file, "w", newline="") if valid_file else None
+    try:
+        if valid_out is not None:
+            csv.writer(valid_out).writerows(header_rows)
+        first_quarantine = True
+        for chunk in pd.read_csv(
+            input_file,
+            header=None,
+            skiprows=2,
+            names=names,
+            chunksize=chunk_size,
+            low_memory=False,
+        ):
+            offset = report.rows_checked
+            masks = validate_frame(chunk, rules, history, offset)
+            errors = np.zeros(len(chunk), dtype=bool)
+            warnings = np.zeros(len(chunk), dtype=bool)
+            for name, mask in masks.items():
+                result = report.rules[name]
+                result.failed += int(mask.sum())
+                if len(result.sample_rows) < SAMPLE_ROWS:
+                    positions = np.flatnonzero(mask)[: SAMPLE_ROWS - len(result.sample_rows)]
+                    result.sample_rows.extend(int(p) + offset for p in positions)
+                if severities[name] == ERROR:
+                    errors |= mask
+                else:
+                    warnings |= mask
+
+            report.rows_checked += len(chunk)
+            report.rows_quarantined += int(errors.sum())
+            report.rows_with_warnings += int(warnings.sum())
+
+            if errors.any():
+                failed_names = [n for n in masks if severities[n] == ERROR]
+                stacked = np.column_stack([masks[n][errors] for n in failed_names])
+                quarantined = chunk[errors].copy()
+                quarantined.insert(0, "row", np.flatnonzero(errors) + offset)
+                quarantined["failed_rules"] = [
+                    ";".join(n for n, hit in zip(failed_names, row) if hit) for row in stacked
+                ]
+                quarantined.to_csv(
+                    quarantine_path,
+                    mode="w" if first_quarantine else "a",
+                    header=first_quarantine,
+                    index=False,
+                )
+                first_quarantine = False
+            if valid_out is not None:
+                chunk[~errors].to_csv(valid_out, header=False, index=False)
+        if first_quarantine:
+            # Always leave a (header-only) quarantine file so stale ones are replaced.
+            pd.DataFrame(columns=["row", *names, "failed_rules"]).to_csv(
+                quarantine_path, index=False
+            )
+    finally:
+        if valid_out is not None:
+            valid_out.close()
+
+    # File-level rules only report: their rows have already been written out.
+    for rule in rules:
+        if isinstance(rule, QuarterGapRule) and not report.rules[rule.name].skipped:
+            rows = rule.gap_rows(history)
+            report.rules[rule.name].failed = len(rows)
+            report.rules[rule.name].sample_rows = rows[:SAMPLE_ROWS]
+
+    report.elapsed = time.perf_counter() - start
+    with open(report_path, "w") as f:
+        json.dump(report.as_dict(), f, indent=2)
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Validate a combined statements CSV.")
+    parser.add_argument("input_file")
+    parser.add_argument("--output-dir", help="Directory for the report and quarantine file")
+    parser.add_argument("--valid-file", help="Also write the rows that passed here")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    report = validate_statements(
+        args.input_file,
+        output_dir=args.output_dir,
+        chunk_size=args.chunk_size,
+        valid_file=args.valid_file,
+    )
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordBearer
 from fastapi.openapi.utils import get_openapi
@@ -12,6 +15,23 @@ from scalar_fastapi import get_scalar_api_reference
 # from app.auth.routes import router as auth_router
 from app.bankruptcy_pred.routes import router as bankruptcy_pred_router
 from app.cashflow.routes import router as cashflow_router
+from app.auth.cache import user_cache
+from app.core.constants import LOG_ARCHIVE_DIR, LOG_FORMAT, LOG_SHIPPING
+from app.core.database import database_lifespan
+from app.core.load_shedding import LoadSheddingMiddleware
+from app.core.logging_config import setup_logging
+from app.core.mail import mail_lifespan
+from app.core.rate_limit import AdmissionControlMiddleware
+from app.core.redis import redis_health, redis_lifespan
+from app.core.request_context import RequestContextMiddleware
+from app.core.responses import NegotiatedGZipMiddleware, NumpyJSONResponse
+from app.streaming.routes import router as streaming_router
+
+setup_logging(
+    use_s3_handler=LOG_SHIPPING,
+    archive_dir=LOG_ARCHIVE_DIR,
+    json_logs=LOG_FORMAT == "json",
+)
 
 
 def custom_openapi():
@@ -31,7 +51,17 @@ def custom_openapi():
     return app.openapi_schema
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared connection pools live as long as the application
+    async with redis_lifespan(app), database_lifespan(app), mail_lifespan(app):
+        redis = app.state.redis
+        user_cache.attach(redis.client if redis is not None else None)
+        yield
+        user_cache.attach(None)
+
+
+app = FastAPI(default_response_class=NumpyJSONResponse, lifespan=lifespan)
 
 # monitoring.instrument_fastapi(app, request_attributes_mapper=request_attributes_mapper)
 # monitoring.instrument_system_metrics()
@@ -40,6 +70,15 @@ app.openapi = custom_openapi
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/verify-code/")
 
 
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """
+    Returns 422s the way FastAPI does, but through the app's JSON renderer, since
+    rejected NaN or infinite inputs are echoed back and plain JSON cannot hold them.
+    """
+    return NumpyJSONResponse(status_code=422, content={"detail": jsonable_encoder(exc.errors())})
+
+
 @app.get("/", include_in_schema=False)
 async def redirect_to_docs():
     """
@@ -53,6 +92,11 @@ def read_root():
     return {"Hello": "Service is live"}
 
 
+@app.get("/health/redis")
+async def redis_status(status: dict = Depends(redis_health)):
+    return status
+
+
 @app.get("/scalar", include_in_schema=False)
 async def scalar_html():
     return get_scalar_api_reference(
@@ -61,7 +105,12 @@ async def scalar_html():
     )
 
 
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Skips responses the client negotiated in a compact binary encoding
+app.add_middleware(NegotiatedGZipMiddleware, minimum_size=1000)
+# Per-client rate limits and a concurrency cap on the prediction routes
+app.add_middleware(AdmissionControlMiddleware)
+# Refuses batch scoring early while single-row predictions miss their latency target
+app.add_middleware(LoadSheddingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -69,10 +118,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost: request ids and access records cover rejected requests too
+app.add_middleware(RequestContextMiddleware)
 
 # app.include_router(auth_router, prefix="/auth", tags=["AUTH"])
 app.include_router(bankruptcy_pred_router, prefix="/bankruptcy", tags=["Bankruptcy"])
 app.include_router(cashflow_router, prefix="/cashflow", tags=["Cash Flow"])
+app.include_router(streaming_router, prefix="/stream", tags=["Streaming"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,158 @@
+"""
+Micro-batching of single prediction rows for the streaming endpoint.
+
+Rows arriving one by one over WebSockets are scored in small batches: a
+:class:`MicroBatcher` per model collects rows from every connection until it
+has ``max_batch_rows`` of them or ``max_delay`` has passed since the first,
+runs the model once in the thread pool and resolves each row's future. One
+batch per model is in flight at a time, so streaming clients occupy at most one
+worker thread per model however many rows they send.
+
+The prediction routers register their models at import time with
+:func:`register_stream_model`, so the streaming endpoint serves whatever models
+the app has loaded.
+"""
+
+import asyncio
+import math
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.core.batch import BATCH_FIELDS, FIELD_RANGES
+from app.core.features import build_feature_matrix
+
+DEFAULT_MAX_BATCH_ROWS = 256
+DEFAULT_MAX_DELAY = 0.002
+
+# Takes a (n_rows, n_features) matrix, returns {output field: n_rows values or None}.
+Scorer = Callable[[np.ndarray], Mapping[str, Optional[np.ndarray]]]
+
+
+def parse_row(features: Any) -> Dict[str, float]:
+    """
+    Validate one row of base features (the ``FinancialInput`` fields).
+
+    Raises:
+        ValueError: Describing the first problem found.
+    """
+    if not isinstance(features, Mapping):
+        raise ValueError("'features' must be an object of field values")
+    row = {}
+    for name in BATCH_FIELDS:
+        if name not in features:
+            raise ValueError(f"Missing field: {name}")
+        value = features[name]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Field {name} must be a number")
+        value = float(value)
+        minimum, maximum = FIELD_RANGES.get(name, (None, None))
+        if (
+            not math.isfinite(value)
+            or (minimum is not None and value < minimum)
+            or (maximum is not None and value > maximum)
+        ):
+            raise ValueError(f"Field {name} is not finite or out of range")
+        row[name] = value
+    return row
+
+
+class MicroBatcher:
+    """
+    Collects rows for one model and scores them in batches.
+
+    Args:
+        name: Model name clients use in their frames.
+        features: Model feature columns, e.g. ``artifact.features``.
+        score: Scores a feature matrix; see :data:`Scorer`.
+        max_batch_rows: Largest batch passed to ``score``.
+        max_delay: Seconds to wait for more rows after the first one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        features: Sequence[str],
+        score: Scorer,
+        max_batch_rows: int = DEFAULT_MAX_BATCH_ROWS,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ):
+        self.name = name
+        self.features = list(features)
+        self.score = score
+        self.max_batch_rows = max_batch_rows
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_running(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def submit(self, row: Dict[str, float]) -> Dict[str, Any]:
+        """Score one validated row; resolves when its batch completes."""
+        queue = self._ensure_running()
+        future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((row, future))
+        return await future
+
+    async def _collect(self, queue: asyncio.Queue) -> List[Tuple[dict, asyncio.Future]]:
+        loop = asyncio.get_running_loop()
+        items = [await queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(items) < self.max_batch_rows:
+            if not queue.empty():
+                items.append(queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Rows whose connection went away in the meantime are dropped.
+        return [(row, future) for row, future in items if not future.done()]
+
+    def _score_rows(self, rows: List[dict]) -> List[Dict[str, Any]]:
+        columns = {name: np.array([row[name] for row in rows]) for name in BATCH_FIELDS}
+        outputs = self.score(build_feature_matrix(columns, self.features))
+        return [
+            {
+                field: None if values is None else np.asarray(values)[i].item()
+                for field, values in outputs.items()
+            }
+            for i in range(len(rows))
+        ]
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        while True:
+            items = await self._collect(queue)
+            if not items:
+                continue
+            try:
+                results = await run_in_threadpool(self._score_rows, [row for row, _ in items])
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(items, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+STREAM_MODELS: Dict[str, MicroBatcher] = {}
+
+
+def register_stream_model(name: str, features: Sequence[str], score: Scorer) -> MicroBatcher:
+    """Make a loaded model available on the streaming endpoint as ``name``."""
+    batcher = MicroBatcher(name, features, score)
+    STREAM_MODELS[name] = batcher
+    return batcher
@@ -0,0 +1,99 @@
+"""
+WebSocket endpoint streaming predictions for high-frequency clients.
+
+Protocol (JSON text frames):
+
+- client -> server, one row per frame::
+
+    {"id": "row-17", "model": "cash_flow", "features": {"current_ratio": 1.2, ...}}
+
+- server -> client, as soon as the row's batch is scored (not necessarily in
+  the order sent)::
+
+    {"id": "row-17", "model": "cash_flow", "predicted_cash_flow": 12345.6}
+    {"id": "row-18", "model": "bankruptcy", "error": "Missing field: quick_ratio"}
+
+At most ``MAX_IN_FLIGHT`` rows per connection are between being read and their
+answer being sent. When a client reaches the limit, the server stops reading
+its socket until answers go out, so a fast sender is held back by TCP
+backpressure instead of filling the batch queues.
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, Set
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from app.core.responses import render_json
+from app.streaming.batcher import STREAM_MODELS, parse_row
+
+router = APIRouter()
+
+MAX_IN_FLIGHT = 64
+
+
+def _error(frame: Any, message: str) -> Dict[str, Any]:
+    frame = frame if isinstance(frame, dict) else {}
+    return {"id": frame.get("id"), "model": frame.get("model"), "error": message}
+
+
+@router.websocket("/predict")
+async def stream_predictions(websocket: WebSocket):
+    await websocket.accept()
+    in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+    outgoing: asyncio.Queue = asyncio.Queue()
+    pending: Set[asyncio.Task] = set()
+
+    async def send_results():
+        while True:
+            message = await outgoing.get()
+            try:
+                await websocket.send_text(render_json(message).decode())
+            finally:
+                # The slot is only freed once the answer is on its way.
+                in_flight.release()
+
+    async def score(frame: Dict[str, Any], row: Dict[str, float]):
+        try:
+            result = await STREAM_MODELS[frame["model"]].submit(row)
+            message = {"id": frame.get("id"), "model": frame["model"], **result}
+        except Exception as e:
+            message = _error(frame, f"Prediction error: {e}")
+        outgoing.put_nowait(message)
+
+    async def receive_rows():
+        while True:
+            text = await websocket.receive_text()
+            await in_flight.acquire()
+            frame = None
+            try:
+                frame = json.loads(text)
+                if not isinstance(frame, dict):
+                    raise ValueError("Expected a JSON object")
+                if frame.get("model") not in STREAM_MODELS:
+                    raise ValueError(
+                        f"Unknown model {frame.get('model')!r}; "
+                        f"available: {', '.join(STREAM_MODELS)}"
+                    )
+                row = parse_row(frame.get("features"))
+            except ValueError as e:
+                outgoing.put_nowait(_error(frame, str(e)))
+                continue
+            task = asyncio.create_task(score(frame, row))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+    receiver = asyncio.create_task(receive_rows())
+    sender = asyncio.create_task(send_results())
+    try:
+        # Whichever side stops first ends the connection: a failed send would
+        # otherwise leave the receiver waiting forever for a free slot.
+        done, _ = await asyncio.wait({receiver, sender}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                raise error
+    finally:
+        for task in (receiver, sender, *pending):
+            task.cancel()
@@ -0,0 +1,120 @@
+"""
+Model artifacts shared by training and the prediction API.
+
+The notebooks pickled the bare best estimator, so the API had no access to the
+fitted ``PowerTransformer``, the target scaler or the list of features that
+survived the multicollinearity check. A :class:`ModelArtifact` bundles all of
+them; the routers load it with :func:`load_artifact`.
+"""
+
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.features import BASE_FEATURES, FEATURE_NAMES
+
+MODEL_DIR = "models"
+
+
+@dataclass
+class ModelArtifact:
+    """A trained model together with everything needed to score raw features."""
+
+    task: str
+    model_name: str
+    model: Any
+    features: List[str] = field(default_factory=lambda: list(FEATURE_NAMES))
+    feature_transformer: Any = None
+    target_scaler: Any = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    metrics: Dict[str, float] = field(default_factory=dict)
+    trained_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Apply the fitted feature transformer, if any."""
+        if self.feature_transformer is None:
+            return X
+        return self.feature_transformer.transform(X)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Model output for a raw ``(n_rows, len(features))`` matrix."""
+        return self.model.predict(self.transform(X))
+
+    def predict_target(self, X: np.ndarray) -> np.ndarray:
+        """Like :meth:`predict`, mapped back to target units when a scaler was used."""
+        prediction = self.predict(X)
+        if self.target_scaler is None:
+            return prediction
+        return self.target_scaler.inverse_transform(prediction.reshape(-1, 1)).ravel()
+
+    def predict_proba(self, X: np.ndarray) -> Optional[np.ndarray]:
+        """Class probabilities, or None if the model does not provide them."""
+        if not hasattr(self.model, "predict_proba"):
+            return None
+        return self.model.predict_proba(self.transform(X))
+
+    def describe(self) -> Dict[str, Any]:
+        """JSON-safe summary of the model, for the routers' ``/model`` endpoints."""
+
+        def plain(value):
+            if value is None or isinstance(value, (bool, int, float, str)):
+                return value
+            return repr(value)
+
+        return {
+            "task": self.task,
+            "model_name": self.model_name,
+            "features": list(self.features),
+            "params": {name: plain(value) for name, value in self.params.items()},
+            "metrics": dict(self.metrics),
+            "trained_at": self.trained_at,
+            "version": self.metadata.get("registry_version"),
+            "legacy": bool(self.metadata.get("legacy", False)),
+        }
+
+
+def save_artifact(artifact: ModelArtifact, path: str) -> str:
+    """Pickle ``artifact`` to ``path`` atomically."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(artifact, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+def load_artifact(path: str, task: Optional[str] = None) -> ModelArtifact:
+    """
+    Load a model artifact.
+
+    Pickles written by the notebooks contain only the estimator. They are
+    wrapped in an artifact without a feature transformer, which reproduces how
+    they were served before; retrain with ``python -m app.training.search`` to
+    get a complete artifact. They do not record their feature list either, so a
+    model expecting eight inputs is assumed to use the base features.
+    """
+    with open(path, "rb") as f:
+        obj = pickle.load(f)
+    if isinstance(obj, ModelArtifact):
+        return obj
+    features = list(FEATURE_NAMES)
+    if getattr(obj, "n_features_in_", None) == len(BASE_FEATURES):
+        features = list(BASE_FEATURES)
+    return ModelArtifact(
+        task=task or "unknown",
+        model_name=type(obj).__name__,
+        model=obj,
+        features=features,
+        metadata={"legacy": True, "path": path},
+    )
@@ -0,0 +1,141 @@
+"""
+Benchmark the model families on fit time, single-row latency and accuracy.
+
+Each family's best candidate is found with :func:`app.training.search.search`
+(pass ``--store`` to reuse earlier search results). It is then refitted on the
+training split to time the fit, and wrapped in a :class:`ModelArtifact` to time
+one-row predictions the way the ``/predict`` endpoints make them: feature
+transform plus model call.
+
+Usage:
+    python -m app.training.benchmark --task cash_flow
+    python -m app.training.benchmark --task bankruptcy --store /tmp/search-results
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.preprocessing import PowerTransformer
+
+from app.training.artifacts import ModelArtifact
+from app.training.data import TASKS, TrainingData, prepare_training_data
+from app.training.estimators import build_estimator, get_families
+from app.training.result_store import ResultStore
+from app.training.search import search, selection_metric, split_data
+
+DEFAULT_FIT_REPEATS = 3
+DEFAULT_PREDICT_REPEATS = 200
+
+
+@dataclass
+class FamilyBenchmark:
+    family: str
+    params: Dict
+    fit_seconds: float
+    latency_ms_p50: float
+    latency_ms_p95: float
+    test_metrics: Dict[str, float]
+
+
+def time_fit(estimator, X: np.ndarray, y: np.ndarray, repeats: int) -> float:
+    """Best-of-``repeats`` wall time of fitting a fresh clone of ``estimator``."""
+    best = float("inf")
+    for _ in range(repeats):
+        model = clone(estimator)
+        start = time.perf_counter()
+        model.fit(X, y)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_single_row(artifact: ModelArtifact, row: np.ndarray, repeats: int) -> np.ndarray:
+    """Latency in milliseconds of ``repeats`` one-row predictions."""
+    artifact.predict(row)
+    timings = np.empty(repeats)
+    for i in range(repeats):
+        start = time.perf_counter()
+        artifact.predict(row)
+        timings[i] = time.perf_counter() - start
+    return timings * 1000
+
+
+def benchmark(
+    data: TrainingData,
+    families: Optional[List[str]] = None,
+    store: Optional[ResultStore] = None,
+    fit_repeats: int = DEFAULT_FIT_REPEATS,
+    predict_repeats: int = DEFAULT_PREDICT_REPEATS,
+    n_jobs: int = -1,
+) -> List[FamilyBenchmark]:
+    """Benchmark the best candidate of each family for ``data``."""
+    report, _ = search(data, families=families, n_jobs=n_jobs, store=store)
+    X_train, X_test, y_train, _ = split_data(data)
+    transformer = PowerTransformer().fit(X_train)
+    X_train_t = transformer.transform(X_train)
+    by_name = {family.name: family for family in get_families(data.task, families)}
+
+    results = []
+    for result in report.families:
+        estimator = build_estimator(by_name[result.family], result.best_params)
+        artifact = ModelArtifact(
+            task=data.task,
+            model_name=result.family,
+            model=result.estimator,
+            features=list(data.features),
+            feature_transformer=transformer,
+        )
+        latency = time_single_row(artifact, X_test[:1], predict_repeats)
+        results.append(
+            FamilyBenchmark(
+                family=result.family,
+                params=result.best_params,
+                fit_seconds=time_fit(estimator, X_train_t, y_train, fit_repeats),
+                latency_ms_p50=float(np.percentile(latency, 50)),
+                latency_ms_p95=float(np.percentile(latency, 95)),
+                test_metrics=result.test_metrics,
+            )
+        )
+    return results
+
+
+def format_table(results: Sequence[FamilyBenchmark], metric: str) -> str:
+    lines = [
+        f"{'family':<22}{'fit (s)':>10}{'p50 (ms)':>10}{'p95 (ms)':>10}{metric:>10}",
+    ]
+    for r in sorted(results, key=lambda r: r.test_metrics[metric], reverse=True):
+        lines.append(
+            f"{r.family:<22}{r.fit_seconds:>10.3f}{r.latency_ms_p50:>10.2f}"
+            f"{r.latency_ms_p95:>10.2f}{r.test_metrics[metric]:>10.4f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the model families.")
+    parser.add_argument("--task", choices=TASKS, required=True)
+    parser.add_argument("--data", help="Training CSV (defaults to the task's dataset)")
+    parser.add_argument("--families", nargs="+", help="Restrict to these model families")
+    parser.add_argument("--store", help="Result store directory for the search")
+    parser.add_argument("--fit-repeats", type=int, default=DEFAULT_FIT_REPEATS)
+    parser.add_argument("--predict-repeats", type=int, default=DEFAULT_PREDICT_REPEATS)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args(argv)
+
+    data = prepare_training_data(args.task, path=args.data)
+    results = benchmark(
+        data,
+        families=args.families,
+        store=ResultStore(args.store) if args.store else None,
+        fit_repeats=args.fit_repeats,
+        predict_repeats=args.predict_repeats,
+        n_jobs=args.n_jobs,
+    )
+    print(format_table(results, selection_metric(data.problem_type)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Training data preparation for the cash flow and bankruptcy models.
+
+This is the data half of the notebook training cells: load the combined real
+and synthetic dataset, add the placeholder balance-sheet columns when they are
+missing, compute the shared features, prepare the target and drop collinear
+features. The model search lives in :mod:`app.training.search`.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from app.core.features import DEFAULT_GROUP_KEY, FEATURE_NAMES, add_features
+from app.datasets.columnar import read_training_csv
+from app.datasets.streaming_stats import COLLINEARITY_THRESHOLD, collinear_features
+
+SEED = 42
+
+CASH_FLOW = "cash_flow"
+BANKRUPTCY = "bankruptcy"
+TASKS = (CASH_FLOW, BANKRUPTCY)
+
+REGRESSION = "regression"
+CLASSIFICATION = "classification"
+
+DATASET_PATHS = {
+    CASH_FLOW: os.path.join(
+        "Cash Flow Prediction Dataset", "csv_data", "combined_real_and_synthetic_data.csv"
+    ),
+    BANKRUPTCY: os.path.join(
+        "New_Bankruptcy_Prediction_Dataset",
+        "csv_data",
+        "combined_real_and_synthetic_data.csv",
+    ),
+}
+
+CASH_FLOW_TARGET = "cashflow_Operating Cash Flow"
+BANKRUPTCY_TARGET = "Bankruptcy Target"
+
+# Constants for combining per-column hashes into row ids (FNV-1a style).
+_ROW_ID_SEED = np.uint64(0xCBF29CE484222325)
+_ROW_ID_MULTIPLIER = np.uint64(0x100000001B3)
+_MISSING_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+# Placeholder streams: one per random quantity drawn for a row.
+_PAYABLE_STREAM = 1
+_RECEIVABLE_STREAM = 2
+_OPERATING_CASH_FLOW_STREAM = 3
+_CURRENT_RECEIVABLE_STREAM = 4
+_CURRENT_ASSETS_STREAM = 5
+_CURRENT_LIABILITIES_STREAM = 6
+_TARGET_STREAM = 7
+
+
+@dataclass
+class TrainingData:
+    """Feature frame and target for one model, ready for the search."""
+
+    task: str
+    X: pd.DataFrame
+    y: pd.Series
+    features: List[str]
+    dropped_features: List[str] = field(default_factory=list)
+    target_scaler: Optional[StandardScaler] = None
+    # Hash of each row's source record, aligned with X; identifies rows across
+    # retrains (see app.training.incremental).
+    row_ids: Optional[np.ndarray] = None
+
+    @property
+    def problem_type(self) -> str:
+        return REGRESSION if self.task == CASH_FLOW else CLASSIFICATION
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """SplitMix64 finaliser: a well-spread 64-bit hash of each value."""
+    with np.errstate(over="ignore"):
+        z = values + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+
+def _row_uniform(row_ids: np.ndarray, stream: int, seed: int = SEED) -> np.ndarray:
+    """
+    One uniform draw in ``[0, 1)`` per row that depends only on the row's id,
+    ``stream`` and ``seed``, not on the row's position or on the other rows.
+    """
+    with np.errstate(over="ignore"):
+        key = _mix(np.array([seed], dtype=np.uint64)) + np.uint64(stream) * _ROW_ID_MULTIPLIER
+        bits = _mix(np.asarray(row_ids, dtype=np.uint64) ^ key)
+    return (bits >> np.uint64(11)).astype(np.float64) * 2.0**-53
+
+
+def _row_integers(row_ids: np.ndarray, stream: int, low: int, high: int, seed: int) -> np.ndarray:
+    return low + np.floor(_row_uniform(row_ids, stream, seed) * (high - low)).astype(np.int64)
+
+
+def add_missing_balance_sheet_columns(
+    df: pd.DataFrame, row_ids: np.ndarray, seed: int = SEED
+) -> pd.DataFrame:
+    """
+    Add the placeholder columns the notebooks synthesise when they are missing.
+
+    Neither cleaned dataset carries current assets/liabilities, so these are
+    random stand-ins as in the notebooks. Each row's values are drawn from its
+    id (see :func:`source_row_ids`), so a row keeps its placeholders when the
+    dataset grows and incremental retraining replays it with the features the
+    model was fitted on.
+    """
+    def column_or_uniform(name, stream):
+        if name in df.columns:
+            return df[name]
+        return 100_000 + _row_uniform(row_ids, stream, seed) * 900_000
+
+    if "balance_sheet_Total Assets" not in df.columns:
+        df["balance_sheet_Total Assets"] = (
+            column_or_uniform("balance_sheet_Accounts Payable", _PAYABLE_STREAM)
+            + column_or_uniform("balance_sheet_Accounts Receivable", _RECEIVABLE_STREAM)
+            + column_or_uniform("cashflow_Operating Cash Flow", _OPERATING_CASH_FLOW_STREAM)
+        )
+    if "balance_sheet_Total Current Assets" not in df.columns:
+        df["balance_sheet_Total Current Assets"] = column_or_uniform(
+            "balance_sheet_Accounts Receivable", _CURRENT_RECEIVABLE_STREAM
+        ) + _row_integers(row_ids, _CURRENT_ASSETS_STREAM, 100_000, 1_000_000_000, seed)
+    if "balance_sheet_Total Current Liabilities" not in df.columns:
+        df["balance_sheet_Total Current Liabilities"] = _row_integers(
+            row_ids, _CURRENT_LIABILITIES_STREAM, 100_000, 1_000_000_000, seed
+        )
+    return df
+
+
+def placeholder_bankruptcy_target(row_ids: np.ndarray, seed: int = SEED) -> np.ndarray:
+    """The notebooks' random 60/40 label for data without one, drawn per row id."""
+    return (_row_uniform(row_ids, _TARGET_STREAM, seed) >= 0.6).astype(int)
+
+
+def find_collinear_features(
+    df: pd.DataFrame,
+    features: List[str],
+    threshold: float = COLLINEARITY_THRESHOLD,
+) -> List[str]:
+    """
+    Features whose absolute correlation with an earlier feature exceeds ``threshold``.
+
+    For data that does not fit in memory, accumulate
+    :class:`~app.datasets.streaming_stats.StreamingMoments` instead; the drop
+    rule is shared.
+    """
+    return collinear_features(df[features].corr(), threshold)
+
+
+def source_row_ids(df: pd.DataFrame) -> pd.Series:
+    """
+    Stable 64-bit id per source row, computed before any random placeholder
+    columns are added so it does not change when the dataset grows.
+
+    Each value is hashed on its own (numbers as float64, everything else as
+    text, missing values as one fixed hash), so the id does not depend on the
+    dtype a reader inferred for a particular chunk, e.g. a date column that is
+    empty in one chunk of a CSV.
+    """
+    ids = np.full(len(df), _ROW_ID_SEED, dtype=np.uint64)
+    for name in df.columns:
+        column = df[name]
+        if pd.api.types.is_numeric_dtype(column):
+            hashes = pd.util.hash_array(column.to_numpy(dtype=np.float64))
+        else:
+            hashes = pd.util.hash_array(column.astype(str).to_numpy(dtype=object))
+        hashes[column.isna().to_numpy()] = _MISSING_HASH
+        ids = (ids ^ hashes) * _ROW_ID_MULTIPLIER
+    return pd.Series(ids, index=df.index)
+
+
+def engineer_features(
+    df: pd.DataFrame, row_ids: np.ndarray, seed: int = SEED
+) -> pd.DataFrame:
+    """
+    Apply the shared feature pipeline and drop rows it leaves incomplete.
+
+    ``row_ids`` (see :func:`source_row_ids`) seed each row's placeholders.
+
+    Lags are computed per ticker, so the data must carry the ``Company``
+    column written by the cleaning step. Synthetic rows have no ticker; they
+    are kept and lagged as one series of their own.
+    """
+    if DEFAULT_GROUP_KEY not in df.columns:
+        raise ValueError(
+            f"Training data has no {DEFAULT_GROUP_KEY!r} column, so lag features "
+            "would run across companies; re-run the cleaning step, which keeps it"
+        )
+    df = add_missing_balance_sheet_columns(df, row_ids, seed)
+    df = df.replace([np.inf, -np.inf], np.nan)
+    df = add_features(df, group_key=DEFAULT_GROUP_KEY)
+    df = df.replace([np.inf, -np.inf], np.nan)
+    return df.dropna(subset=df.columns.drop(DEFAULT_GROUP_KEY))
+
+
+def _finalise(
+    task: str,
+    df: pd.DataFrame,
+    target: pd.Series,
+    row_ids: pd.Series,
+    target_scaler: Optional[StandardScaler] = None,
+    features: Optional[List[str]] = None,
+) -> TrainingData:
+    if features is None:
+        dropped = find_collinear_features(df, FEATURE_NAMES)
+        features = [feature for feature in FEATURE_NAMES if feature not in dropped]
+    else:
+        dropped = [feature for feature in FEATURE_NAMES if feature not in features]
+    return TrainingData(
+        task=task,
+        X=df[features],
+        y=target,
+        features=list(features),
+        dropped_features=dropped,
+        target_scaler=target_scaler,
+        row_ids=row_ids.loc[df.index].to_numpy(),
+    )
+
+
+def prepare_cash_flow_data(
+    df: Optional[pd.DataFrame] = None,
+    path: Optional[str] = None,
+    seed: int = SEED,
+    features: Optional[List[str]] = None,
+    target_scaler: Optional[StandardScaler] = None,
+) -> TrainingData:
+    """
+    Prepare the cash flow regression data (positive, standardised target).
+
+    Args:
+        df: Combined dataset; read from ``path`` (or the default) if omitted.
+        path: Training CSV.
+        seed: Seed for the placeholder balance-sheet columns (mixed with each
+            row's id).
+        features: Use these features instead of running the collinearity check,
+            e.g. to match an existing model.
+        target_scaler: A fitted scaler to reuse instead of fitting a new one.
+    """
+    if df is None:
+        df = read_training_csv(path or DATASET_PATHS[CASH_FLOW])
+    row_ids = source_row_ids(df)
+    df = engineer_features(df.copy(), row_ids.to_numpy(), seed)
+    df = df[df[CASH_FLOW_TARGET] > 0]
+
+    if target_scaler is None:
+        target_scaler = StandardScaler().fit(df[[CASH_FLOW_TARGET]])
+    target = pd.Series(
+        target_scaler.transform(df[[CASH_FLOW_TARGET]]).ravel(),
+        index=df.index,
+        name=CASH_FLOW_TARGET,
+    )
+    return _finalise(CASH_FLOW, df, target, row_ids, target_scaler, features)
+
+
+def prepare_bankruptcy_data(
+    df: Optional[pd.DataFrame] = None,
+    path: Optional[str] = None,
+    seed: int = SEED,
+    features: Optional[List[str]] = None,
+) -> TrainingData:
+    """Prepare the bankruptcy classification data; see :func:`prepare_cash_flow_data`."""
+    if df is None:
+        df = read_training_csv(path or DATASET_PATHS[BANKRUPTCY])
+    row_ids = source_row_ids(df)
+    df = engineer_features(df.copy(), row_ids.to_numpy(), seed)
+
+    # The cleaning step writes the label with a trailing "_" from column flattening.
+    for name in (BANKRUPTCY_TARGET, BANKRUPTCY_TARGET + "_"):
+        if name in df.columns:
+            target = df[name].astype(int).rename(BANKRUPTCY_TARGET)
+            break
+    else:
+        target = pd.Series(
+            placeholder_bankruptcy_target(row_ids.loc[df.index].to_numpy(), seed),
+            index=df.index,
+            name=BANKRUPTCY_TARGET,
+        )
+    return _finalise(BANKRUPTCY, df, target, row_ids, features=features)
+
+
+def prepare_training_data(
+    task: str,
+    df: Optional[pd.DataFrame] = None,
+    path: Optional[str] = None,
+    features: Optional[List[str]] = None,
+    target_scaler: Optional[StandardScaler] = None,
+) -> TrainingData:
+    """Dispatch to the preparation function for ``task``."""
+    if task == CASH_FLOW:
+        return prepare_cash_flow_data(
+            df, path, features=features, target_scaler=target_scaler
+        )
+    if task == BANKRUPTCY:
+        return prepare_bankruptcy_data(df, path, features=features)
+    raise ValueError(f"Unknown task {task!r}; expected one of {TASKS}")
@@ -0,0 +1,138 @@
+"""
+Model families and search spaces for both tasks.
+
+The RandomForest, GradientBoosting and AdaBoost grids are the ones used by the
+notebooks' ``GridSearchCV`` loops, so the faster search strategies explore
+exactly the same candidates. HistGradientBoosting bins every feature into at
+most 255 buckets before growing trees, which makes it much cheaper to fit on
+larger data; its grid is sized like the GradientBoosting one.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sklearn.base import BaseEstimator, clone
+from sklearn.ensemble import (
+    AdaBoostClassifier,
+    AdaBoostRegressor,
+    GradientBoostingClassifier,
+    GradientBoostingRegressor,
+    HistGradientBoostingClassifier,
+    HistGradientBoostingRegressor,
+    RandomForestClassifier,
+    RandomForestRegressor,
+)
+
+from app.training.data import BANKRUPTCY, CASH_FLOW, SEED
+
+
+# Parameters that set the number of trees in an ensemble.
+ENSEMBLE_SIZE_PARAMS = ("n_estimators", "max_iter")
+
+HIST_GRADIENT_BOOSTING_GRID = {
+    "max_iter": [100, 200, 300],
+    "learning_rate": [0.05, 0.1, 0.2],
+    "max_leaf_nodes": [15, 31, 63],
+    "min_samples_leaf": [10, 20, 40],
+}
+
+
+class ModelFamily(NamedTuple):
+    name: str
+    estimator: BaseEstimator
+    param_grid: Dict[str, List[Any]]
+
+
+MODEL_FAMILIES: Dict[str, List[ModelFamily]] = {
+    CASH_FLOW: [
+        ModelFamily(
+            "RandomForest",
+            RandomForestRegressor(random_state=SEED),
+            {
+                "n_estimators": [100, 200, 300],
+                "max_depth": [5, 10, 15],
+                "min_samples_split": [2, 5, 10],
+                "min_samples_leaf": [1, 2, 4],
+            },
+        ),
+        ModelFamily(
+            "GradientBoosting",
+            GradientBoostingRegressor(random_state=SEED),
+            {
+                "n_estimators": [100, 200, 300],
+                "learning_rate": [0.01, 0.05, 0.1],
+                "max_depth": [3, 5, 7],
+            },
+        ),
+        ModelFamily(
+            "AdaBoost",
+            AdaBoostRegressor(random_state=SEED),
+            {
+                "n_estimators": [50, 100, 200],
+                "learning_rate": [0.01, 0.1, 1.0],
+            },
+        ),
+        # Early stopping is off so every max_iter in the grid is actually grown.
+        ModelFamily(
+            "HistGradientBoosting",
+            HistGradientBoostingRegressor(early_stopping=False, random_state=SEED),
+            HIST_GRADIENT_BOOSTING_GRID,
+        ),
+    ],
+    BANKRUPTCY: [
+        ModelFamily(
+            "RandomForest",
+            RandomForestClassifier(random_state=SEED),
+            {
+                "n_estimators": [50, 100, 200],
+                "max_depth": [3, 5, 7],
+            },
+        ),
+        ModelFamily(
+            "GradientBoosting",
+            GradientBoostingClassifier(random_state=SEED),
+            {
+                "n_estimators": [50, 100, 200],
+                "learning_rate": [0.01, 0.1, 1.0],
+                "max_depth": [3, 5, 7],
+            },
+        ),
+        ModelFamily(
+            "AdaBoost",
+            AdaBoostClassifier(random_state=SEED),
+            {
+                "n_estimators": [50, 100, 200],
+                "learning_rate": [0.01, 0.1, 1.0],
+            },
+        ),
+        ModelFamily(
+            "HistGradientBoosting",
+            HistGradientBoostingClassifier(early_stopping=False, random_state=SEED),
+            HIST_GRADIENT_BOOSTING_GRID,
+        ),
+    ],
+}
+
+
+def get_families(task: str, names: List[str] = None) -> List[ModelFamily]:
+    """Model families for ``task``, optionally restricted to ``names``."""
+    families = MODEL_FAMILIES[task]
+    if names:
+        unknown = set(names) - {family.name for family in families}
+        if unknown:
+            raise ValueError(f"Unknown model families for {task}: {sorted(unknown)}")
+        families = [family for family in families if family.name in names]
+    return families
+
+
+def build_estimator(family: ModelFamily, params: Dict[str, Any]) -> BaseEstimator:
+    """Fresh, unfitted estimator of ``family`` with ``params`` applied."""
+    return clone(family.estimator).set_params(**params)
+
+
+def ensemble_size_param(estimator: BaseEstimator) -> Optional[str]:
+    """Name of the parameter that sets ``estimator``'s number of trees, if any."""
+    params = estimator.get_params()
+    for name in ENSEMBLE_SIZE_PARAMS:
+        if name in params:
+            return name
+    return None
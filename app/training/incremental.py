@@ -0,0 +1,309 @@
+"""
+Incremental retraining on the rows added since the last registered model.
+
+A full retrain searches every grid on the whole combined dataset. When a
+refresh only adds a quarter for some tickers, this module instead:
+
+- loads the latest registry version and the ids of the rows it was trained on,
+  and prepares the current dataset with that model's features and target
+  scaler, so old and new rows are on the same scale;
+- takes the rows the model has not seen (the delta) and holds out a part of
+  them for evaluation;
+- grows the ensemble with ``warm_start``: forests get new trees and gradient
+  boosting new stages, fitted on the delta plus a random replay sample of old
+  rows. At most as many estimators are added as the model already has, and
+  when fewer than ``MIN_SEEN_FRACTION`` of the rows are old (for instance
+  after the row ids changed) the model is refitted instead. The fitted ``PowerTransformer`` is kept as is. Families without warm
+  start (AdaBoost) are refitted with their existing hyperparameters, which still
+  skips the search. So is histogram gradient boosting: a warm-start fit on new
+  rows rebuilds its bin mapper, and the existing trees' thresholds then point at
+  the wrong bins;
+- optionally refits the same model from scratch on all rows and reports both
+  timings and held-out metrics side by side;
+- registers the grown model as a new version.
+
+Usage:
+    python -m app.training.incremental --task cash_flow
+    python -m app.training.incremental --task bankruptcy --publish models/bankruptcy_model.pkl
+"""
+
+import argparse
+import copy
+import math
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, clone, is_classifier
+from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+from sklearn.preprocessing import PowerTransformer
+
+from app.datasets.columnar import read_training_csv
+from app.training.artifacts import ModelArtifact
+from app.training.data import DATASET_PATHS, SEED, TASKS, prepare_training_data
+from app.training.estimators import ensemble_size_param
+from app.training.registry import ModelRegistry
+from app.training.search import evaluate
+
+DEFAULT_REPLAY_RATIO = 1.0
+DEFAULT_MIN_NEW_ESTIMATORS = 10
+DELTA_TEST_SIZE = 0.2
+MIN_DELTA_FOR_TEST = 10
+# Below this share of already-seen rows, growing the old ensemble makes no sense.
+MIN_SEEN_FRACTION = 0.5
+
+WARM_START = "warm_start"
+REFIT = "refit"
+
+
+@dataclass
+class IncrementalReport:
+    task: str
+    base_version: int
+    version: Optional[int]
+    n_seen: int
+    n_delta: int
+    n_delta_train: int
+    n_delta_test: int
+    n_replay: int
+    strategy: str
+    n_new_estimators: int
+    incremental_time: float
+    full_retrain_time: Optional[float] = None
+    # Metrics on the held-out part of the delta.
+    base_metrics: Dict[str, float] = field(default_factory=dict)
+    incremental_metrics: Dict[str, float] = field(default_factory=dict)
+    full_retrain_metrics: Dict[str, float] = field(default_factory=dict)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def summary(self) -> str:
+        lines = [
+            f"{self.task}: {self.n_delta} new rows since version {self.base_version} "
+            f"({self.n_delta_train} train, {self.n_delta_test} held out, "
+            f"{self.n_replay} replayed)",
+            f"  incremental ({self.strategy}, +{self.n_new_estimators} estimators): "
+            f"{self.incremental_time:.1f}s {self.incremental_metrics}",
+        ]
+        if self.full_retrain_time is not None:
+            lines.append(
+                f"  full retrain: {self.full_retrain_time:.1f}s {self.full_retrain_metrics}"
+            )
+        if self.base_metrics:
+            lines.append(f"  previous version: {self.base_metrics}")
+        if self.version is not None:
+            lines.append(f"  registered as version {self.version}")
+        return "\n".join(lines)
+
+
+def _ensemble_size(model: BaseEstimator) -> int:
+    for attribute in ("n_estimators_", "n_iter_"):
+        if hasattr(model, attribute):
+            return int(getattr(model, attribute))
+    return len(model.estimators_)
+
+
+def grow_ensemble(model: BaseEstimator, X: np.ndarray, y: np.ndarray, n_new: int) -> bool:
+    """
+    Add ``n_new`` estimators to a fitted ensemble, fitted on ``X``/``y``.
+
+    Returns:
+        False, leaving ``model`` untouched, if it cannot be grown in place:
+        the estimator has no warm start, it bins its inputs on each fit
+        (histogram gradient boosting), or ``y`` does not contain exactly the
+        classes the model was fitted on.
+    """
+    size_param = ensemble_size_param(model)
+    if "warm_start" not in model.get_params() or size_param is None:
+        return False
+    if isinstance(model, (HistGradientBoostingRegressor, HistGradientBoostingClassifier)):
+        return False
+    if is_classifier(model) and not np.array_equal(np.unique(y), model.classes_):
+        return False
+
+    model.set_params(warm_start=True, **{size_param: _ensemble_size(model) + n_new})
+    try:
+        model.fit(X, y)
+    finally:
+        model.set_params(warm_start=False)
+    return True
+
+
+def _split_delta(delta: np.ndarray, rng: np.random.Generator):
+    delta = rng.permutation(delta)
+    if len(delta) < MIN_DELTA_FOR_TEST:
+        return delta, delta[:0]
+    n_test = int(round(len(delta) * DELTA_TEST_SIZE))
+    return delta[n_test:], delta[:n_test]
+
+
+def incremental_retrain(
+    task: str,
+    df: Optional[pd.DataFrame] = None,
+    path: Optional[str] = None,
+    registry: Optional[ModelRegistry] = None,
+    replay_ratio: float = DEFAULT_REPLAY_RATIO,
+    min_new_estimators: int = DEFAULT_MIN_NEW_ESTIMATORS,
+    compare: bool = True,
+    register: bool = True,
+    publish_path: Optional[str] = None,
+    seed: int = SEED,
+) -> Optional[IncrementalReport]:
+    """
+    Update the latest registered ``task`` model with the rows it has not seen.
+
+    Args:
+        task: ``cash_flow`` or ``bankruptcy``.
+        df: Current combined dataset; read from ``path`` (or the default) if omitted.
+        path: Training CSV.
+        registry: Registry to read from and write to.
+        replay_ratio: Old rows replayed per new training row.
+        min_new_estimators: Lower bound on the estimators added.
+        compare: Also refit from scratch on all rows and report both.
+        register: Store the updated model as a new registry version.
+        publish_path: Also save the updated artifact here.
+        seed: Seed for the held-out split and the replay sample.
+
+    Returns:
+        The report, or None if there are no new rows.
+    """
+    registry = registry or ModelRegistry()
+    base_version = registry.latest(task)
+    if base_version is None:
+        raise FileNotFoundError(
+            f"No registered {task} model; run "
+            f"`python -m app.training.search --task {task} --register` first"
+        )
+    base = registry.load(task, base_version)
+    seen = registry.seen_rows(task, base_version)
+    if not len(seen):
+        raise ValueError(f"{task} version {base_version} does not record its training rows")
+
+    if df is None:
+        df = read_training_csv(path or DATASET_PATHS[task])
+    data = prepare_training_data(
+        task, df, features=base.features, target_scaler=base.target_scaler
+    )
+    X = data.X.to_numpy(dtype=np.float64)
+    y = data.y.to_numpy()
+    is_seen = np.isin(data.row_ids, seen)
+    old = np.flatnonzero(is_seen)
+    delta = np.flatnonzero(~is_seen)
+    if not len(delta):
+        print(f"{task}: no new rows since version {base_version}")
+        return None
+
+    rng = np.random.default_rng(seed)
+    delta_train, delta_test = _split_delta(delta, rng)
+    n_replay = min(len(old), math.ceil(replay_ratio * len(delta_train)))
+    replay = rng.choice(old, size=n_replay, replace=False)
+    fit_rows = np.concatenate([delta_train, replay])
+    all_train = np.concatenate([old, delta_train])
+
+    start = time.perf_counter()
+    model = copy.deepcopy(base.model)
+    X_t = base.transform(X)
+    size = _ensemble_size(model)
+    n_new = min(
+        size,
+        max(min_new_estimators, math.ceil(size * len(delta_train) / max(1, len(old)))),
+    )
+    mostly_seen = len(old) >= MIN_SEEN_FRACTION * len(data.row_ids)
+    if mostly_seen and grow_ensemble(model, X_t[fit_rows], y[fit_rows], n_new):
+        strategy = WARM_START
+    else:
+        strategy, n_new = REFIT, 0
+        model = clone(base.model).fit(X_t[all_train], y[all_train])
+    incremental_time = time.perf_counter() - start
+
+    problem_type = data.problem_type
+    report = IncrementalReport(
+        task=task,
+        base_version=base_version,
+        version=None,
+        n_seen=int(len(old)),
+        n_delta=int(len(delta)),
+        n_delta_train=int(len(delta_train)),
+        n_delta_test=int(len(delta_test)),
+        n_replay=int(n_replay),
+        strategy=strategy,
+        n_new_estimators=int(n_new),
+        incremental_time=incremental_time,
+    )
+    if len(delta_test):
+        report.base_metrics = evaluate(problem_type, y[delta_test], base.predict(X[delta_test]))
+        report.incremental_metrics = evaluate(
+            problem_type, y[delta_test], model.predict(X_t[delta_test])
+        )
+
+    if compare:
+        start = time.perf_counter()
+        transformer = PowerTransformer()
+        full = clone(base.model).fit(transformer.fit_transform(X[all_train]), y[all_train])
+        report.full_retrain_time = time.perf_counter() - start
+        if len(delta_test):
+            report.full_retrain_metrics = evaluate(
+                problem_type, y[delta_test], full.predict(transformer.transform(X[delta_test]))
+            )
+
+    if register:
+        params = dict(base.params)
+        size_param = ensemble_size_param(model)
+        if size_param is not None:
+            params[size_param] = model.get_params()[size_param]
+        artifact = ModelArtifact(
+            task=task,
+            model_name=base.model_name,
+            model=model,
+            features=list(base.features),
+            feature_transformer=base.feature_transformer,
+            target_scaler=base.target_scaler,
+            params=params,
+            metrics=report.incremental_metrics,
+            metadata={
+                **{k: v for k, v in base.metadata.items() if k != "registry_version"},
+                "training": "incremental",
+                "base_version": base_version,
+                "strategy": strategy,
+            },
+        )
+        # Held-out delta rows stay unseen, so the next run trains on them.
+        seen_rows = np.union1d(seen, data.row_ids[delta_train])
+        report.version = registry.register(
+            artifact,
+            seen_rows=seen_rows,
+            report=report.as_dict(),
+            publish_path=publish_path,
+        )
+    return report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Update the latest registered model with newly added rows."
+    )
+    parser.add_argument("--task", choices=TASKS, required=True)
+    parser.add_argument("--data", help="Training CSV (defaults to the task's dataset)")
+    parser.add_argument("--publish", help="Also write the updated artifact here")
+    parser.add_argument("--replay-ratio", type=float, default=DEFAULT_REPLAY_RATIO)
+    parser.add_argument(
+        "--no-compare", action="store_true", help="Skip the full-retrain comparison"
+    )
+    args = parser.parse_args(argv)
+
+    report = incremental_retrain(
+        args.task,
+        path=args.data,
+        replay_ratio=args.replay_ratio,
+        compare=not args.no_compare,
+        publish_path=args.publish,
+    )
+    if report is not None:
+        print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
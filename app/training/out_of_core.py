@@ -0,0 +1,437 @@
+"""
+Out-of-core training for datasets larger than memory.
+
+:mod:`app.training.search` loads the whole combined dataset, which caps the
+synthetic augmentation at what fits in RAM. This pipeline never holds more
+than one batch of rows plus a fixed-size sample, so its memory use is set by
+``memory_budget_mb`` rather than by the dataset:
+
+1. Stream the source (a CSV, parsed ``batch_rows`` at a time, or a columnar
+   dataset directory) and compute the shared features per batch. Lags carry
+   the last row of each ticker into the next batch. Every fifth row, chosen by
+   a hash of the source row, is held out for evaluation.
+2. First pass: accumulate the target scaler with ``partial_fit`` and keep a
+   uniform reservoir sample of training rows. The Yeo-Johnson lambdas are
+   estimated on that sample. Unless a feature list is given, feature means and
+   covariances are accumulated in the same pass
+   (:class:`~app.datasets.streaming_stats.StreamingMoments`) and collinear
+   features are dropped with the in-memory pipeline's rule.
+3. Second pass: accumulate the mean and variance of the power-transformed
+   features with ``StandardScaler.partial_fit``. The power transform and the
+   scaler together form the artifact's feature transformer.
+4. Train either ``sgd`` (``SGDRegressor``/``SGDClassifier`` over mini-batches,
+   for ``epochs`` passes) or ``hist`` (histogram gradient boosting, which bins
+   features to one byte, fitted on a budget-sized sample).
+5. Evaluate on the held-out rows in a final streaming pass.
+
+Rows are dropped only when a feature or the target is missing. The in-memory
+pipeline also drops rows without a date, which removes every synthetic row.
+
+Usage:
+    python -m app.training.out_of_core --task cash_flow --data big_synthetic.csv \\
+        --estimator sgd --memory-budget-mb 256 --output models/cash_flow_model.pkl
+"""
+
+import argparse
+import resource
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier, HistGradientBoostingRegressor
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import PowerTransformer, StandardScaler
+
+from app.core.features import DEFAULT_GROUP_KEY, FEATURE_NAMES, add_features
+from app.datasets.columnar import iter_batches
+from app.datasets.streaming_stats import StreamingMoments, collinear_features
+from app.training.artifacts import ModelArtifact, save_artifact
+from app.training.data import (
+    BANKRUPTCY_TARGET,
+    CASH_FLOW,
+    CASH_FLOW_TARGET,
+    DATASET_PATHS,
+    REGRESSION,
+    SEED,
+    TASKS,
+    add_missing_balance_sheet_columns,
+    placeholder_bankruptcy_target,
+    source_row_ids,
+)
+
+SGD = "sgd"
+HIST = "hist"
+ESTIMATORS = (SGD, HIST)
+
+DEFAULT_MEMORY_BUDGET_MB = 512
+DEFAULT_EPOCHS = 5
+MAX_SAMPLE_ROWS = 1_000_000
+# Every TEST_MODULUS-th row (by source row hash) is held out.
+TEST_MODULUS = 5
+
+# Rough working-set bytes per value for a pandas batch (parse buffers, copies
+# made while computing features) and per row for histogram boosting (raw and
+# binned features, gradients, hessians, predictions).
+_BATCH_BYTES_PER_VALUE = 48
+_HIST_BYTES_PER_ROW_FEATURE = 24
+
+
+@dataclass
+class Batch:
+    X: np.ndarray
+    y: np.ndarray
+    is_test: np.ndarray
+
+
+@dataclass
+class OutOfCoreReport:
+    task: str
+    estimator: str
+    rows_streamed: int
+    train_rows: int
+    test_rows: int
+    sample_rows: int
+    batch_rows: int
+    passes: int
+    wall_time: float
+    peak_rss_mb: float
+    test_metrics: Dict[str, float]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def summary(self) -> str:
+        metrics = ", ".join(f"{k}={v:.4f}" for k, v in self.test_metrics.items())
+        return (
+            f"{self.task} out-of-core {self.estimator}: {self.rows_streamed} rows streamed "
+            f"({self.train_rows} train / {self.test_rows} test) in {self.passes} passes, "
+            f"{self.wall_time:.1f}s, peak RSS {self.peak_rss_mb:.0f} MB; {metrics}"
+        )
+
+
+def plan_budget(
+    memory_budget_mb: float, n_source_columns: int, n_features: int
+) -> Tuple[int, int]:
+    """
+    Split the memory budget between the streaming batch and the sample.
+
+    Returns:
+        ``(batch_rows, sample_rows)``.
+    """
+    budget = memory_budget_mb * 1024 * 1024
+    batch_rows = int(budget * 0.25 / (_BATCH_BYTES_PER_VALUE * max(1, n_source_columns)))
+    sample_rows = int(budget * 0.5 / (_HIST_BYTES_PER_ROW_FEATURE * max(1, n_features)))
+    return max(1_000, batch_rows), max(1_000, min(MAX_SAMPLE_ROWS, sample_rows))
+
+
+class ReservoirSample:
+    """
+    Uniform fixed-size sample of a stream of rows.
+
+    Each row gets a random key and the ``size`` smallest keys are kept (bottom-k
+    sampling), which is a uniform sample without replacement and is updated a
+    whole batch at a time.
+    """
+
+    def __init__(self, size: int, seed: int = SEED):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.empty(0)
+        self.X: Optional[np.ndarray] = None
+        self.y: Optional[np.ndarray] = None
+
+    def add(self, X: np.ndarray, y: np.ndarray) -> None:
+        keys = self.rng.random(len(X))
+        if self.X is None:
+            self.X, self.y = X[:0], y[:0]
+        keys = np.concatenate([self.keys, keys])
+        X = np.concatenate([self.X, X])
+        y = np.concatenate([self.y, y])
+        if len(keys) > self.size:
+            keep = np.argpartition(keys, self.size)[: self.size]
+            keys, X, y = keys[keep], X[keep], y[keep]
+        self.keys, self.X, self.y = keys, X, y
+
+
+class BatchStream:
+    """
+    Re-iterable stream of feature batches from one source.
+
+    Every iteration yields identical batches: the placeholder columns and any
+    random labels are drawn per row from its id, so they also do not depend
+    on the batch size.
+    """
+
+    def __init__(
+        self,
+        task: str,
+        path: str,
+        batch_rows: int,
+        features: Sequence[str] = FEATURE_NAMES,
+        group_key: str = DEFAULT_GROUP_KEY,
+        seed: int = SEED,
+    ):
+        self.task = task
+        self.path = path
+        self.batch_rows = batch_rows
+        self.features = list(features)
+        self.group_key = group_key
+        self.seed = seed
+
+    def _target(self, df: pd.DataFrame, row_ids: np.ndarray) -> np.ndarray:
+        if self.task == CASH_FLOW:
+            return df[CASH_FLOW_TARGET].to_numpy(dtype=np.float64)
+        for name in (BANKRUPTCY_TARGET, BANKRUPTCY_TARGET + "_"):
+            if name in df.columns:
+                return df[name].to_numpy(dtype=np.float64)
+        return placeholder_bankruptcy_target(row_ids, self.seed).astype(np.float64)
+
+    def __iter__(self) -> Iterator[Batch]:
+        carry: Optional[pd.DataFrame] = None
+        for raw in iter_batches(self.path, self.batch_rows):
+            row_ids = source_row_ids(raw).to_numpy()
+            is_test = (row_ids % TEST_MODULUS) == 0
+            df = add_missing_balance_sheet_columns(raw.reset_index(drop=True), row_ids, self.seed)
+            y = self._target(df, row_ids)
+
+            # Prepend the previous batch's last row per ticker so the first
+            # quarter of each ticker in this batch gets its lag.
+            n_carry = 0 if carry is None else len(carry)
+            frame = df if carry is None else pd.concat([carry, df], ignore_index=True)
+            features = add_features(frame, self.group_key)
+            if self.group_key in frame.columns:
+                carry = frame.groupby(self.group_key, sort=False, dropna=False).tail(1)
+            else:
+                carry = frame.tail(1)
+            carry = carry[df.columns].reset_index(drop=True)
+
+            X = features[self.features].to_numpy(dtype=np.float64)[n_carry:]
+            valid = np.isfinite(X).all(axis=1) & np.isfinite(y)
+            if self.task == CASH_FLOW:
+                valid &= y > 0
+            if valid.any():
+                yield Batch(X[valid], y[valid], is_test[valid])
+
+
+def _train_rows(batch: Batch) -> Tuple[np.ndarray, np.ndarray]:
+    train = ~batch.is_test
+    return batch.X[train], batch.y[train]
+
+
+def _build_estimator(task: str, estimator: str, seed: int):
+    if estimator == SGD:
+        if task == CASH_FLOW:
+            return SGDRegressor(random_state=seed)
+        return SGDClassifier(loss="log_loss", random_state=seed)
+    if estimator == HIST:
+        if task == CASH_FLOW:
+            return HistGradientBoostingRegressor(random_state=seed)
+        return HistGradientBoostingClassifier(random_state=seed)
+    raise ValueError(f"Unknown estimator {estimator!r}; expected one of {ESTIMATORS}")
+
+
+class _StreamingMetrics:
+    """Accumulates MSE/R^2 or accuracy without keeping predictions."""
+
+    def __init__(self, problem_type: str):
+        self.problem_type = problem_type
+        self.n = 0
+        self.sum_y = 0.0
+        self.sum_y2 = 0.0
+        self.sse = 0.0
+        self.correct = 0
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray) -> None:
+        self.n += len(y_true)
+        if self.problem_type == REGRESSION:
+            self.sum_y += float(y_true.sum())
+            self.sum_y2 += float(np.square(y_true).sum())
+            self.sse += float(np.square(y_true - y_pred).sum())
+        else:
+            self.correct += int((y_true == y_pred).sum())
+
+    def result(self) -> Dict[str, float]:
+        if not self.n:
+            return {}
+        if self.problem_type == REGRESSION:
+            sst = self.sum_y2 - self.sum_y**2 / self.n
+            return {
+                "mse": self.sse / self.n,
+                "r2": 1.0 - self.sse / sst if sst > 0 else 0.0,
+            }
+        return {"accuracy": self.correct / self.n}
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def fit_out_of_core(
+    task: str,
+    path: Optional[str] = None,
+    estimator: str = SGD,
+    memory_budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+    epochs: int = DEFAULT_EPOCHS,
+    features: Optional[Sequence[str]] = None,
+    batch_rows: Optional[int] = None,
+    seed: int = SEED,
+) -> Tuple[ModelArtifact, OutOfCoreReport]:
+    """
+    Train a ``task`` model by streaming the dataset at ``path``.
+
+    Args:
+        task: ``cash_flow`` or ``bankruptcy``.
+        path: Training CSV or columnar dataset directory.
+        estimator: ``sgd`` (mini-batch) or ``hist`` (histogram boosting on a sample).
+        memory_budget_mb: Approximate working-set budget for batches and samples.
+        epochs: Passes over the data for ``sgd``.
+        features: Model features. By default, :data:`FEATURE_NAMES` minus the
+            collinear ones found during the first pass.
+        batch_rows: Override the batch size derived from the budget.
+        seed: Seed for placeholders, sampling and the estimator.
+    """
+    if task not in TASKS:
+        raise ValueError(f"Unknown task {task!r}; expected one of {TASKS}")
+    start = time.perf_counter()
+    path = path or DATASET_PATHS[task]
+    select_features = features is None
+    features = list(features or FEATURE_NAMES)
+    problem_type = REGRESSION if task == CASH_FLOW else "classification"
+
+    n_columns = len(next(iter_batches(path, 1)).columns)
+    planned_batch, sample_rows = plan_budget(memory_budget_mb, n_columns, len(features))
+    stream = BatchStream(task, path, batch_rows or planned_batch, features, seed=seed)
+
+    # Pass 1: target scaler, row counts and a sample for the power transform.
+    target_scaler = StandardScaler() if task == CASH_FLOW else None
+    sample = ReservoirSample(sample_rows, seed)
+    moments = StreamingMoments(features) if select_features else None
+    rows_streamed = train_rows = 0
+    for batch in stream:
+        if moments is not None:
+            moments.update(batch.X)
+        X, y = _train_rows(batch)
+        rows_streamed += len(batch.y)
+        train_rows += len(y)
+        if not len(y):
+            continue
+        if target_scaler is not None:
+            target_scaler.partial_fit(y.reshape(-1, 1))
+        sample.add(X, y)
+    if not train_rows:
+        raise ValueError(f"No usable training rows in {path}")
+
+    dropped: List[str] = []
+    if moments is not None:
+        dropped = collinear_features(moments.correlation())
+        keep = [i for i, name in enumerate(features) if name not in dropped]
+        features = [features[i] for i in keep]
+        sample.X = sample.X[:, keep]
+        stream.features = features
+
+    def scale_target(y):
+        if target_scaler is None:
+            return y.astype(int)
+        return target_scaler.transform(y.reshape(-1, 1)).ravel()
+
+    # Pass 2: mean and variance of the power-transformed features.
+    power = PowerTransformer(standardize=False).fit(sample.X)
+    scaler = StandardScaler()
+    for batch in stream:
+        X, _ = _train_rows(batch)
+        if len(X):
+            scaler.partial_fit(power.transform(X))
+    transformer = Pipeline([("power", power), ("scale", scaler)])
+    passes = 2
+
+    model = _build_estimator(task, estimator, seed)
+    if estimator == SGD:
+        rng = np.random.default_rng(seed)
+        classes = np.array([0, 1])
+        for _ in range(epochs):
+            for batch in stream:
+                X, y = _train_rows(batch)
+                if not len(y):
+                    continue
+                order = rng.permutation(len(y))
+                X_t, y_t = transformer.transform(X[order]), scale_target(y[order])
+                if problem_type == REGRESSION:
+                    model.partial_fit(X_t, y_t)
+                else:
+                    model.partial_fit(X_t, y_t, classes=classes)
+            passes += 1
+    else:
+        model.fit(transformer.transform(sample.X), scale_target(sample.y))
+
+    # Final pass: held-out metrics.
+    metrics = _StreamingMetrics(problem_type)
+    for batch in stream:
+        test = batch.is_test
+        if test.any():
+            y_true = scale_target(batch.y[test])
+            metrics.update(y_true, model.predict(transformer.transform(batch.X[test])))
+    passes += 1
+
+    report = OutOfCoreReport(
+        task=task,
+        estimator=estimator,
+        rows_streamed=rows_streamed,
+        train_rows=train_rows,
+        test_rows=metrics.n,
+        sample_rows=len(sample.y),
+        batch_rows=stream.batch_rows,
+        passes=passes,
+        wall_time=time.perf_counter() - start,
+        peak_rss_mb=_peak_rss_mb(),
+        test_metrics=metrics.result(),
+    )
+    artifact = ModelArtifact(
+        task=task,
+        model_name=type(model).__name__,
+        model=model,
+        features=features,
+        feature_transformer=transformer,
+        target_scaler=target_scaler,
+        params=model.get_params(),
+        metrics=report.test_metrics,
+        metadata={
+            "training": "out_of_core",
+            "source": path,
+            "dropped_features": dropped,
+            **report.as_dict(),
+        },
+    )
+    return artifact, report
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train a model without loading the dataset.")
+    parser.add_argument("--task", choices=TASKS, required=True)
+    parser.add_argument("--data", help="Training CSV or columnar dataset directory")
+    parser.add_argument("--estimator", choices=ESTIMATORS, default=SGD)
+    parser.add_argument("--memory-budget-mb", type=float, default=DEFAULT_MEMORY_BUDGET_MB)
+    parser.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS)
+    parser.add_argument("--batch-rows", type=int)
+    parser.add_argument("--output", help="Where to write the model artifact")
+    args = parser.parse_args(argv)
+
+    artifact, report = fit_out_of_core(
+        args.task,
+        path=args.data,
+        estimator=args.estimator,
+        memory_budget_mb=args.memory_budget_mb,
+        epochs=args.epochs,
+        batch_rows=args.batch_rows,
+    )
+    print(report.summary())
+    if args.output:
+        save_artifact(artifact, args.output)
+        print(f"Model artifact saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Versioned model registry on the local filesystem.
+
+Each registered artifact gets a numbered version directory holding the pickled
+:class:`~app.training.artifacts.ModelArtifact`, the ids of the rows it was
+trained on (so a later run can find the rows it has not seen) and an optional
+JSON report::
+
+    models/registry/<task>/v0001/artifact.pkl
+    models/registry/<task>/v0001/seen_rows.npy
+    models/registry/<task>/v0001/report.json
+
+The routers keep serving ``models/<task>_model.pkl``; pass ``publish_path`` to
+:meth:`ModelRegistry.register` to update it as well.
+
+:meth:`ModelRegistry.push` and :meth:`ModelRegistry.pull` copy versions to and
+from object storage (``app.core.storage``) under ``models/registry/<task>/``.
+The artifact is always transferred last, so a partially copied version is
+never picked up as the latest.
+"""
+
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.storage import ObjectStorage
+from app.training.artifacts import MODEL_DIR, ModelArtifact, load_artifact, save_artifact
+
+REGISTRY_DIR = os.path.join(MODEL_DIR, "registry")
+ARTIFACT_FILE = "artifact.pkl"
+SEEN_ROWS_FILE = "seen_rows.npy"
+REPORT_FILE = "report.json"
+STORAGE_PREFIX = "models/registry"
+
+_VERSION_PATTERN = re.compile(r"^v(\d+)$")
+
+
+class ModelRegistry:
+    def __init__(self, root: str = REGISTRY_DIR):
+        self.root = root
+
+    def versions(self, task: str) -> List[int]:
+        """Registered versions of ``task``, oldest first."""
+        task_dir = os.path.join(self.root, task)
+        if not os.path.isdir(task_dir):
+            return []
+        found = []
+        for name in os.listdir(task_dir):
+            match = _VERSION_PATTERN.match(name)
+            if match and os.path.exists(os.path.join(task_dir, name, ARTIFACT_FILE)):
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    def latest(self, task: str) -> Optional[int]:
+        versions = self.versions(task)
+        return versions[-1] if versions else None
+
+    def version_dir(self, task: str, version: int) -> str:
+        return os.path.join(self.root, task, f"v{version:04d}")
+
+    def _resolve(self, task: str, version: Optional[int]) -> int:
+        if version is None:
+            version = self.latest(task)
+        if version is None:
+            raise FileNotFoundError(f"No registered {task} models in {self.root}")
+        return version
+
+    def load(self, task: str, version: Optional[int] = None) -> ModelArtifact:
+        """Load ``version`` (default: latest) of ``task``."""
+        version = self._resolve(task, version)
+        return load_artifact(os.path.join(self.version_dir(task, version), ARTIFACT_FILE), task)
+
+    def seen_rows(self, task: str, version: Optional[int] = None) -> np.ndarray:
+        """Ids of the rows a version was trained on (empty if not recorded)."""
+        version = self._resolve(task, version)
+        path = os.path.join(self.version_dir(task, version), SEEN_ROWS_FILE)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=np.uint64)
+        return np.load(path)
+
+    def report(self, task: str, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        version = self._resolve(task, version)
+        path = os.path.join(self.version_dir(task, version), REPORT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def register(
+        self,
+        artifact: ModelArtifact,
+        seen_rows: Optional[np.ndarray] = None,
+        report: Optional[Dict[str, Any]] = None,
+        publish_path: Optional[str] = None,
+    ) -> int:
+        """
+        Store ``artifact`` as the next version of its task.
+
+        Args:
+            artifact: The trained model.
+            seen_rows: Row ids (see :func:`app.training.data.source_row_ids`)
+                of its training data.
+            report: JSON-serialisable training report.
+            publish_path: Also save the artifact here, e.g. the path a router
+                serves from.
+
+        Returns:
+            The new version number.
+        """
+        task = artifact.task
+        version = (self.latest(task) or 0) + 1
+        # Claim the directory; a concurrent register gets the next number.
+        while True:
+            directory = self.version_dir(task, version)
+            try:
+                os.makedirs(directory)
+                break
+            except FileExistsError:
+                version += 1
+
+        artifact.metadata["registry_version"] = version
+        if seen_rows is not None:
+            np.save(os.path.join(directory, SEEN_ROWS_FILE), np.asarray(seen_rows, dtype=np.uint64))
+        if report is not None:
+            with open(os.path.join(directory, REPORT_FILE), "w") as f:
+                json.dump(report, f, indent=2, default=str)
+        # Written last: a version only counts once its artifact exists.
+        save_artifact(artifact, os.path.join(directory, ARTIFACT_FILE))
+        if publish_path:
+            save_artifact(artifact, publish_path)
+        return version
+
+    def _storage_dir(self, task: str, version: int) -> str:
+        return f"{STORAGE_PREFIX}/{task}/v{version:04d}"
+
+    async def push(self, storage: ObjectStorage, task: str, version: Optional[int] = None) -> int:
+        """Upload ``version`` (default: latest) of ``task``; returns the version."""
+        version = self._resolve(task, version)
+        directory = self.version_dir(task, version)
+        target = self._storage_dir(task, version)
+        names = [name for name in sorted(os.listdir(directory)) if name != ARTIFACT_FILE]
+        await storage.upload_many((os.path.join(directory, name), f"{target}/{name}") for name in names)
+        await storage.upload_file(os.path.join(directory, ARTIFACT_FILE), f"{target}/{ARTIFACT_FILE}")
+        return version
+
+    async def remote_versions(self, storage: ObjectStorage, task: str) -> List[int]:
+        """Versions of ``task`` in ``storage`` whose artifact has been uploaded."""
+        found = []
+        for key in await storage.list_keys(f"{STORAGE_PREFIX}/{task}/"):
+            parts = key.split("/")
+            match = _VERSION_PATTERN.match(parts[-2])
+            if match and parts[-1] == ARTIFACT_FILE:
+                found.append(int(match.group(1)))
+        return sorted(found)
+
+    async def pull(self, storage: ObjectStorage, task: str, version: Optional[int] = None) -> int:
+        """Download ``version`` (default: the latest in storage) of ``task``; returns the version."""
+        if version is None:
+            versions = await self.remote_versions(storage, task)
+            if not versions:
+                raise FileNotFoundError(f"No registered {task} models in storage")
+            version = versions[-1]
+        directory = self.version_dir(task, version)
+        source = self._storage_dir(task, version)
+        keys = [key for key in await storage.list_keys(source + "/") if not key.endswith("/" + ARTIFACT_FILE)]
+        await storage.download_many((key, os.path.join(directory, key.rsplit("/", 1)[1])) for key in keys)
+        await storage.download_file(f"{source}/{ARTIFACT_FILE}", os.path.join(directory, ARTIFACT_FILE))
+        return version
@@ -0,0 +1,237 @@
+"""
+On-disk store of cross-validation results for resumable searches.
+
+Every fold fit of a search is recorded as one small JSON file, keyed by a hash
+of the training data and fold layout, the model family and its full parameter
+set, the fold and the number of training rows. A search that finds an entry
+reuses it instead of fitting again, so after a crash, or after adding a value
+to a grid, only the missing fits are run.
+
+Several processes, on one machine or on several machines sharing the store
+directory, can run the same search at once. A worker claims a fit by creating
+a lock file next to the entry (an atomic ``O_EXCL`` create) holding its host
+name and pid; other workers skip claimed fits and pick up their results once
+written. A claim is abandoned, and taken over, when:
+
+- its pid is no longer running on the same host (a killed worker), or
+- its lock file has not been touched for ``lock_timeout`` seconds. A
+  background thread in the claiming process touches its locks every
+  ``lock_timeout / 4`` seconds, so this only happens when that process (or
+  its machine) is gone. The thread exits once the process holds no claims.
+
+Layout::
+
+    <root>/<data hash>/<family>/<entry hash>.json
+    <root>/<data hash>/<family>/<entry hash>.lock
+"""
+
+import hashlib
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Set
+
+import numpy as np
+
+DEFAULT_LOCK_TIMEOUT = 120.0
+
+
+def data_fingerprint(X: np.ndarray, y: np.ndarray, **config: Any) -> str:
+    """Hash of the training arrays and any settings that change the folds."""
+    digest = hashlib.sha256()
+    for array in (X, y):
+        array = np.ascontiguousarray(array)
+        digest.update(str(array.dtype).encode())
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    digest.update(json.dumps(config, sort_keys=True, default=repr).encode())
+    return digest.hexdigest()[:16]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, (np.integer, np.floating)):
+        return value.item()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return repr(value)
+
+
+class ResultStore:
+    """
+    Directory of per-fit results shared by every worker of a search.
+
+    Args:
+        root: Store directory; created on first write. May be on a network
+            filesystem shared by several machines.
+        lock_timeout: Seconds without a heartbeat after which a claim is
+            taken over.
+    """
+
+    def __init__(self, root: str, lock_timeout: float = DEFAULT_LOCK_TIMEOUT):
+        self.root = root
+        self.lock_timeout = lock_timeout
+        self._reset_heartbeat()
+
+    def _reset_heartbeat(self) -> None:
+        self._held: Set[str] = set()
+        self._held_lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+        # Set when the last claim is released, so the heartbeat exits promptly.
+        self._idle = threading.Event()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Workers get the configuration only; each tracks its own claims.
+        return {"root": self.root, "lock_timeout": self.lock_timeout}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._reset_heartbeat()
+
+    @staticmethod
+    def entry_key(
+        data_hash: str,
+        family: str,
+        params: Dict[str, Any],
+        fold: int,
+        n_rows: int,
+    ) -> Dict[str, Any]:
+        """The fields that identify one fold fit."""
+        return {
+            "data": data_hash,
+            "family": family,
+            "params": _canonical(params),
+            "fold": int(fold),
+            "n_rows": int(n_rows),
+        }
+
+    def _path(self, key: Dict[str, Any], suffix: str) -> str:
+        digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()[:24]
+        return os.path.join(self.root, key["data"], key["family"], digest + suffix)
+
+    def get(self, key: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """The stored record for ``key``, or None if the fit has not finished."""
+        try:
+            with open(self._path(key, ".json")) as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # Guard against digest collisions.
+        return record if record.get("key") == key else None
+
+    def put(self, key: Dict[str, Any], score: float, fit_time: float) -> None:
+        """Record a finished fit atomically and release its claim."""
+        path = self._path(key, ".json")
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        record = {
+            "key": key,
+            "score": float(score),
+            "fit_time": float(fit_time),
+            "host": socket.gethostname(),
+            "finished_at": datetime.utcnow().isoformat(),
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        self.release(key)
+
+    def claim(self, key: Dict[str, Any]) -> bool:
+        """
+        Try to take ownership of the fit for ``key``.
+
+        Returns False if another worker holds a live claim.
+        """
+        path = self._path(key, ".lock")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._is_stale(path):
+                    return False
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(f"{socket.gethostname()} {os.getpid()}\n")
+            self._hold(path)
+            return True
+        return False
+
+    def release(self, key: Dict[str, Any]) -> None:
+        path = self._path(key, ".lock")
+        with self._held_lock:
+            self._held.discard(path)
+            if not self._held:
+                self._idle.set()
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _hold(self, path: str) -> None:
+        with self._held_lock:
+            self._held.add(path)
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(
+                    target=self._touch_held, name="result-store-heartbeat", daemon=True
+                )
+                self._heartbeat.start()
+
+    def _touch_held(self) -> None:
+        while True:
+            self._idle.wait(self.lock_timeout / 4)
+            with self._held_lock:
+                self._idle.clear()
+                if not self._held:
+                    # The next claim starts a new heartbeat.
+                    self._heartbeat = None
+                    return
+                held = list(self._held)
+            for path in held:
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    pass
+
+    def is_claimed(self, key: Dict[str, Any]) -> bool:
+        path = self._path(key, ".lock")
+        return os.path.exists(path) and not self._is_stale(path)
+
+    def _is_stale(self, path: str) -> bool:
+        try:
+            if time.time() - os.path.getmtime(path) > self.lock_timeout:
+                return True
+            with open(path) as f:
+                owner = f.read().split()
+        except FileNotFoundError:
+            return True
+        # An empty lock is being written by its owner right now.
+        if len(owner) == 2 and owner[0] == socket.gethostname():
+            return not _pid_alive(int(owner[1]))
+        return False
@@ -0,0 +1,734 @@
+"""
+Hyperparameter search and training entry point for both models.
+
+The notebooks run an exhaustive ``GridSearchCV`` per model family, one family
+after another. This module searches the same grids with successive halving:
+
+- The KFold splits are derived once. For each fold the ``PowerTransformer`` is
+  fitted on the fold's training rows and the transformed train/validation
+  matrices are cached, so every candidate reuses them instead of re-deriving
+  the folds.
+- Every candidate is first scored on a small random subset of each fold's
+  training rows. Only the best ``1 / factor`` of each family move on to the
+  next round with ``factor`` times more rows. The last round uses all rows.
+- Candidates that differ only in ensemble size (``n_estimators``, or
+  ``max_iter`` for histogram boosting) share one fit: the largest
+  ensemble is grown once per fold and the smaller sizes are scored along the
+  way (``staged_predict`` for boosting, ``warm_start`` for forests). The scores
+  are identical to fitting each size separately.
+- The rounds of all families are aligned so that each round's fits, across
+  every family, go to one shared worker pool in a single batch. Small families
+  such as AdaBoost join in the later rounds, and no family waits for another
+  to finish.
+
+``method="grid"`` runs the exhaustive search on the same machinery, and
+:func:`run_gridsearchcv_baseline` reproduces the notebook loop so the two can be
+timed side by side.
+
+With ``--store DIR`` every fold fit is recorded in a
+:class:`~app.training.result_store.ResultStore`. Rerunning the command after a
+crash or a grid change only fits what is missing, and several machines can
+run the same command against a shared directory to split the work.
+
+Usage:
+    python -m app.training.search --task cash_flow --output models/cash_flow_model.pkl
+    python -m app.training.search --task bankruptcy --compare
+    python -m app.training.search --task bankruptcy --store /shared/search-results
+"""
+
+import argparse
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import BaseEstimator
+from sklearn.metrics import (
+    accuracy_score,
+    confusion_matrix,
+    mean_squared_error,
+    r2_score,
+)
+from sklearn.model_selection import GridSearchCV, KFold, ParameterGrid, train_test_split
+from sklearn.preprocessing import PowerTransformer
+
+from app.training.artifacts import ModelArtifact, save_artifact
+from app.training.registry import ModelRegistry
+from app.training.data import (
+    REGRESSION,
+    SEED,
+    TASKS,
+    TrainingData,
+    prepare_training_data,
+)
+from app.training.estimators import (
+    ModelFamily,
+    build_estimator,
+    ensemble_size_param,
+    get_families,
+)
+from app.training.result_store import ResultStore, data_fingerprint
+
+HALVING = "halving"
+GRID = "grid"
+DEFAULT_FACTOR = 3
+DEFAULT_SPLITS = 5
+DEFAULT_MIN_RESOURCES = 50
+TEST_SIZE = 0.2
+STORE_POLL_INTERVAL = 2.0
+
+
+@dataclass
+class Fold:
+    """Transformed train/validation matrices for one CV split."""
+
+    X_train: np.ndarray
+    y_train: np.ndarray
+    X_val: np.ndarray
+    y_val: np.ndarray
+
+
+class FoldCache:
+    """
+    Per-fold transformed matrices, computed once and shared by all candidates.
+
+    Training rows are kept in a fixed random order, so a round that uses the
+    first ``n`` rows gets a random subsample. Growing ``n`` in later rounds only
+    adds rows.
+    """
+
+    def __init__(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        n_splits: int = DEFAULT_SPLITS,
+        seed: int = SEED,
+    ):
+        self.n_splits = n_splits
+        # Identifies the data and fold layout in a result store.
+        self.fingerprint = data_fingerprint(X, y, n_splits=n_splits, seed=seed)
+        rng = np.random.default_rng(seed)
+        kf = KFold(n_splits=n_splits, shuffle=True, random_state=seed)
+        self.folds: List[Fold] = []
+        for train_index, val_index in kf.split(X):
+            train_index = rng.permutation(train_index)
+            transformer = PowerTransformer()
+            self.folds.append(
+                Fold(
+                    X_train=transformer.fit_transform(X[train_index]),
+                    y_train=y[train_index],
+                    X_val=transformer.transform(X[val_index]),
+                    y_val=y[val_index],
+                )
+            )
+
+    @property
+    def max_resources(self) -> int:
+        return min(len(fold.y_train) for fold in self.folds)
+
+
+@dataclass
+class CandidateResult:
+    """
+    A group of grid points that differ only in ensemble size.
+
+    ``params`` holds the shared parameters and ``path`` the values of
+    ``path_param`` to score; ``path`` is empty for estimators without an
+    ensemble size in the grid.
+    """
+
+    family: str
+    params: Dict[str, Any]
+    path_param: Optional[str] = None
+    path: List[int] = field(default_factory=list)
+    # Mean validation score per path value, keyed by the number of training rows.
+    path_scores: Dict[int, Dict[Any, float]] = field(default_factory=dict)
+
+    def score(self, n_rows: int) -> float:
+        return max(self.path_scores[n_rows].values())
+
+    def best_params(self, n_rows: int) -> Dict[str, Any]:
+        scores = self.path_scores[n_rows]
+        value = max(scores, key=scores.get)
+        if value is None:
+            return dict(self.params)
+        return {**self.params, self.path_param: value}
+
+
+@dataclass
+class FamilyResult:
+    """Search outcome and held-out evaluation for one model family."""
+
+    family: str
+    best_params: Dict[str, Any]
+    cv_score: float
+    test_metrics: Dict[str, float]
+    n_candidates: int
+    n_fits: int
+    estimator: Any = None
+
+
+@dataclass
+class SearchReport:
+    task: str
+    method: str
+    wall_time: float
+    families: List[FamilyResult]
+    best: FamilyResult
+    n_fits: int
+    # Source row ids of the training split, for the model registry.
+    train_row_ids: Optional[np.ndarray] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "task": self.task,
+            "method": self.method,
+            "wall_time": self.wall_time,
+            "n_fits": self.n_fits,
+            "best": self.best.family,
+            "families": [
+                {
+                    "family": r.family,
+                    "best_params": r.best_params,
+                    "cv_score": r.cv_score,
+                    "test_metrics": r.test_metrics,
+                    "n_candidates": r.n_candidates,
+                    "n_fits": r.n_fits,
+                }
+                for r in self.families
+            ],
+        }
+
+    def summary(self) -> str:
+        lines = [
+            f"{self.task} {self.method} search: {self.n_fits} fits in {self.wall_time:.1f}s"
+        ]
+        for result in self.families:
+            metrics = ", ".join(f"{k}={v:.4f}" for k, v in result.test_metrics.items())
+            lines.append(
+                f"  {result.family}: cv={result.cv_score:.4f} {metrics} "
+                f"({result.n_fits} fits) params={result.best_params}"
+            )
+        lines.append(f"  best: {self.best.family}")
+        return "\n".join(lines)
+
+
+def scorer_for(problem_type: str):
+    return r2_score if problem_type == REGRESSION else accuracy_score
+
+
+def candidates_for(family: ModelFamily) -> List[CandidateResult]:
+    """Group ``family``'s grid into candidates that share one fit per fold."""
+    path_param = ensemble_size_param(family.estimator)
+    groups: Dict[Tuple, CandidateResult] = {}
+    for params in ParameterGrid(family.param_grid):
+        params = dict(params)
+        value = params.pop(path_param, None)
+        key = tuple(sorted(params.items()))
+        candidate = groups.setdefault(
+            key, CandidateResult(family.name, params, path_param)
+        )
+        if value is not None:
+            candidate.path.append(value)
+    for candidate in groups.values():
+        candidate.path.sort()
+    return list(groups.values())
+
+
+def _fit_and_score(
+    estimator: BaseEstimator, fold: Fold, n_rows: int, scorer, path: Sequence[int] = ()
+) -> Dict[Any, float]:
+    """
+    Fit on the first ``n_rows`` training rows and score every size in ``path``.
+
+    Returns validation scores keyed by path value (``None`` without a path).
+    """
+    X, y = fold.X_train[:n_rows], fold.y_train[:n_rows]
+    if not path:
+        estimator.fit(X, y)
+        return {None: scorer(fold.y_val, estimator.predict(fold.X_val))}
+
+    path_param = ensemble_size_param(estimator)
+    if hasattr(estimator, "staged_predict"):
+        estimator.set_params(**{path_param: path[-1]})
+        estimator.fit(X, y)
+        wanted = set(path)
+        scores = {}
+        last = None
+        for stage, prediction in enumerate(estimator.staged_predict(fold.X_val), 1):
+            last = scorer(fold.y_val, prediction)
+            if stage in wanted:
+                scores[stage] = last
+        # Boosting stops early on a perfect fit; larger sizes predict the same.
+        for value in path:
+            scores.setdefault(value, last)
+        return scores
+
+    if "warm_start" in estimator.get_params():
+        scores = {}
+        for value in path:
+            estimator.set_params(**{path_param: value, "warm_start": True})
+            estimator.fit(X, y)
+            scores[value] = scorer(fold.y_val, estimator.predict(fold.X_val))
+        return scores
+
+    scores = {}
+    for value in path:
+        estimator.set_params(**{path_param: value})
+        estimator.fit(X, y)
+        scores[value] = scorer(fold.y_val, estimator.predict(fold.X_val))
+    return scores
+
+
+def _store_key(
+    store: ResultStore,
+    data_hash: str,
+    family: str,
+    estimator: BaseEstimator,
+    fold_index: int,
+    n_rows: int,
+    value: Any,
+) -> Dict[str, Any]:
+    # The full estimator parameters, so a changed default is a new entry.
+    params = {"estimator": type(estimator).__name__, **estimator.get_params(deep=False)}
+    if value is not None:
+        params[ensemble_size_param(estimator)] = value
+    return store.entry_key(data_hash, family, params, fold_index, n_rows)
+
+
+def _run_fold_task(
+    family: str,
+    estimator: BaseEstimator,
+    fold: Fold,
+    fold_index: int,
+    n_rows: int,
+    scorer,
+    path: Sequence[int],
+    store: Optional[ResultStore] = None,
+    data_hash: str = "",
+) -> Tuple[Dict[Any, float], int, List[Any]]:
+    """
+    Score one candidate on one fold, reusing and recording results in ``store``.
+
+    Returns:
+        Scores keyed by path value, the number of fits run here, and the path
+        values another worker has claimed and not finished yet.
+    """
+    if store is None:
+        return _fit_and_score(estimator, fold, n_rows, scorer, path), 1, []
+
+    values = list(path) or [None]
+    keys = {
+        value: _store_key(store, data_hash, family, estimator, fold_index, n_rows, value)
+        for value in values
+    }
+    scores, todo, pending = {}, [], []
+    for value, key in keys.items():
+        record = store.get(key)
+        if record is not None:
+            scores[value] = record["score"]
+        elif store.claim(key):
+            todo.append(value)
+        else:
+            pending.append(value)
+    if not todo:
+        return scores, 0, pending
+
+    start = time.perf_counter()
+    try:
+        fitted = _fit_and_score(
+            estimator, fold, n_rows, scorer, [] if todo == [None] else todo
+        )
+    except BaseException:
+        for value in todo:
+            store.release(keys[value])
+        raise
+    fit_time = time.perf_counter() - start
+    for value in todo:
+        store.put(keys[value], fitted[value], fit_time)
+        scores[value] = fitted[value]
+    return scores, 1, pending
+
+
+def _rounds_needed(n_candidates: int, factor: int) -> int:
+    """Rounds until at most ``factor`` candidates are left for the final round."""
+    rounds = 1
+    while n_candidates > factor:
+        n_candidates = math.ceil(n_candidates / factor)
+        rounds += 1
+    return rounds
+
+
+def _round_resources(
+    rounds: int, factor: int, max_resources: int, min_resources: int
+) -> List[int]:
+    """
+    Training rows per round, ending at ``max_resources``.
+
+    When the data is too small for every round to grow by ``factor``, the early
+    rounds all run at ``min_resources`` and simply eliminate more candidates
+    (sklearn's ``aggressive_elimination``).
+    """
+    return [
+        min(max_resources, max(min_resources, max_resources // factor ** (rounds - 1 - i)))
+        for i in range(rounds)
+    ]
+
+
+def successive_halving(
+    families: Sequence[ModelFamily],
+    cache: FoldCache,
+    problem_type: str,
+    factor: int = DEFAULT_FACTOR,
+    min_resources: Optional[int] = None,
+    n_jobs: int = -1,
+    exhaustive: bool = False,
+    store: Optional[ResultStore] = None,
+) -> Tuple[Dict[str, Tuple[Dict[str, Any], float]], Dict[str, int]]:
+    """
+    Search every family's grid, sharing one worker pool across all families.
+
+    With a ``store``, fold results already recorded there are reused and new
+    ones are recorded as soon as each fit finishes. Fits claimed by another
+    worker are awaited before the round is ranked.
+
+    Returns:
+        The best parameters and their mean CV score per family, and the number
+        of fits per family (a fit covers every ensemble size on its path).
+    """
+    scorer = scorer_for(problem_type)
+    survivors = {family.name: candidates_for(family) for family in families}
+    by_name = {family.name: family for family in families}
+    max_resources = cache.max_resources
+
+    family_rounds = {
+        name: 1 if exhaustive else _rounds_needed(len(c), factor)
+        for name, c in survivors.items()
+    }
+    rounds = max(family_rounds.values())
+    resources = _round_resources(
+        rounds, factor, max_resources, min_resources or DEFAULT_MIN_RESOURCES
+    )
+
+    n_fits = {name: 0 for name in survivors}
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for round_index, n_rows in enumerate(resources):
+            # A family enters the schedule family_rounds rounds from the end,
+            # so every family reaches its final round on the full data.
+            active = [
+                candidate
+                for name, candidates in survivors.items()
+                if round_index >= rounds - family_rounds[name]
+                for candidate in candidates
+            ]
+            tasks = [
+                (candidate, fold_index)
+                for candidate in active
+                for fold_index in range(len(cache.folds))
+            ]
+            outcomes = parallel(
+                delayed(_run_fold_task)(
+                    candidate.family,
+                    build_estimator(by_name[candidate.family], candidate.params),
+                    cache.folds[fold_index],
+                    fold_index,
+                    n_rows,
+                    scorer,
+                    candidate.path,
+                    store,
+                    cache.fingerprint,
+                )
+                for candidate, fold_index in tasks
+            )
+            scores = []
+            for (candidate, fold_index), (fold_scores, fits, pending) in zip(tasks, outcomes):
+                n_fits[candidate.family] += fits
+                while pending:
+                    # Another worker owns these fits; wait for its results, or
+                    # take over if its claim expires.
+                    time.sleep(STORE_POLL_INTERVAL)
+                    retry, fits, pending = _run_fold_task(
+                        candidate.family,
+                        build_estimator(by_name[candidate.family], candidate.params),
+                        cache.folds[fold_index],
+                        fold_index,
+                        n_rows,
+                        scorer,
+                        [value for value in pending if value is not None],
+                        store,
+                        cache.fingerprint,
+                    )
+                    fold_scores.update(retry)
+                    n_fits[candidate.family] += fits
+                scores.append(fold_scores)
+
+            per_candidate: Dict[int, List[Dict[Any, float]]] = {}
+            for (candidate, _), fold_scores in zip(tasks, scores):
+                per_candidate.setdefault(id(candidate), []).append(fold_scores)
+            for candidate in active:
+                fold_scores = per_candidate[id(candidate)]
+                candidate.path_scores[n_rows] = {
+                    value: float(np.mean([f[value] for f in fold_scores]))
+                    for value in fold_scores[0]
+                }
+
+            if round_index == rounds - 1:
+                break
+            for name, candidates in survivors.items():
+                if round_index < rounds - family_rounds[name]:
+                    continue
+                keep = max(1, math.ceil(len(candidates) / factor))
+                candidates.sort(key=lambda c: c.score(n_rows), reverse=True)
+                survivors[name] = candidates[:keep]
+
+    final_rows = resources[-1]
+    best = {}
+    for name, candidates in survivors.items():
+        winner = max(candidates, key=lambda c: c.score(final_rows))
+        best[name] = (winner.best_params(final_rows), winner.score(final_rows))
+    return best, n_fits
+
+
+def evaluate(problem_type: str, y_true, y_pred) -> Dict[str, float]:
+    if problem_type == REGRESSION:
+        return {
+            "mse": float(mean_squared_error(y_true, y_pred)),
+            "r2": float(r2_score(y_true, y_pred)),
+        }
+    return {"accuracy": float(accuracy_score(y_true, y_pred))}
+
+
+def selection_metric(problem_type: str) -> str:
+    return "r2" if problem_type == REGRESSION else "accuracy"
+
+
+def split_data(data: TrainingData, seed: int = SEED):
+    """Hold-out split used for final model selection, as in the notebooks."""
+    X = data.X.to_numpy(dtype=np.float64)
+    y = data.y.to_numpy()
+    return train_test_split(X, y, test_size=TEST_SIZE, random_state=seed)
+
+
+def train_row_ids(data: TrainingData, seed: int = SEED) -> Optional[np.ndarray]:
+    """Row ids of the training side of :func:`split_data`."""
+    if data.row_ids is None:
+        return None
+    return train_test_split(data.row_ids, test_size=TEST_SIZE, random_state=seed)[0]
+
+
+def search(
+    data: TrainingData,
+    method: str = HALVING,
+    families: Optional[List[str]] = None,
+    factor: int = DEFAULT_FACTOR,
+    n_splits: int = DEFAULT_SPLITS,
+    n_jobs: int = -1,
+    store: Optional[ResultStore] = None,
+) -> Tuple[SearchReport, ModelArtifact]:
+    """
+    Search all model families for ``data`` and build an artifact from the winner.
+
+    Each family's best candidate is refitted on the full training split and
+    scored on the held-out split; the family with the best held-out score wins,
+    matching the notebooks' selection rule.
+    """
+    if method not in (HALVING, GRID):
+        raise ValueError(f"Unknown search method {method!r}")
+    problem_type = data.problem_type
+    model_families = get_families(data.task, families)
+
+    start = time.perf_counter()
+    X_train, X_test, y_train, y_test = split_data(data)
+    cache = FoldCache(X_train, y_train, n_splits=n_splits)
+    best, fits_per_family = successive_halving(
+        model_families,
+        cache,
+        problem_type,
+        factor=factor,
+        n_jobs=n_jobs,
+        exhaustive=method == GRID,
+        store=store,
+    )
+
+    transformer = PowerTransformer()
+    X_train_t = transformer.fit_transform(X_train)
+    X_test_t = transformer.transform(X_test)
+    by_name = {family.name: family for family in model_families}
+
+    def refit(name):
+        params, _ = best[name]
+        estimator = build_estimator(by_name[name], params)
+        estimator.fit(X_train_t, y_train)
+        return name, estimator
+
+    refitted = dict(Parallel(n_jobs=n_jobs)(delayed(refit)(name) for name in best))
+
+    results = []
+    for name, estimator in refitted.items():
+        params, cv_score = best[name]
+        results.append(
+            FamilyResult(
+                family=name,
+                best_params=params,
+                cv_score=cv_score,
+                test_metrics=evaluate(problem_type, y_test, estimator.predict(X_test_t)),
+                n_candidates=len(ParameterGrid(by_name[name].param_grid)),
+                n_fits=fits_per_family[name],
+                estimator=estimator,
+            )
+        )
+    metric = selection_metric(problem_type)
+    winner = max(results, key=lambda r: r.test_metrics[metric])
+    wall_time = time.perf_counter() - start
+
+    report = SearchReport(
+        task=data.task,
+        method=method,
+        wall_time=wall_time,
+        families=results,
+        best=winner,
+        n_fits=sum(fits_per_family.values()),
+        train_row_ids=train_row_ids(data),
+    )
+    artifact = ModelArtifact(
+        task=data.task,
+        model_name=winner.family,
+        model=winner.estimator,
+        features=list(data.features),
+        feature_transformer=transformer,
+        target_scaler=data.target_scaler,
+        params=winner.best_params,
+        metrics=winner.test_metrics,
+        metadata={
+            "search_method": method,
+            "search_wall_time": wall_time,
+            "dropped_features": list(data.dropped_features),
+            "n_train": int(len(y_train)),
+            "n_test": int(len(y_test)),
+        },
+    )
+    if problem_type != REGRESSION:
+        artifact.metadata["confusion_matrix"] = confusion_matrix(
+            y_test, winner.estimator.predict(X_test_t)
+        ).tolist()
+    return report, artifact
+
+
+def run_gridsearchcv_baseline(
+    data: TrainingData,
+    families: Optional[List[str]] = None,
+    n_splits: int = DEFAULT_SPLITS,
+    n_jobs: int = -1,
+) -> SearchReport:
+    """
+    The notebooks' approach: transform once, then one exhaustive
+    ``GridSearchCV`` per family, run sequentially.
+    """
+    problem_type = data.problem_type
+    start = time.perf_counter()
+    X = PowerTransformer().fit_transform(data.X.to_numpy(dtype=np.float64))
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, data.y.to_numpy(), test_size=TEST_SIZE, random_state=SEED
+    )
+    kf = KFold(n_splits=n_splits, shuffle=True, random_state=SEED)
+    scoring = "r2" if problem_type == REGRESSION else "accuracy"
+
+    results = []
+    n_fits = 0
+    for family in get_families(data.task, families):
+        grid_search = GridSearchCV(
+            estimator=family.estimator,
+            param_grid=family.param_grid,
+            cv=kf,
+            n_jobs=n_jobs,
+            scoring=scoring,
+        )
+        grid_search.fit(X_train, y_train)
+        n_candidates = len(ParameterGrid(family.param_grid))
+        n_fits += n_candidates * n_splits
+        results.append(
+            FamilyResult(
+                family=family.name,
+                best_params=grid_search.best_params_,
+                cv_score=float(grid_search.best_score_),
+                test_metrics=evaluate(
+                    problem_type, y_test, grid_search.best_estimator_.predict(X_test)
+                ),
+                n_candidates=n_candidates,
+                n_fits=n_candidates * n_splits,
+            )
+        )
+    metric = selection_metric(problem_type)
+    return SearchReport(
+        task=data.task,
+        method="gridsearchcv",
+        wall_time=time.perf_counter() - start,
+        families=results,
+        best=max(results, key=lambda r: r.test_metrics[metric]),
+        n_fits=n_fits,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train the cash flow or bankruptcy model.")
+    parser.add_argument("--task", choices=TASKS, required=True)
+    parser.add_argument("--data", help="Training CSV (defaults to the task's dataset)")
+    parser.add_argument("--output", help="Where to write the model artifact")
+    parser.add_argument(
+        "--register",
+        action="store_true",
+        help="Also store the artifact as a new model registry version",
+    )
+    parser.add_argument("--method", choices=(HALVING, GRID), default=HALVING)
+    parser.add_argument("--families", nargs="+", help="Restrict to these model families")
+    parser.add_argument("--factor", type=int, default=DEFAULT_FACTOR)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument(
+        "--store",
+        help="Result store directory; completed fold fits are reused across runs and machines",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="Also run the notebooks' sequential GridSearchCV and report both timings",
+    )
+    args = parser.parse_args(argv)
+
+    data = prepare_training_data(args.task, path=args.data)
+    report, artifact = search(
+        data,
+        method=args.method,
+        families=args.families,
+        factor=args.factor,
+        n_jobs=args.n_jobs,
+        store=ResultStore(args.store) if args.store else None,
+    )
+    print(report.summary())
+
+    if args.compare:
+        baseline = run_gridsearchcv_baseline(data, args.families, n_jobs=args.n_jobs)
+        print(baseline.summary())
+        print(
+            f"Wall-clock: {report.wall_time:.1f}s vs {baseline.wall_time:.1f}s "
+            f"exhaustive ({baseline.wall_time / report.wall_time:.1f}x faster, "
+            f"{report.n_fits} vs {baseline.n_fits} fits)"
+        )
+
+    if args.register:
+        version = ModelRegistry().register(
+            artifact,
+            seen_rows=report.train_row_ids,
+            report=report.as_dict(),
+            publish_path=args.output,
+        )
+        print(f"Registered {args.task} model version {version}")
+    elif args.output:
+        save_artifact(artifact, args.output)
+    if args.output:
+        print(f"Model artifact saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Shared fixtures.
+
+The prediction routers load their pickled models at import time. The tests
+serve them with small models fitted on random data instead, so they do not
+depend on the artifacts in ``models/`` or the scikit-learn version that wrote
+them.
+"""
+
+from typing import Dict, List, Optional
+from unittest import mock
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+from app.core.batch import BATCH_FIELDS
+from app.core.features import BASE_FEATURES
+from app.core.responses import NumpyJSONResponse
+from app.training.artifacts import ModelArtifact
+
+
+def _fitted_artifact(path: str, task: Optional[str] = None) -> ModelArtifact:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, len(BASE_FEATURES)))
+    if task == "bankruptcy":
+        model = LogisticRegression().fit(X, (X[:, 0] > 0).astype(int))
+    else:
+        model = LinearRegression().fit(X, X @ np.arange(1, len(BASE_FEATURES) + 1))
+    return ModelArtifact(
+        task=task or "unknown",
+        model_name=type(model).__name__,
+        model=model,
+        features=list(BASE_FEATURES),
+    )
+
+
+def _batch_columns(n_rows: int, seed: int = 0) -> Dict[str, List[float]]:
+    rng = np.random.default_rng(seed)
+    return {name: rng.uniform(0.1, 5.0, n_rows).tolist() for name in BATCH_FIELDS}
+
+
+@pytest.fixture
+def batch_columns():
+    """Builds a valid columnar batch: one list of ``n_rows`` values per request field."""
+    return _batch_columns
+
+
+@pytest.fixture(scope="session")
+def prediction_app() -> FastAPI:
+    with mock.patch("app.training.artifacts.load_artifact", _fitted_artifact):
+        from app.bankruptcy_pred.routes import router as bankruptcy_router
+        from app.cashflow.routes import router as cashflow_router
+
+    app = FastAPI(default_response_class=NumpyJSONResponse)
+    app.include_router(bankruptcy_router)
+    app.include_router(cashflow_router)
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(prediction_app: FastAPI) -> TestClient:
+    with TestClient(prediction_app) as client:
+        yield client
@@ -0,0 +1,111 @@
+import io
+
+import numpy as np
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.batch import BATCH_FIELDS, MAX_BATCH_BYTES, NPY, NPZ, read_body
+
+CASHFLOW_BATCH = "/cashflow/predict/batch"
+
+
+def _npz(columns) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(buffer, **{name: np.asarray(values) for name, values in columns.items()})
+    return buffer.getvalue()
+
+
+def _npy(columns) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, np.column_stack([columns[name] for name in BATCH_FIELDS]))
+    return buffer.getvalue()
+
+
+def test_json_batch_matches_single_rows(client, batch_columns):
+    columns = batch_columns(5)
+    response = client.post(CASHFLOW_BATCH, json=columns)
+    assert response.status_code == 200
+    batch = response.json()["predicted_cash_flow"]
+    assert len(batch) == 5
+
+    row = {name: values[2] for name, values in columns.items()}
+    single = client.post("/cashflow/predict", json=row).json()["predicted_cash_flow"]
+    assert batch[2] == pytest.approx(single)
+
+
+@pytest.mark.parametrize("media_type, encode", [(NPZ, _npz), (NPY, _npy)])
+def test_binary_batches_match_json(client, batch_columns, media_type, encode):
+    columns = batch_columns(7, seed=1)
+    expected = client.post(CASHFLOW_BATCH, json=columns).json()["predicted_cash_flow"]
+
+    response = client.post(
+        CASHFLOW_BATCH, content=encode(columns), headers={"Content-Type": media_type}
+    )
+    assert response.status_code == 200
+    assert response.json()["predicted_cash_flow"] == pytest.approx(expected)
+
+
+def test_invalid_rows_are_reported_by_position(client, batch_columns):
+    columns = {name: np.asarray(values) for name, values in batch_columns(8).items()}
+    columns["current_ratio"][3] = -1.0
+    columns["quick_ratio"][[1, 6]] = np.nan
+
+    response = client.post(CASHFLOW_BATCH, content=_npz(columns), headers={"Content-Type": NPZ})
+    assert response.status_code == 422
+    errors = {tuple(error["loc"]): error for error in response.json()["detail"]}
+    assert errors[("body", "current_ratio")]["rows"] == [3]
+    assert errors[("body", "quick_ratio")]["rows"] == [1, 6]
+
+
+def test_missing_field_and_ragged_columns(client, batch_columns):
+    columns = batch_columns(4)
+    del columns["lagged_revenue"]
+    columns["current_ratio"] = columns["current_ratio"][:3]
+
+    response = client.post(CASHFLOW_BATCH, json=columns)
+    assert response.status_code == 422
+    types = {error["type"] for error in response.json()["detail"]}
+    assert types == {"missing", "value_error"}
+
+
+def test_unsupported_content_type(client):
+    response = client.post(CASHFLOW_BATCH, content=b"a,b", headers={"Content-Type": "text/csv"})
+    assert response.status_code == 415
+
+
+def test_declared_length_over_cap_is_rejected_before_reading(client):
+    response = client.post(
+        CASHFLOW_BATCH,
+        content=b"{}",
+        headers={"Content-Type": "application/json", "Content-Length": str(MAX_BATCH_BYTES + 1)},
+    )
+    assert response.status_code == 413
+
+
+def test_streamed_body_over_cap():
+    app = FastAPI()
+
+    @app.post("/body")
+    async def body(request: Request):
+        return {"size": len(await read_body(request, max_bytes=100))}
+
+    client = TestClient(app)
+    chunks = (b"x" * 30 for _ in range(5))
+    assert client.post("/body", content=chunks).status_code == 413
+    assert client.post("/body", content=b"x" * 100).json() == {"size": 100}
+
+
+@pytest.mark.parametrize(
+    "path, fields",
+    [
+        (CASHFLOW_BATCH, {"predicted_cash_flow"}),
+        ("/bankruptcy/predict/batch", {"predicted_class", "bankruptcy_probability"}),
+    ],
+)
+def test_json_batch_responses(client, batch_columns, path, fields):
+    response = client.post(path, json=batch_columns(6))
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body) == fields
+    assert all(len(body[name]) == 6 for name in fields)
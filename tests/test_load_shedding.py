@@ -0,0 +1,126 @@
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from app.core.load_shedding import (
+    BULK,
+    CRITICAL,
+    CoDelController,
+    LoadSheddingMiddleware,
+    RoutePolicy,
+    mark_service_start,
+)
+
+TARGET = 0.010
+INTERVAL = 0.100
+
+
+def test_one_slow_request_does_not_trip_the_controller():
+    controller = CoDelController(TARGET, INTERVAL)
+    controller.observe(0.5, now=1.0)
+    assert not controller.overloaded(1.0)
+
+
+def test_delay_above_target_for_an_interval_trips_it():
+    controller = CoDelController(TARGET, INTERVAL)
+    controller.observe(0.5, now=1.00)
+    controller.observe(0.5, now=1.05)
+    assert not controller.overloaded(1.05)
+    controller.observe(0.5, now=1.11)
+    assert controller.overloaded(1.11)
+
+
+def test_one_request_under_target_recovers():
+    controller = CoDelController(TARGET, INTERVAL)
+    for now in (1.0, 1.2):
+        controller.observe(0.5, now)
+    assert controller.overloaded(1.2)
+    controller.observe(0.001, now=1.3)
+    assert not controller.overloaded(1.3)
+
+
+def test_drained_route_recovers_after_an_interval():
+    controller = CoDelController(TARGET, INTERVAL)
+    for now in (1.0, 1.2):
+        controller.observe(0.5, now)
+    assert controller.overloaded(1.25)
+    assert not controller.overloaded(1.2 + INTERVAL + 0.01)
+
+
+def test_drain_rule_waits_for_requests_in_flight():
+    controller = CoDelController(TARGET, INTERVAL)
+    for now in (1.0, 1.2):
+        controller.observe(0.5, now)
+    controller.in_flight = 1
+    assert controller.overloaded(5.0)
+
+
+def _client():
+    app = FastAPI()
+
+    @app.post("/cashflow/predict")
+    def predict(request: Request, wait: float = 0.0, status: int = 200):
+        # Pretend the request queued for ``wait`` seconds before a thread took it.
+        mark_service_start(request, queued_at=time.monotonic() - wait)
+        if status != 200:
+            raise HTTPException(status_code=status)
+        return {}
+
+    @app.post("/cashflow/predict/batch")
+    async def batch():
+        return {}
+
+    policies = (
+        RoutePolicy("batch", "/predict/batch", BULK, 1.0),
+        RoutePolicy("predict", "/predict", CRITICAL, TARGET),
+    )
+    middleware = LoadSheddingMiddleware(app, policies=policies, interval=INTERVAL)
+    return middleware, TestClient(middleware)
+
+
+def _build_queue(client):
+    client.post("/cashflow/predict?wait=0.5")
+    time.sleep(INTERVAL + 0.01)
+    client.post("/cashflow/predict?wait=0.5")
+
+
+def test_batches_are_shed_while_predictions_queue():
+    middleware, client = _client()
+    assert client.post("/cashflow/predict/batch").status_code == 200
+
+    _build_queue(client)
+    assert middleware.overloaded()
+    shed = client.post("/cashflow/predict/batch")
+    assert shed.status_code == 503 and "Retry-After" in shed.headers
+    # Single-row predictions are never shed.
+    assert client.post("/cashflow/predict?wait=0.5").status_code == 200
+
+
+def test_error_responses_do_not_count_as_recovery():
+    middleware, client = _client()
+    _build_queue(client)
+
+    # Fast failures: a validation error and a handler error.
+    assert client.post("/cashflow/predict?wait=abc").status_code == 422
+    assert client.post("/cashflow/predict?status=429").status_code == 429
+    assert middleware.overloaded()
+
+    assert client.post("/cashflow/predict").status_code == 200
+    assert not middleware.overloaded()
+    assert client.post("/cashflow/predict/batch").status_code == 200
+
+
+def test_service_time_without_queueing_is_not_overload():
+    middleware, client = _client()
+
+    @middleware.app.post("/slow/predict")
+    def slow(request: Request):
+        mark_service_start(request)
+        time.sleep(0.03)
+        return {}
+
+    for _ in range(5):
+        client.post("/slow/predict")
+        time.sleep(INTERVAL / 2)
+    assert not middleware.overloaded()
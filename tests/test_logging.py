@@ -0,0 +1,115 @@
+import gzip
+import json
+import logging
+import os
+import time
+
+import pytest
+
+import app.core.logging_config as logging_config
+from app.core.logging_config import CustomFormatter, JSONFormatter, LogShipper
+
+
+class FlakyBackend:
+    """Fails the first ``failures`` uploads, then keeps a copy of each file."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.attempts = 0
+        self.uploaded = {}
+
+    def upload(self, file_path, name):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("storage unavailable")
+        with gzip.open(file_path, "rb") as f:
+            self.uploaded[os.path.basename(name)] = f.read()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(logging_config, "UPLOAD_BACKOFF", 0.001)
+
+
+def _rotated(outbox, name, age):
+    path = os.path.join(outbox, name)
+    with open(path, "w") as f:
+        f.write(name)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_failed_uploads_are_retried(tmp_path):
+    backend = FlakyBackend(failures=2)
+    shipper = LogShipper(backend, outbox=str(tmp_path))
+    _rotated(str(tmp_path), "app.log.1", age=0)
+
+    shipper.ship_pending(retries=3)
+    assert backend.attempts == 3
+    assert backend.uploaded == {"app.log.1.gz": b"app.log.1"}
+    assert os.listdir(tmp_path) == []
+
+
+def test_file_stays_in_the_outbox_when_retries_run_out(tmp_path):
+    backend = FlakyBackend(failures=5)
+    shipper = LogShipper(backend, outbox=str(tmp_path))
+    _rotated(str(tmp_path), "app.log.1", age=0)
+
+    shipper.ship_pending(retries=2)
+    assert backend.attempts == 2
+    assert os.listdir(tmp_path) == ["app.log.1.gz"]
+
+    # The next scan ships the compressed file left behind.
+    shipper.ship_pending(retries=5)
+    assert backend.uploaded == {"app.log.1.gz": b"app.log.1"}
+
+
+def test_outbox_limit_drops_the_oldest_files(tmp_path):
+    backend = FlakyBackend()
+    shipper = LogShipper(backend, outbox=str(tmp_path), max_pending=2)
+    for age, name in enumerate(["newest", "middle", "oldest"]):
+        _rotated(str(tmp_path), name, age=age * 10)
+
+    shipper.ship_pending(retries=1)
+    assert shipper.dropped == 1
+    assert set(backend.uploaded) == {"newest.gz", "middle.gz"}
+
+
+def test_stop_ships_pending_files(tmp_path):
+    backend = FlakyBackend()
+    shipper = LogShipper(backend, outbox=str(tmp_path))
+    shipper.start()
+    _rotated(str(tmp_path), "app.log.1", age=0)
+    shipper.notify()
+    shipper.stop(timeout=5)
+
+    assert not shipper._thread.is_alive()
+    assert backend.uploaded == {"app.log.1.gz": b"app.log.1"}
+
+
+def _record(fields):
+    record = logging.LogRecord("app.predictions", logging.INFO, __file__, 1, "Predicted", None, None)
+    record.fields = fields
+    return record
+
+
+def test_lazy_fields_are_evaluated_once_per_record():
+    calls = []
+
+    def features():
+        calls.append(1)
+        return {"current_ratio": 1.5}
+
+    record = _record({"model": "cash_flow", "features": features})
+    entry = json.loads(JSONFormatter().format(record))
+    text = CustomFormatter("%(message)s %(fields)s").format(record)
+
+    assert entry["features"] == {"current_ratio": 1.5}
+    assert text == "Predicted {'model': 'cash_flow', 'features': {'current_ratio': 1.5}}"
+    assert calls == [1]
+
+
+def test_text_format_without_fields_does_not_evaluate_them():
+    record = _record({"features": lambda: pytest.fail("evaluated")})
+    assert CustomFormatter("%(message)s").format(record) == "Predicted"
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+
+import app.core.mail as mail
+from app.core.mail import (
+    LocalTransport,
+    MailMessage,
+    MailQueue,
+    MailQueueFull,
+    PermanentMailError,
+    create_transport,
+    mail_lifespan,
+)
+
+
+class FakeTransport:
+    """Fails each message ``failures`` times with ``error``, then accepts it."""
+
+    def __init__(self, failures: int = 0, error: Exception = ConnectionError("timeout")):
+        self.failures = failures
+        self.error = error
+        self.attempts = {}
+        self.delivered = []
+        self.closed = False
+
+    async def send_batch(self, messages):
+        results = []
+        for message in messages:
+            attempt = self.attempts[message.to] = self.attempts.get(message.to, 0) + 1
+            if attempt <= self.failures:
+                results.append(self.error)
+            else:
+                self.delivered.append(message.to)
+                results.append(None)
+        return results
+
+    async def close(self):
+        self.closed = True
+
+
+class BlockedTransport(FakeTransport):
+    """Holds every batch until ``gate`` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    async def send_batch(self, messages):
+        while not self.gate.is_set():
+            await asyncio.sleep(0.01)
+        return await super().send_batch(messages)
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(mail, "RETRY_BACKOFF", 0.01)
+
+
+def _message(to="ada@example.com"):
+    return MailMessage(to=to, subject="Your OTP Code", html="<p>123456</p>")
+
+
+def _deliver(transport, *messages, **options):
+    queue = MailQueue(transport, workers=2, **options)
+    queue.start()
+    for message in messages:
+        queue.enqueue(message)
+    queue.stop(timeout=5)
+    return queue
+
+
+def test_failed_messages_are_retried():
+    transport = FakeTransport(failures=2)
+    queue = _deliver(transport, _message(), _message("bob@example.com"))
+
+    assert sorted(transport.delivered) == ["ada@example.com", "bob@example.com"]
+    assert transport.attempts == {"ada@example.com": 3, "bob@example.com": 3}
+    assert (queue.sent, queue.failed) == (2, 0)
+    assert transport.closed
+
+
+def test_messages_are_dropped_after_max_attempts():
+    transport = FakeTransport(failures=10)
+    queue = _deliver(transport, _message(), max_attempts=3)
+
+    assert transport.attempts == {"ada@example.com": 3}
+    assert (queue.sent, queue.failed) == (0, 1)
+
+
+def test_permanent_errors_are_not_retried():
+    transport = FakeTransport(failures=10, error=PermanentMailError("invalid address"))
+    queue = _deliver(transport, _message())
+
+    assert transport.attempts == {"ada@example.com": 1}
+    assert (queue.sent, queue.failed) == (0, 1)
+
+
+def test_enqueue_refuses_beyond_max_pending():
+    transport = BlockedTransport()
+    queue = MailQueue(transport, workers=1, max_pending=2)
+    queue.start()
+    try:
+        queue.enqueue(_message())
+        queue.enqueue(_message("bob@example.com"))
+        with pytest.raises(MailQueueFull):
+            queue.enqueue(_message("eve@example.com"))
+    finally:
+        transport.gate.set()
+        queue.stop(timeout=5)
+    assert sorted(transport.delivered) == ["ada@example.com", "bob@example.com"]
+
+
+def test_stop_gives_up_after_its_timeout():
+    transport = BlockedTransport()
+    queue = MailQueue(transport, workers=1)
+    queue.start()
+    queue.enqueue(_message())
+
+    started = time.monotonic()
+    queue.stop(timeout=0.2)
+    transport.gate.set()
+    assert time.monotonic() - started < 2
+    assert queue.sent == 0 and transport.closed
+
+
+def test_local_transport_is_opt_in(monkeypatch):
+    monkeypatch.setattr(mail, "BREVO_KEY", None)
+    assert create_transport("") is None
+    assert isinstance(create_transport("local"), LocalTransport)
+    with pytest.raises(ValueError):
+        create_transport("brevo")
+    with pytest.raises(ValueError):
+        create_transport("smtp")
+
+
+def test_no_transport_leaves_mail_disabled(monkeypatch):
+    monkeypatch.setattr(mail, "MAIL_TRANSPORT", "")
+    app = FastAPI()
+
+    async def scenario():
+        async with mail_lifespan(app):
+            return app.state.mail_queue
+
+    assert asyncio.run(scenario()) is None
@@ -0,0 +1,52 @@
+import asyncio
+import io
+import time
+
+import pytest
+from fastapi import FastAPI
+
+pytest.importorskip("qrcode")
+Image = pytest.importorskip("PIL.Image")
+
+from app.core.qr_code import BadgeRenderer, badge_lifespan  # noqa: E402
+
+BADGE_URL = "https://example.com/badge.png"
+
+
+class MemoryStorage:
+    def __init__(self):
+        self.objects = {}
+
+    async def put_bytes(self, key, data, content_type=None):
+        self.objects[key] = data
+
+    def url(self, key):
+        return f"memory://{key}"
+
+
+def _png(size=(200, 120)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_lifespan_starts_and_closes_the_renderer():
+    storage = MemoryStorage()
+    renderer = BadgeRenderer(storage=storage, processes=1)
+    # A fresh cached download, so the test needs no network.
+    renderer._badges[BADGE_URL] = ('"v1"', _png(), time.monotonic())
+    app = FastAPI()
+
+    async def scenario():
+        async with badge_lifespan(app, renderer):
+            assert app.state.badge_renderer is renderer
+            assert renderer._pool._mp_context.get_start_method() == "spawn"
+            return await renderer.render(BADGE_URL, "https://example.com/u/ada", "ada")
+
+    result = asyncio.run(scenario())
+    assert result["s3_url"].startswith("memory://badges/ada/")
+    assert result["image_bytes"].startswith("data:image/png;base64,")
+    (stored,) = storage.objects.values()
+    assert Image.open(io.BytesIO(stored)).size == (200, 120)
+    assert renderer._pool is None and renderer._client is None
+    assert app.state.badge_renderer is None
@@ -0,0 +1,148 @@
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError
+
+from app.core.rate_limit import (
+    AdmissionControlMiddleware,
+    RateLimit,
+    RateLimiter,
+    client_address,
+    client_identity,
+    parse_networks,
+)
+
+# Refills one token every 1000 s, so nothing comes back during a test.
+LIMIT = RateLimit("predict", "/predict", rate=0.001, burst=3)
+
+
+class CountingScript:
+    """Wraps a registered script and counts its calls."""
+
+    def __init__(self, script):
+        self.script = script
+        self.calls = 0
+
+    async def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return await self.script(*args, **kwargs)
+
+
+class DownRedis:
+    """A client whose every script call fails as if Redis were unreachable."""
+
+    def register_script(self, source):
+        async def run(*args, **kwargs):
+            raise ConnectionError("connection refused")
+
+        return run
+
+
+def _scope(peer, headers=()):
+    return {
+        "type": "http",
+        "client": (peer, 40000),
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+    }
+
+
+def test_redis_bucket_is_shared_by_workers():
+    redis = fakeredis.FakeAsyncRedis()
+    first, second = RateLimiter(redis), RateLimiter(redis)
+
+    async def scenario():
+        results = [await first.hit("client", LIMIT) for _ in range(2)]
+        results += [await second.hit("client", LIMIT) for _ in range(2)]
+        return results
+
+    results = asyncio.run(scenario())
+    # Each worker's local bucket still has tokens; the shared bucket does not.
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[-1][1] > 0
+
+
+def test_local_bucket_refuses_without_a_redis_round_trip():
+    limiter = RateLimiter(fakeredis.FakeAsyncRedis())
+    limiter._script = script = CountingScript(limiter._script)
+
+    async def scenario():
+        return [await limiter.hit("client", LIMIT) for _ in range(5)]
+
+    results = asyncio.run(scenario())
+    assert [allowed for allowed, _ in results] == [True, True, True, False, False]
+    assert script.calls == 3
+
+
+def test_clients_have_separate_buckets():
+    limiter = RateLimiter(fakeredis.FakeAsyncRedis())
+
+    async def scenario():
+        for _ in range(3):
+            await limiter.hit("a", LIMIT)
+        return await limiter.hit("a", LIMIT), await limiter.hit("b", LIMIT)
+
+    (a_allowed, _), (b_allowed, _) = asyncio.run(scenario())
+    assert not a_allowed and b_allowed
+
+
+def test_local_bucket_decides_while_redis_is_down():
+    limiter = RateLimiter(DownRedis())
+
+    async def scenario():
+        return [await limiter.hit("client", LIMIT) for _ in range(4)]
+
+    assert [allowed for allowed, _ in asyncio.run(scenario())] == [True, True, True, False]
+
+
+def test_forwarded_for_is_only_followed_through_trusted_proxies():
+    trusted = parse_networks("10.0.0.0/8")
+    forwarded = [("x-forwarded-for", "6.6.6.6, 1.2.3.4, 10.0.0.7")]
+
+    assert client_address(_scope("10.0.0.2", forwarded), trusted) == "1.2.3.4"
+    assert client_address(_scope("8.8.8.8", forwarded), trusted) == "8.8.8.8"
+    assert client_address(_scope("10.0.0.2", forwarded), ()) == "10.0.0.2"
+
+
+def test_unverified_credentials_do_not_change_the_key():
+    plain = client_identity(_scope("8.8.8.8"))
+    assert client_identity(_scope("8.8.8.8", [("x-api-key", "made-up")])) == plain
+    assert client_identity(_scope("8.8.8.8", [("authorization", "Bearer made-up")])) == plain
+    assert client_identity(_scope("8.8.8.8", [("cookie", "access_token=made-up")])) == plain
+
+
+def test_verified_token_adds_the_subject(monkeypatch):
+    jwt = pytest.importorskip("jose.jwt")
+    import app.core.rate_limit as rate_limit
+
+    monkeypatch.setattr(rate_limit, "JWT_SECRET_KEY", "secret")
+    token = jwt.encode({"sub": "ada@example.com"}, "secret", algorithm="HS256")
+    forged = jwt.encode({"sub": "ada@example.com"}, "other", algorithm="HS256")
+
+    signed_in = client_identity(_scope("8.8.8.8", [("cookie", f"access_token={token}")]))
+    assert signed_in.startswith("ip:8.8.8.8:user:")
+    assert client_identity(_scope("8.8.8.8", [("cookie", f"access_token={forged}")])) == (
+        "ip:8.8.8.8"
+    )
+
+
+def test_middleware_answers_429_with_retry_after():
+    app = FastAPI()
+
+    @app.post("/cashflow/predict")
+    def predict():
+        return {}
+
+    @app.get("/health")
+    def health():
+        return {}
+
+    client = TestClient(AdmissionControlMiddleware(app, limits=(LIMIT,)))
+    codes = [client.post("/cashflow/predict").status_code for _ in range(4)]
+    assert codes == [200, 200, 200, 429]
+    refused = client.post("/cashflow/predict")
+    assert int(refused.headers["Retry-After"]) >= 1
+    # Other routes are not limited.
+    assert client.get("/health").status_code == 200
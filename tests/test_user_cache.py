@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+from app.auth.cache import UserCache
+from app.auth.models import User
+
+EMAIL = "ada@example.com"
+
+
+def _user(is_active: bool = True) -> User:
+    return User(id=1, email=EMAIL, is_active=is_active, user_type=None, created_at=None)
+
+
+def _expiry() -> float:
+    return time.time() + 600
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis()
+
+
+def _worker(redis) -> UserCache:
+    cache = UserCache()
+    cache.attach(redis)
+    return cache
+
+
+def test_put_then_get():
+    async def scenario():
+        cache = UserCache()
+        await cache.put(_user(), _expiry(), await cache.generation(EMAIL))
+        return await cache.get(EMAIL)
+
+    assert asyncio.run(scenario()).email == EMAIL
+
+
+def test_snapshot_loaded_before_local_invalidation_is_not_cached():
+    async def scenario():
+        cache = UserCache()
+        generation = await cache.generation(EMAIL)
+        # The user is updated while this request is still loading the old row.
+        await cache.invalidate(EMAIL)
+        await cache.put(_user(is_active=True), _expiry(), generation)
+        return await cache.get(EMAIL)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_snapshot_loaded_before_another_workers_invalidation_is_not_cached(redis):
+    async def scenario():
+        loading, updating = _worker(redis), _worker(redis)
+        generation = await loading.generation(EMAIL)
+        await updating.invalidate(EMAIL)
+        await loading.put(_user(is_active=True), _expiry(), generation)
+        return await loading.get(EMAIL), await updating.get(EMAIL)
+
+    assert asyncio.run(scenario()) == (None, None)
+
+
+def test_snapshot_loaded_after_invalidation_is_shared(redis):
+    async def scenario():
+        loading, other = _worker(redis), _worker(redis)
+        await other.invalidate(EMAIL)
+        generation = await loading.generation(EMAIL)
+        await loading.put(_user(is_active=False), _expiry(), generation)
+        return await other.get(EMAIL)
+
+    user = asyncio.run(scenario())
+    assert user is not None and user.is_active is False
+
+
+def test_expired_token_is_not_cached(redis):
+    async def scenario():
+        cache = _worker(redis)
+        await cache.put(_user(), time.time() - 1, await cache.generation(EMAIL))
+        return await cache.get(EMAIL)
+
+    assert asyncio.run(scenario()) is None